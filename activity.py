@@ -0,0 +1,79 @@
+# AI activity levels.
+#
+# An enemy that is outside its aggro circle and has no Flamefruit lure to follow
+# does nothing in update() but re-roll its speed. Instead of running that every
+# frame, it goes to sleep: it leaves World.active (the group World.step updates)
+# and is scheduled to wake once the player has travelled as far as the gap
+# between them, the earliest the aggro test could pass again. Wake-ups are kept
+# in a Scheduler keyed on the player's travelled distance rather than on time,
+# so a player standing still wakes nobody. A new Flamefruit lure wakes every
+# sleeping lure follower at once.
+
+import math
+
+from scheduler import Scheduler
+
+MIN_SLEEP_GAP = 32  # Enemies closer to aggro range than this stay awake, to avoid thrashing
+
+class Activity:
+    def __init__(self, world):
+        self.world = world
+        self.travel = 0.0  # Distance the player has moved so far
+        self.last_position = world.player.rect.center
+        self.wakeups = Scheduler()
+        self.sleeping = {}  # enemy -> wake Timer
+        self.sleeps = 0
+        self.wakes = 0
+
+    # Put an enemy to sleep if it is far enough outside its aggro circle
+    def idle(self, enemy):
+        if not enemy.alive():
+            return  # A wake-up would put it back in World.active after it died
+        player = self.world.player
+        ratio = enemy.archetype.aggro_radius / enemy.rect.width
+        # Same circles as pygame.sprite.collide_circle_ratio(ratio)
+        reach = ratio * 0.5 * (math.hypot(*enemy.rect.size) + math.hypot(*player.rect.size))
+        gap = math.dist(enemy.rect.center, player.rect.center) - reach
+        if gap < MIN_SLEEP_GAP:
+            return
+        self.sleeping[enemy] = self.wakeups.at(self.travel + gap, lambda travel: self.wake(enemy))
+        self.world.active.remove(enemy)
+        self.sleeps += 1
+
+    def wake(self, enemy):
+        timer = self.sleeping.pop(enemy, None)
+        if timer is None:
+            return
+        timer.cancel()
+        self.world.active.add(enemy)
+        self.wakes += 1
+
+    # Put enemies back to sleep as a save recorded them: the player's travelled
+    # distance then, and (enemy, distance it wakes at) pairs in the order they slept
+    def restore(self, travel, sleepers):
+        self.travel = travel
+        for enemy, wake_travel in sleepers:
+            self.sleeping[enemy] = self.wakeups.at(wake_travel, lambda travel, enemy=enemy: self.wake(enemy))
+            self.world.active.remove(enemy)
+
+    # Drop a killed enemy's wake-up
+    def forget(self, enemy):
+        timer = self.sleeping.pop(enemy, None)
+        if timer is not None:
+            timer.cancel()
+
+    # Call after the player moved: wakes whoever the player may now be in range of
+    def player_moved(self):
+        position = self.world.player.rect.center
+        if position != self.last_position:
+            self.travel += math.dist(position, self.last_position)
+            self.last_position = position
+            self.wakeups.run(self.travel)
+
+    # A Flamefruit was collected: lure followers have somewhere to go
+    def lure_started(self):
+        for enemy in [enemy for enemy in self.sleeping if enemy.archetype.follows_lure]:
+            self.wake(enemy)
+
+    def stats(self):
+        return {"sleeping": len(self.sleeping), "sleeps": self.sleeps, "wakes": self.wakes}
@@ -0,0 +1,167 @@
+# Pre-scaled asset cache.
+#
+# The source PNGs are large (the background alone is over 1 MB) and most are shown
+# at a fraction of their size. build_cache() decodes and scales every image once and
+# stores raw pixels: the sprites packed into one RGBA texture atlas, and each opaque
+# image (the background) as its own RGB file, plus a JSON manifest with the source
+# file stamps. load_cached_images() memory-maps those files and only has to convert
+# them to the display format. Stale entries are rebuilt on their own; the atlas is
+# only repacked when the set of images or their sizes change.
+#
+#   python assetcache.py          # bring the cache up to date
+#   python assetcache.py --force  # rebuild everything
+
+import argparse
+import json
+import mmap
+import os
+
+import pygame
+
+from assets import ASSET_DIR, IMAGES, OPAQUE, decode_source_image
+
+CACHE_DIR = os.path.join(ASSET_DIR, "assetcache")
+CACHE_VERSION = 1
+ATLAS_WIDTH = 1024
+ATLAS_FILE = "atlas.rgba"
+MANIFEST_FILE = "manifest.json"
+
+def source_stamp(name):
+    stat = os.stat(os.path.join(ASSET_DIR, name))
+    return [stat.st_mtime_ns, stat.st_size]
+
+# Shelf-pack the sprite sizes into an atlas ATLAS_WIDTH wide: key -> [x, y, w, h]
+def pack(sizes):
+    rects = {}
+    x = y = shelf_height = 0
+    for key in sorted(sizes, key=lambda k: (-sizes[k][1], k)):
+        w, h = sizes[key]
+        if x + w > ATLAS_WIDTH:
+            x, y, shelf_height = 0, y + shelf_height, 0
+        rects[key] = [x, y, w, h]
+        x += w
+        shelf_height = max(shelf_height, h)
+    return rects, y + shelf_height
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != CACHE_VERSION:
+        return None
+    return manifest
+
+def write_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+# Copy an image's pixels into its rect of the atlas file
+def write_atlas_rect(f, image, rect, atlas_width):
+    x, y, w, h = rect
+    pixels = pygame.image.tobytes(image, "RGBA")
+    row = w * 4
+    for i in range(h):
+        f.seek(((y + i) * atlas_width + x) * 4)
+        f.write(pixels[i * row:(i + 1) * row])
+
+# Bring the cache up to date and return the keys that were (re)built
+def build_cache(force=False, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    sprite_sizes = {key: size for key, (_, size) in IMAGES.items() if key not in OPAQUE}
+    rects, atlas_height = pack(sprite_sizes)
+    stamps = {key: source_stamp(name) for key, (name, _) in IMAGES.items()}
+
+    manifest = None if force else read_manifest(cache_dir)
+    atlas_path = os.path.join(cache_dir, ATLAS_FILE)
+    if manifest is None or manifest["atlas"]["rects"] != rects or not os.path.exists(atlas_path):
+        # Full rebuild: repack the atlas from scratch
+        manifest = {"version": CACHE_VERSION, "atlas": {"size": [ATLAS_WIDTH, atlas_height], "rects": rects}, "entries": {}}
+        with open(atlas_path + ".tmp", "wb") as f:
+            f.truncate(ATLAS_WIDTH * atlas_height * 4)
+        os.replace(atlas_path + ".tmp", atlas_path)
+        stale = list(IMAGES)
+    else:
+        stale = []
+        for key in IMAGES:
+            entry = manifest["entries"].get(key)
+            if entry is None or entry["source"] != stamps[key]:
+                stale.append(key)
+            elif key in OPAQUE and not os.path.exists(os.path.join(cache_dir, entry["file"])):
+                stale.append(key)
+    if not stale:
+        return []
+
+    with open(atlas_path, "r+b") as atlas:
+        for key in stale:
+            image = decode_source_image(key)
+            if key in OPAQUE:
+                file_name = key + ".rgb"
+                path = os.path.join(cache_dir, file_name)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(pygame.image.tobytes(image, "RGB"))
+                os.replace(path + ".tmp", path)
+                manifest["entries"][key] = {"source": stamps[key], "file": file_name, "size": list(image.get_size())}
+            else:
+                write_atlas_rect(atlas, image, rects[key], ATLAS_WIDTH)
+                manifest["entries"][key] = {"source": stamps[key]}
+    write_manifest(cache_dir, manifest)
+    return stale
+
+def _map(path):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+# Load every image from an up-to-date cache (needs a display mode to be set)
+def load_cached_images(cache_dir=CACHE_DIR):
+    manifest = read_manifest(cache_dir)
+    if manifest is None:
+        raise ValueError(f"No asset cache in {cache_dir}")
+    images = {}
+
+    mapped = _map(os.path.join(cache_dir, ATLAS_FILE))
+    try:
+        atlas = pygame.image.frombuffer(mapped, tuple(manifest["atlas"]["size"]), "RGBA").convert_alpha()
+    finally:
+        mapped.close()
+    for key, rect in manifest["atlas"]["rects"].items():
+        images[key] = atlas.subsurface(rect)
+
+    for key in OPAQUE:
+        entry = manifest["entries"][key]
+        mapped = _map(os.path.join(cache_dir, entry["file"]))
+        try:
+            images[key] = pygame.image.frombuffer(mapped, tuple(entry["size"]), "RGB").convert()  # Opaque: no per-pixel alpha
+        finally:
+            mapped.close()
+    return images
+
+# Read one image from an up-to-date cache as an unconverted surface.
+# Touches no display state, so it is safe to call from a worker thread.
+def read_cached_image(key, manifest, cache_dir=CACHE_DIR):
+    if key in OPAQUE:
+        entry = manifest["entries"][key]
+        with open(os.path.join(cache_dir, entry["file"]), "rb") as f:
+            return pygame.image.frombytes(f.read(), tuple(entry["size"]), "RGB")
+    atlas_width = manifest["atlas"]["size"][0]
+    x, y, w, h = manifest["atlas"]["rects"][key]
+    mapped = _map(os.path.join(cache_dir, ATLAS_FILE))
+    try:
+        rows = [mapped[((y + i) * atlas_width + x) * 4:((y + i) * atlas_width + x + w) * 4] for i in range(h)]
+    finally:
+        mapped.close()
+    return pygame.image.frombytes(b"".join(rows), (w, h), "RGBA")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the pre-scaled asset cache.")
+    parser.add_argument("--force", action="store_true", help="rebuild every entry")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args(argv)
+    rebuilt = build_cache(args.force, args.cache_dir)
+    print(f"Rebuilt {len(rebuilt)} of {len(IMAGES)} entries" + (f": {', '.join(rebuilt)}" if rebuilt else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import itertools
+import os
+import queue
+import threading
+
+import pygame
+
+from settings import RED
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Image key -> (file name, in-game size or None to keep the original size)
+IMAGES = {
+    "luminara": ("luminara.png", (90, 90)),  # Increased size by 50%
+    "luminara_invuln": ("luminarainvuln.png", (90, 90)),  # Match player size
+    "enemy": ("enemy.png", (67, 67)),  # Increased size by 50%
+    "bossenemy": ("bossenemy.png", (134, 134)),  # Boss enemy is twice the size of regular enemy
+    "malakar": ("malakar.png", (268, 268)),  # Malakar is twice the size of boss enemy
+    "background": ("background.png", None),
+    "ripple": ("ripple.png", (45, 45)),
+    "gleamberry": ("gleamberry.png", (45, 45)),  # Increased by 50%
+    "shimmeringapple": ("shimmeringapple.png", (45, 45)),  # Increased by 50%
+    "etherealpear": ("etherealpear.png", (45, 45)),  # Increased by 50%
+    "flamefruit": ("flamefruit.png", (45, 45)),  # Increased by 50%
+    "moonbeammelon": ("moonbeammelon.png", (45, 45)),  # Increased by 50%
+}
+
+# Images without transparency, loaded with plain convert()
+OPAQUE = {"background"}
+
+# Sprite sizes, so the simulation can build rects without loading any surfaces
+SPRITE_SIZES = {key: size for key, (_, size) in IMAGES.items() if size is not None}
+
+# Load character images with error handling
+def load_image(name):
+    try:
+        image = pygame.image.load(os.path.join(ASSET_DIR, name))
+        return image.convert_alpha()  # Ensure transparency is handled correctly
+    except pygame.error as message:
+        print(f"Cannot load image: {name}")
+        raise SystemExit(message)
+
+# Load every game image at its in-game size (needs a display mode to be set).
+# Goes through the pre-scaled asset cache, rebuilding any stale entries first,
+# and falls back to decoding the source files if the cache can't be used.
+def load_images():
+    import assetcache
+    try:
+        assetcache.build_cache()
+        return assetcache.load_cached_images()
+    except (OSError, ValueError) as message:
+        print(f"Asset cache unavailable ({message}), loading source images")
+    return load_source_images()
+
+def load_source_images():
+    images = {}
+    for key, (name, size) in IMAGES.items():
+        image = load_image(name)
+        if key in OPAQUE:
+            image = image.convert()
+        if size is not None:
+            image = pygame.transform.scale(image, size)
+        images[key] = image
+    return images
+
+# Decode one source image at its in-game size, without converting it
+def decode_source_image(key):
+    name, size = IMAGES[key]
+    image = pygame.image.load(os.path.join(ASSET_DIR, name))
+    if size is not None:
+        image = pygame.transform.scale(image, size)
+    return image
+
+# Loads images on a worker thread while the main thread keeps drawing.
+#
+# The worker brings the asset cache up to date and decodes requested images
+# (from the cache, or from the source files if the cache is unusable); poll()
+# on the main thread converts finished ones to the display format. Images can
+# be requested up front, prefetched in the background ahead of their first use,
+# or simply looked up: manager[key] loads a missing image on the spot. The
+# manager can stand in for the plain images dict everywhere. cache_dir defaults
+# to assetcache.CACHE_DIR.
+class AssetManager:
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.images = {}
+        self.requested = set()
+        self.requests = queue.PriorityQueue()
+        self.results = queue.Queue()
+        self.order = itertools.count()
+        self.manifest = None
+        self.cache_ready = threading.Event()
+        self.on_load = None  # Optional callback(key, image) run on the main thread
+        self.thread = threading.Thread(target=self._work, name="asset-loader", daemon=True)
+
+    def start(self, keys=()):
+        for key in keys:
+            self.request(key)
+        self.thread.start()
+        return self
+
+    # Queue an image for the worker; lower priorities are decoded first
+    def request(self, key, priority=0):
+        if key not in self.requested and key not in self.images:
+            self.requested.add(key)
+            self.requests.put((priority, next(self.order), key))
+
+    # Fetch an image in the background ahead of its first use
+    def prefetch(self, key):
+        self.request(key, priority=1)
+
+    def close(self):
+        self.requests.put((-1, -1, None))
+
+    def _work(self):
+        import assetcache
+        if self.cache_dir is None:
+            self.cache_dir = assetcache.CACHE_DIR
+        try:
+            assetcache.build_cache(cache_dir=self.cache_dir)
+            self.manifest = assetcache.read_manifest(self.cache_dir)
+        except (OSError, ValueError) as message:
+            print(f"Asset cache unavailable ({message}), loading source images")
+        self.cache_ready.set()
+        while True:
+            _, _, key = self.requests.get()
+            if key is None:
+                return
+            self.results.put((key, self._decode(key)))
+
+    def _decode(self, key):
+        if self.manifest is not None and self.cache_ready.is_set():
+            import assetcache
+            try:
+                return assetcache.read_cached_image(key, self.manifest, self.cache_dir)
+            except (OSError, KeyError):
+                pass
+        return decode_source_image(key)
+
+    # Convert whatever the worker finished (main thread only); returns how many were added
+    def poll(self):
+        added = 0
+        while True:
+            try:
+                key, image = self.results.get_nowait()
+            except queue.Empty:
+                return added
+            if key not in self.images:
+                self._store(key, image)
+                added += 1
+
+    def _store(self, key, image):
+        image = image.convert() if key in OPAQUE else image.convert_alpha()
+        self.images[key] = image
+        if self.on_load is not None:
+            self.on_load(key, image)
+        return image
+
+    # Fraction of the given images that are ready
+    def progress(self, keys):
+        self.poll()
+        keys = list(keys)
+        return sum(key in self.images for key in keys) / len(keys) if keys else 1.0
+
+    def ready(self, keys):
+        return self.progress(keys) >= 1.0
+
+    def __getitem__(self, key):
+        image = self.images.get(key)
+        if image is None:
+            self.poll()
+            image = self.images.get(key)
+        if image is None:
+            # Needed right now: decode on this thread rather than wait in line
+            self.requested.add(key)
+            image = self._store(key, self._decode(key))
+        return image
+
+    def __contains__(self, key):
+        return key in IMAGES
+
+    def get(self, key, default=None):
+        return self[key] if key in IMAGES else default
+
+# Status effect -> (fill color, blend flags) applied to a copy of the base image
+EFFECT_TINTS = {
+    "frozen": (RED, pygame.BLEND_MULT),
+}
+
+# Tinted variants of shared images, built once per (base image, effect) pair.
+# Sprites swap surface references instead of blending their (shared) image every frame.
+class TintCache:
+    def __init__(self):
+        self.variants = {}
+        self.builds = 0
+
+    def get(self, image, effect):
+        key = (image, effect)
+        variant = self.variants.get(key)
+        if variant is None:
+            color, flags = EFFECT_TINTS[effect]
+            variant = image.copy()
+            variant.fill(color, special_flags=flags)
+            self.variants[key] = variant
+            self.builds += 1
+        return variant
+
+    # Build the variants up front, so the first freeze doesn't cost a frame
+    def prewarm(self, images, effects=tuple(EFFECT_TINTS)):
+        for image in images:
+            for effect in effects:
+                self.get(image, effect)
+
+tint_cache = TintCache()
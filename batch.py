@@ -0,0 +1,186 @@
+# Batch simulator for balance and load sweeps.
+#
+# Plays many headless games in parallel across a process pool, each on a set of
+# Balance overrides and with a scripted player policy, until the player dies,
+# reaches level 100 or runs out of steps. One row per run (outcome, time to
+# death or win, peak enemy count, step times) goes to a CSV report, or Parquet
+# when pandas is installed, and a summary per parameter set is printed:
+#
+#   python batch.py --runs 200 --set enemy_spawn_interval=1500,2000,3000
+#   python batch.py --runs 50 --set nightcrawler_health=80,100 --set damage_scale=0.5,1 --policy random
+#
+# Every parameter set is played with the same seeds, so differences between sets
+# come from the parameters rather than from luck.
+
+import argparse
+import csv
+import importlib.util
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmark import summarize
+from settings import WIDTH
+from simulation import STEP_MS, Balance, ManualClock, World
+
+# Random walk that changes direction every half second and attacks whatever it touches
+def random_walk(world, rng):
+    dx = dy = 0
+    def policy(step):
+        nonlocal dx, dy
+        if step % 30 == 0:
+            dx, dy = rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1))
+        return dx, dy, True
+    return policy
+
+# Heads for the nearest fruit, attacking on the way, and fires the special
+# attack when it is ready and an enemy is close
+def fruit_seeker(world, rng):
+    player = world.player
+    def policy(step):
+        if player.special_attack_ready and next(iter(world.space.within_radius("enemy", player.rect.center, WIDTH // 5)), None) is not None:
+            world.special_attack()
+        fruit, distance = world.space.nearest("fruit", player.rect.center)
+        if fruit is None:
+            return 0, 0, True
+        dx = (fruit.rect.centerx > player.rect.centerx) - (fruit.rect.centerx < player.rect.centerx)
+        dy = (fruit.rect.centery > player.rect.centery) - (fruit.rect.centery < player.rect.centery)
+        return dx, dy, True
+    return policy
+
+# Policy name -> factory(world, rng) returning policy(step) -> (dx, dy, attack)
+POLICIES = {
+    "random": random_walk,
+    "seeker": fruit_seeker,
+}
+
+# Play one game; runs in a worker process
+def run_game(params, seed, policy_name, max_steps):
+    world = World(clock=ManualClock(), seed=seed, balance=Balance(**params))
+    policy = POLICIES[policy_name](world, random.Random(seed))
+    step_ms = []
+    peak_enemies = world.enemy_count()
+    outcome = "timeout"
+    clock = time.perf_counter
+    for step in range(max_steps):
+        dx, dy, attack = policy(step)
+        start = clock()
+        world.step(STEP_MS, dx, dy, attack)
+        step_ms.append((clock() - start) * 1000)
+        peak_enemies = max(peak_enemies, world.enemy_count())
+        if world.game_over:
+            outcome = "died"
+            break
+        if world.game_won:
+            outcome = "won"
+            break
+
+    times = summarize(step_ms)
+    return {
+        **params,
+        "seed": seed,
+        "policy": policy_name,
+        "outcome": outcome,
+        "steps": world.frame,
+        "game_seconds": round(world.clock.now() / 1000, 3),
+        "level": world.player.level,
+        "health": world.player.health,
+        "peak_enemies": peak_enemies,
+        "mean_step_ms": round(times["mean"], 4),
+        "p95_step_ms": round(times["p95"], 4),
+        "max_step_ms": round(times["max"], 4),
+    }
+
+def _run_job(job):
+    return run_game(*job)
+
+# "name=v1,v2,..." -> (name, [values]), converted to the default's type
+def parse_sweep(text):
+    name, _, values = text.partition("=")
+    if not hasattr(Balance, name) or name.startswith("_") or callable(getattr(Balance, name)):
+        raise ValueError(f"Unknown balance parameter: {name}")
+    kind = type(getattr(Balance, name))
+    return name, [kind(value) if kind is not int else int(float(value)) for value in values.split(",")]
+
+# Every combination of the swept values, as Balance override dicts
+def parameter_sets(sweeps):
+    names = [name for name, values in sweeps]
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values for name, values in sweeps))]
+
+def write_report(rows, path):
+    if path.endswith(".parquet"):
+        try:
+            import pandas
+        except ImportError:
+            raise RuntimeError("Parquet reports need pandas and pyarrow (pip install pandas pyarrow)")
+        pandas.DataFrame(rows).to_parquet(path, index=False)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+# Outcome rates, mean time to the end and load figures per parameter set
+def summarize_sets(rows, names):
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[name] for name in names), []).append(row)
+    summary = []
+    for key, group in groups.items():
+        count = len(group)
+        summary.append({
+            **dict(zip(names, key)),
+            "runs": count,
+            "won": sum(row["outcome"] == "won" for row in group) / count,
+            "died": sum(row["outcome"] == "died" for row in group) / count,
+            "mean_game_seconds": sum(row["game_seconds"] for row in group) / count,
+            "mean_peak_enemies": sum(row["peak_enemies"] for row in group) / count,
+            "mean_step_ms": sum(row["mean_step_ms"] for row in group) / count,
+        })
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play many headless games in parallel for balance and load sweeps.")
+    parser.add_argument("--set", dest="sweeps", action="append", default=[], metavar="NAME=V1,V2", help=f"sweep a Balance parameter over values (one of: {', '.join(Balance().values())})")
+    parser.add_argument("--runs", type=int, default=20, help="games per parameter set (default: 20)")
+    parser.add_argument("--policy", choices=POLICIES, default="seeker", help="player policy (default: seeker)")
+    parser.add_argument("--max-minutes", type=float, default=10, help="game time after which a run stops as a timeout (default: 10)")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first run in every set (default: 1)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: one per CPU)")
+    parser.add_argument("--output", default="batch_results.csv", help="per-run report, .csv or .parquet (default: batch_results.csv)")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    try:
+        sweeps = [parse_sweep(text) for text in args.sweeps]
+    except ValueError as error:
+        parser.error(str(error))
+    if args.output.endswith(".parquet") and importlib.util.find_spec("pandas") is None:
+        parser.error("Parquet reports need pandas and pyarrow (pip install pandas pyarrow)")
+    names = [name for name, values in sweeps]
+    max_steps = round(args.max_minutes * 60000 / STEP_MS)
+    jobs = [(params, args.seed + run, args.policy, max_steps) for params in parameter_sets(sweeps) for run in range(args.runs)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        rows = list(pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (args.workers * 8))))
+    elapsed = time.perf_counter() - start
+    steps = sum(row["steps"] for row in rows)
+    print(f"{len(rows)} games, {steps} steps in {elapsed:.1f} s on {args.workers} workers ({steps / elapsed:.0f} steps/s)")
+
+    write_report(rows, args.output)
+    print(f"Report written to {args.output}")
+
+    for entry in summarize_sets(rows, names):
+        label = " ".join(f"{name}={entry[name]}" for name in names) or "defaults"
+        print(f"{label}: {entry['runs']} runs, won {entry['won']:.0%}, died {entry['died']:.0%}, "
+              f"ended after {entry['mean_game_seconds']:.0f} s on average, peak enemies {entry['mean_peak_enemies']:.0f}, "
+              f"step {entry['mean_step_ms']:.3f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
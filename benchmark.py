@@ -0,0 +1,279 @@
+# Scenario benchmarks for the game loop.
+#
+# Runs scripted scenarios on a seeded World and records per-frame update and
+# draw times, entity counts and peak RSS to a JSON file:
+#
+#   python benchmark.py                          # all scenarios, with drawing
+#   python benchmark.py crawlers_1000 --no-draw  # one scenario, simulation only
+#   python benchmark.py --baseline old.json      # flag regressions against an earlier run
+#   python benchmark.py --world 8000x8000        # a scrolling world, drawn through a camera
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+from camera import parse_size
+from settings import WIDTH, HEIGHT
+from simulation import STEP_MS, ManualClock, World, entity_counts
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Keep the player alive for the whole scenario, so every frame does full work.
+# (Invulnerability would not do: a Moonbeam Melon resets its end time.)
+def make_immortal(world):
+    world.player.health = world.player.max_health = 10 ** 9
+
+def add_crawlers(world, count):
+    for _ in range(count):
+        world.spawn_enemy()
+
+def crawlers(count):
+    def setup(world):
+        make_immortal(world)
+        add_crawlers(world, count)
+    return setup
+
+def boss_wave(world):
+    make_immortal(world)
+    for _ in range(3):
+        world.spawn_bossenemy()
+    add_crawlers(world, 200)
+
+def malakar_ripples(world):
+    make_immortal(world)
+    world.spawn_malakar()
+    add_crawlers(world, 100)
+    for _ in range(100):
+        world.spawn_ripple((world.rng.randint(0, world.bounds.width), world.rng.randint(0, world.bounds.height)))
+
+def fruit_field(world):
+    make_immortal(world)
+    for _ in range(2000):
+        world.spawn_fruit()
+
+# Crawlers chasing the player through a grid of wall segments. There is no terrain
+# yet, so only the flow fields know about the walls, but they search around them.
+def walled_crawlers(world):
+    make_immortal(world)
+    add_crawlers(world, 1000)
+    if world.navigation is not None:
+        size = world.navigation.chase.cell_size
+        columns, rows = world.bounds.width // size, world.bounds.height // size
+        walls = {(x, y) for x in range(4, columns, 8) for y in range(rows) if y % 8 != 4}
+        walls |= {(x, y) for y in range(4, rows, 8) for x in range(columns) if x % 8 != 0}
+        world.navigation.set_blocked(walls)
+
+# Scenario name -> setup function
+SCENARIOS = {
+    "crawlers_10": crawlers(10),
+    "crawlers_100": crawlers(100),
+    "crawlers_1000": crawlers(1000),
+    "crawlers_10000": crawlers(10000),
+    "boss_wave": boss_wave,
+    "malakar_ripples": malakar_ripples,
+    "fruit_field": fruit_field,
+    "walled_crawlers": walled_crawlers,
+}
+
+# Linear-interpolated percentile of an already sorted list
+def percentile(values, p):
+    if not values:
+        return None
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+def summarize(samples):
+    values = sorted(samples)
+    if not values:
+        return None
+    return {
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1],
+    }
+
+# Peak resident set size of this process in KiB, or None where unsupported
+def peak_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024  # macOS reports bytes
+    return rss
+
+def run_scenario(name, frames, seed, draw, immediate_hud=False, dirty_rects=False, crowd=False, activity=True, size=None, navigation=True):
+    images = surface = hud = renderer = camera = None
+    if draw:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.init()
+        pygame.display.set_mode((WIDTH, HEIGHT))
+        from assets import load_images
+        from rendering import DirtyRenderer, draw_world, text_cache
+        images = load_images()
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        if size is not None:
+            from camera import Camera
+            camera = Camera(images["background"])
+        if not immediate_hud:
+            from hud import Hud
+            hud = Hud(images)
+            if dirty_rects and camera is None:
+                renderer = DirtyRenderer(images, hud)
+
+    world = World(images, clock=ManualClock(), seed=seed, crowd=crowd, activity=activity, size=size, navigation=navigation)
+    SCENARIOS[name](world)
+    start_counts = entity_counts(world)
+    peak_counts = dict(start_counts)
+
+    update_ms = []
+    draw_ms = []
+    rng = world.rng
+    dx = dy = 0
+    for frame in range(frames):
+        # Random-walk player that attacks whatever it touches
+        if frame % 30 == 0:
+            dx, dy = rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1))
+
+        # Keep going past a win too (fruit-heavy scenarios reach level 100 quickly)
+        if world.game_won:
+            world.player.level = 1
+
+        t0 = time.perf_counter()
+        world.step(STEP_MS, dx, dy, attack=True)
+        t1 = time.perf_counter()
+        update_ms.append((t1 - t0) * 1000)
+
+        if draw:
+            t0 = time.perf_counter()
+            if renderer is not None:
+                renderer.draw(surface, world)
+            else:
+                if camera is not None:
+                    camera.follow(world)
+                draw_world(surface, world, images, hud, camera)
+            draw_ms.append((time.perf_counter() - t0) * 1000)
+
+        for group, count in entity_counts(world).items():
+            peak_counts[group] = max(peak_counts[group], count)
+
+    result = {
+        "name": name,
+        "frames": frames,
+        "seed": seed,
+        "crowd": crowd,
+        "activity": activity,
+        "navigation": navigation,
+        "world": list(world.bounds.size),
+        "update_ms": summarize(update_ms),
+        "draw_ms": summarize(draw_ms),
+        "entities_start": start_counts,
+        "entities_end": entity_counts(world),
+        "entities_peak": peak_counts,
+        "peak_rss_kb": peak_rss_kb(),
+        "pool": world.pool.stats(),
+    }
+    if draw:
+        result["text_cache"] = text_cache.stats()
+    if hud is not None:
+        result["hud"] = hud.counters()
+    if world.activity is not None:
+        result["sleep"] = world.activity.stats()
+    result["director"] = world.director.stats()
+    if world.navigation is not None:
+        result["flow_fields"] = world.navigation.stats()
+    if camera is not None:
+        result["background_chunks"] = camera.background.stats()
+    if renderer is not None:
+        result["dirty_rects"] = {"dirty_frames": renderer.dirty_frames, "full_frames": renderer.full_frames}
+    return result
+
+# Compare p95 times against an earlier results file, returning regression messages
+def find_regressions(results, baseline, tolerance):
+    previous = {scenario["name"]: scenario for scenario in baseline["scenarios"]}
+    regressions = []
+    for scenario in results["scenarios"]:
+        old = previous.get(scenario["name"])
+        if old is None:
+            continue
+        for metric in ("update_ms", "draw_ms"):
+            if not scenario[metric] or not old.get(metric):
+                continue
+            before, after = old[metric]["p95"], scenario[metric]["p95"]
+            if after > before * (1 + tolerance):
+                regressions.append(f"{scenario['name']} {metric} p95: {before:.3f} -> {after:.3f} ms")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run game loop benchmark scenarios.")
+    parser.add_argument("scenarios", nargs="*", help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--frames", type=int, default=600, help="frames per scenario (default: 600)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--no-draw", action="store_true", help="time the simulation only, with no surfaces")
+    parser.add_argument("--immediate-hud", action="store_true", help="redraw the HUD text every frame instead of using the retained HUD")
+    parser.add_argument("--dirty-rects", action="store_true", help="draw with the dirty-rect renderer (uses the retained HUD)")
+    parser.add_argument("--crowd", action="store_true", help="move enemies with the vectorized NumPy crowd engine")
+    parser.add_argument("--no-activity", action="store_true", help="update every enemy each frame instead of letting idle ones sleep")
+    parser.add_argument("--no-navigation", action="store_true", help="step enemies straight at their target instead of along the flow fields")
+    parser.add_argument("--world", metavar="WxH", type=parse_size, help="run on a scrolling world of this size, drawn through a camera")
+    parser.add_argument("--in-process", action="store_true", help="run every scenario in this process (peak RSS is then cumulative)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to check for p95 regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown against the baseline (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario: {name}")
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "scenarios": [],
+    }
+    for name in names:
+        if args.in_process:
+            result = run_scenario(name, args.frames, args.seed, not args.no_draw, args.immediate_hud, args.dirty_rects, args.crowd, not args.no_activity, args.world, not args.no_navigation)
+        else:
+            # A fresh process per scenario keeps the peak RSS figures separate
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(run_scenario, name, args.frames, args.seed, not args.no_draw, args.immediate_hud, args.dirty_rects, args.crowd, not args.no_activity, args.world, not args.no_navigation).result()
+        results["scenarios"].append(result)
+        update = result["update_ms"]
+        line = f"{name:>16}: update p50 {update['p50']:.3f} p95 {update['p95']:.3f} p99 {update['p99']:.3f} ms"
+        if result["draw_ms"]:
+            draw = result["draw_ms"]
+            line += f" | draw p50 {draw['p50']:.3f} p95 {draw['p95']:.3f} p99 {draw['p99']:.3f} ms"
+        print(line)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
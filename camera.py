@@ -0,0 +1,105 @@
+# Scrolling view onto a world larger than the screen.
+#
+# The Camera follows the player, clamped to the world's bounds, and picks the
+# sprites to draw from the spatial index: only those inside the view plus a
+# margin, so drawing costs the same however many entities the rest of the map
+# holds. The background is never built at full map size. ChunkedBackground cuts
+# the map into square chunks, composes each from the (mirror-tiled) background
+# image the first time it comes into view and keeps the most recently used ones
+# in a bounded LRU, so background memory stays flat as maps grow.
+
+import argparse
+from collections import OrderedDict
+
+import pygame
+
+from settings import WIDTH, PLAYABLE_HEIGHT
+
+CHUNK_SIZE = 256
+DRAW_LAYERS = ("fruit", "enemy", "ripple", "player")  # Bottom to top
+
+# argparse type for --world WIDTHxHEIGHT
+def parse_size(text):
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    if width < WIDTH or height < PLAYABLE_HEIGHT:
+        raise argparse.ArgumentTypeError(f"the world can't be smaller than the view ({WIDTH}x{PLAYABLE_HEIGHT})")
+    return width, height
+
+class ChunkedBackground:
+    def __init__(self, source, chunk_size=CHUNK_SIZE, max_chunks=48):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks  # A view needs about 20 chunks; the rest is slack for scrolling back
+        self.tiles = {}  # (flip x, flip y) -> source image, mirrored so tiles meet without seams
+        self.chunks = OrderedDict()  # (cx, cy) -> surface, least recently used first
+        self.builds = 0
+        self.evictions = 0
+
+    def tile(self, flip_x, flip_y):
+        tile = self.tiles.get((flip_x, flip_y))
+        if tile is None:
+            tile = self.tiles[(flip_x, flip_y)] = pygame.transform.flip(self.source, flip_x, flip_y)
+        return tile
+
+    def build(self, cx, cy):
+        size = self.chunk_size
+        chunk = pygame.Surface((size, size), 0, self.source)
+        tile_width, tile_height = self.source.get_size()
+        x0, y0 = cx * size, cy * size
+        for ty in range(y0 // tile_height, (y0 + size - 1) // tile_height + 1):
+            for tx in range(x0 // tile_width, (x0 + size - 1) // tile_width + 1):
+                chunk.blit(self.tile(tx % 2 == 1, ty % 2 == 1), (tx * tile_width - x0, ty * tile_height - y0))
+        self.builds += 1
+        return chunk
+
+    def chunk(self, cx, cy):
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        chunk = self.chunks[key] = self.build(cx, cy)
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+            self.evictions += 1
+        return chunk
+
+    # Draw the part of the map under view (a world-space rect) to the surface's top left
+    def draw(self, surface, view):
+        size = self.chunk_size
+        for cy in range(view.top // size, (view.bottom - 1) // size + 1):
+            for cx in range(view.left // size, (view.right - 1) // size + 1):
+                surface.blit(self.chunk(cx, cy), (cx * size - view.x, cy * size - view.y))
+
+    def stats(self):
+        return {"chunks": len(self.chunks), "builds": self.builds, "evictions": self.evictions}
+
+class Camera:
+    def __init__(self, background, size=(WIDTH, PLAYABLE_HEIGHT), margin=64):
+        self.background = ChunkedBackground(background)
+        self.rect = pygame.Rect((0, 0), size)  # The view, in world coordinates
+        self.margin = margin  # Sprites this close to the view are drawn too, so nothing pops in at the edges
+        self.drawn = 0
+
+    # Center the view on the player without showing anything outside the world
+    def follow(self, world):
+        self.rect.center = world.player.rect.center
+        self.rect.clamp_ip(world.bounds)
+
+    # Sprites to draw, bottom layer first and nearer the bottom of the screen on top
+    def visible(self, world):
+        area = self.rect.inflate(2 * self.margin, 2 * self.margin)
+        sprites = []
+        for layer in DRAW_LAYERS:
+            found = world.space.overlapping(layer, area)
+            found.sort(key=lambda sprite: sprite.rect.bottom)
+            sprites.extend(found)
+        self.drawn = len(sprites)
+        return sprites
+
+    # Screen position of a world position
+    def to_screen(self, x, y):
+        return x - self.rect.x, y - self.rect.y
@@ -0,0 +1,206 @@
+# Opt-in vectorized crowd engine (World(crowd=True), needs numpy).
+#
+# Enemy state that the per-frame AI touches (position, size, speed, health, aggro
+# radius, freeze timer, contact damage) lives in NumPy arrays, and one step() moves
+# the whole population: speed re-rolls, aggro checks, chase and Flamefruit lure
+# steps and player-contact damage are each a few array operations. The enemy
+# sprites become thin views: they stay out of World.active (their update() does
+# nothing), health/speed/freeze reads and writes go to the arrays, and only
+# enemies that actually moved get their rect (and spatial index entry) written back.
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class CrowdEngine:
+    def __init__(self, world, capacity=256):
+        if np is None:
+            raise RuntimeError("The crowd engine needs numpy (pip install numpy)")
+        self.world = world
+        self.rng = np.random.default_rng(world.rng.getrandbits(64))
+        self.size = 0
+        self.sprites = []
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.w = np.zeros(capacity, dtype=np.int64)
+        self.h = np.zeros(capacity, dtype=np.int64)
+        self.speed = np.zeros(capacity)
+        self.health = np.zeros(capacity)
+        self.aggro_radius = np.zeros(capacity)
+        self.freeze_end = np.zeros(capacity)
+        self.frozen = np.zeros(capacity, dtype=bool)
+        self.follows_lure = np.zeros(capacity, dtype=bool)
+        self.damage_base = np.zeros(capacity, dtype=np.int64)
+        self.damage_divisor = np.ones(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        for name in ("x", "y", "w", "h", "speed", "health", "aggro_radius", "freeze_end", "frozen", "follows_lure", "damage_base", "damage_divisor"):
+            array = getattr(self, name)
+            grown = np.zeros(len(array) * 2, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    # Reserve a slot for a sprite that is being constructed
+    def allocate(self, sprite):
+        if self.size == len(self.x):
+            self._grow()
+        slot = self.size
+        self.size += 1
+        self.sprites.append(sprite)
+        self.frozen[slot] = False
+        self.freeze_end[slot] = 0
+        return slot
+
+    # Copy the archetype's constants and the rect of a freshly built sprite
+    def place(self, sprite):
+        slot = sprite.crowd_slot
+        archetype = sprite.archetype
+        self.x[slot], self.y[slot], self.w[slot], self.h[slot] = sprite.rect
+        self.aggro_radius[slot] = archetype.aggro_radius
+        self.follows_lure[slot] = archetype.follows_lure
+        self.damage_base[slot], self.damage_divisor[slot] = archetype.damage_formula
+
+    # Free a slot by moving the last sprite into it
+    def release(self, sprite):
+        slot = sprite.crowd_slot
+        sprite.released = (float(self.health[slot]), float(self.speed[slot]), float(self.freeze_end[slot]))  # Still readable after kill()
+        last = self.size - 1
+        if slot != last:
+            moved = self.sprites[last]
+            for array in (self.x, self.y, self.w, self.h, self.speed, self.health, self.aggro_radius, self.freeze_end, self.frozen, self.follows_lure, self.damage_base, self.damage_divisor):
+                array[slot] = array[last]
+            self.sprites[slot] = moved
+            moved.crowd_slot = slot
+        self.sprites.pop()
+        self.size = last
+        sprite.crowd_slot = None
+
+    def step(self):
+        n = self.size
+        if n == 0:
+            return
+        world = self.world
+        player = world.player
+        now = world.clock.now()
+        x, y, w, h = self.x[:n], self.y[:n], self.w[:n], self.h[:n]
+
+        # Freeze timers and speed re-rolls
+        frozen = now < self.freeze_end[:n]
+        thawed = np.nonzero(self.frozen[:n] & ~frozen)[0]
+        self.frozen[:n] = frozen
+        speed = np.where(frozen, 0.0, self.rng.uniform(0.5, 1.5, n))  # Reduced by half
+        self.speed[:n] = speed
+        for slot in thawed:
+            self.sprites[slot].set_effect(None)
+
+        # Aggro check, the same circles as pygame.sprite.collide_circle_ratio(aggro_radius / width)
+        px, py, pw, ph = player.rect
+        ratio = self.aggro_radius[:n] / w
+        radius = ratio * 0.5 * np.sqrt(w * w + h * h) + ratio * 0.5 * (pw * pw + ph * ph) ** 0.5
+        dx = (x + w // 2) - (px + pw // 2)
+        dy = (y + h // 2) - (py + ph // 2)
+        aggro = dx * dx + dy * dy <= radius * radius
+
+        # Chase the player, or walk to the Flamefruit lure when out of range
+        target_x = np.full(n, px)
+        target_y = np.full(n, py)
+        moving = aggro
+        if player.flamefruit_active and player.flamefruit_position:
+            lured = ~aggro & self.follows_lure[:n]
+            target_x[lured], target_y[lured] = player.flamefruit_position
+            moving = aggro | lured
+        new_x = _round(x + np.sign(target_x - x) * speed * moving)
+        new_y = _round(y + np.sign(target_y - y) * speed * moving)
+        changed = np.nonzero((new_x != x) | (new_y != y))[0]
+        cell = world.space.cell_size
+        recell = (
+            (new_x // cell != x // cell) | ((new_x + w - 1) // cell != (x + w - 1) // cell)
+            | (new_y // cell != y // cell) | ((new_y + h - 1) // cell != (y + h - 1) // cell)
+        )
+        x[:] = new_x
+        y[:] = new_y
+
+        # Contact damage; the player's hit cooldown means only the first hit counts
+        touching = aggro & (x < px + pw) & (px < x + w) & (y < py + ph) & (py < y + h)
+        hits = np.nonzero(touching)[0]
+        if len(hits):
+            first = hits[0]
+            player.take_damage(int(self.damage_base[first] + player.level // self.damage_divisor[first]))
+
+        # Write positions back to the sprites that moved, and re-index those that changed cells
+        sprites = self.sprites
+        for slot, new_x, new_y, new_cell in zip(changed.tolist(), x[changed].tolist(), y[changed].tolist(), recell[changed].tolist()):
+            sprite = sprites[slot]
+            sprite.rect.topleft = (new_x, new_y)
+            if new_cell:
+                sprite.moved()
+
+# Round like pygame.Rect does when assigned a float (half away from zero)
+def _round(values):
+    return np.trunc(values + np.copysign(0.5, values)).astype(np.int64)
+
+# Enemy state backed by a CrowdEngine slot; mixed in ahead of an enemy class by crowd_class()
+class CrowdMember:
+    crowd_slot = None
+
+    def __init__(self, world, *args):
+        self.crowd = world.crowd
+        super().__init__(world, *args)
+
+    # Take a fresh slot on every (re)spawn
+    def reset(self, *args):
+        self.crowd_slot = self.crowd.allocate(self)
+        super().reset(*args)
+        self.crowd.place(self)
+
+    def _get_health(self):
+        if self.crowd_slot is None:
+            return self.released[0]
+        return float(self.crowd.health[self.crowd_slot])
+
+    def _set_health(self, value):
+        if self.crowd_slot is not None:
+            self.crowd.health[self.crowd_slot] = value
+
+    def _get_speed(self):
+        if self.crowd_slot is None:
+            return self.released[1]
+        return float(self.crowd.speed[self.crowd_slot])
+
+    def _set_speed(self, value):
+        if self.crowd_slot is not None:
+            self.crowd.speed[self.crowd_slot] = value
+
+    def _get_freeze_end_time(self):
+        if self.crowd_slot is None:
+            return self.released[2]
+        return float(self.crowd.freeze_end[self.crowd_slot])
+
+    def _set_freeze_end_time(self, value):
+        if self.crowd_slot is not None:
+            self.crowd.freeze_end[self.crowd_slot] = value
+
+    health = property(_get_health, _set_health)
+    speed = property(_get_speed, _set_speed)
+    freeze_end_time = property(_get_freeze_end_time, _set_freeze_end_time)
+
+    def update(self):
+        pass  # Moved by CrowdEngine.step
+
+    def kill(self):
+        if self.crowd_slot is not None:
+            self.crowd.release(self)
+        super().kill()
+
+_crowd_classes = {}
+
+# The crowd-backed variant of an enemy class (still an instance of it, for isinstance checks)
+def crowd_class(cls):
+    crowd_cls = _crowd_classes.get(cls)
+    if crowd_cls is None:
+        crowd_cls = _crowd_classes[cls] = type("Crowd" + cls.__name__, (CrowdMember, cls), {})
+    return crowd_cls
@@ -0,0 +1,187 @@
+# Streamed cutscene playback.
+#
+# A Cutscene never holds the whole clip. An ffmpeg process decodes the video
+# (scaled and letterboxed to the screen, resampled to a fixed frame rate) into a
+# pipe, and a worker thread reads it one raw frame at a time into a reused
+# buffer and blits that into one of a fixed ring of display-format surfaces, so
+# the format conversion happens off the main thread and memory stays the same
+# however long the clip is. When every slot is full the worker blocks, which
+# holds ffmpeg back too. The main thread asks frame(now) for the frame due at
+# that time on its clock: frames that are already late are handed straight back
+# to the worker, and the worker skips converting frames it can see are behind,
+# so a slow machine drops frames instead of stalling the clip. Opening a
+# cutscene starts decoding right away; start() only starts its clock, so a
+# cutscene opened ahead of time has its first frames ready when it begins.
+#
+#   python cutscene.py                          # play the dragon transformation
+#   python cutscene.py "dragon transform.mp4" --fps 24
+
+import argparse
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+
+import pygame
+
+from assets import ASSET_DIR
+from settings import WIDTH, HEIGHT, BLACK
+
+DRAGON_TRANSFORM = os.path.join(ASSET_DIR, "dragon transform.mp4")
+VIDEO_FPS = 30  # Clips are resampled to this rate, so frame n is due at n / VIDEO_FPS seconds
+RING_FRAMES = 6  # Decoded frames buffered ahead of the one on screen
+
+# Decoder process writing raw RGB frames of exactly size to its stdout
+def open_video(path, size, fps):
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("cutscenes need ffmpeg on the PATH")
+    if not os.path.exists(path):
+        raise RuntimeError(f"no such video: {path}")
+    width, height = size
+    scale = f"fps={fps},scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:-1:-1:black"
+    command = [ffmpeg, "-v", "error", "-nostdin", "-i", path, "-an", "-vf", scale, "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, bufsize=0)
+
+class Cutscene:
+    # display is the screen surface (or any surface in its format); needs the display mode set
+    def __init__(self, path=DRAGON_TRANSFORM, display=None, fps=VIDEO_FPS, ring=RING_FRAMES):
+        display = display or pygame.display.get_surface()
+        self.size = display.get_size()
+        self.fps = fps
+        self.free = queue.Queue()  # Slots the worker can decode into
+        self.ready = queue.Queue()  # (frame number, slot) in order; None once the clip has ended
+        for _ in range(ring + 1):  # One more for the frame on screen
+            self.free.put(pygame.Surface(self.size, 0, display))
+        self.current = None  # Slot on screen
+        self.shown_frame = -1
+        self.due = 0  # Frame number the main thread wants now, for the worker to skip late ones
+        self.start_time = None
+        self.ended = False
+        self.stopping = False
+        self.shown = 0
+        self.dropped = 0  # Decoded but never shown
+        self.skipped = 0  # Not even converted, being late already
+        self.process = open_video(path, self.size, fps)
+        self.thread = threading.Thread(target=self._work, name="cutscene-decoder", daemon=True)
+        self.thread.start()
+
+    def _work(self):
+        width, height = self.size
+        buffer = bytearray(width * height * 3)
+        view = memoryview(buffer)
+        frame = pygame.image.frombuffer(buffer, self.size, "RGB")  # Shares the buffer: refilled in place
+        stream = self.process.stdout
+        number = 0
+        try:
+            while not self.stopping:
+                filled = 0
+                while filled < len(buffer):
+                    read = stream.readinto(view[filled:])
+                    if not read:
+                        return  # End of the clip (or ffmpeg failed)
+                    filled += read
+                if number < self.due:
+                    self.skipped += 1  # Late already: don't spend a conversion on it
+                else:
+                    slot = self.free.get()
+                    if slot is None:
+                        return  # Stopped while waiting for a slot
+                    slot.blit(frame, (0, 0))  # Converts to the display format
+                    self.ready.put((number, slot))
+                number += 1
+        finally:
+            self.ready.put(None)
+
+    # Start the clip's clock; now in ms on whatever clock frame() is called with
+    def start(self, now):
+        self.start_time = now
+
+    # Surface to show at time now (the last one again if the next isn't due), or None before the first frame
+    def frame(self, now):
+        if self.start_time is None:
+            self.start(now)
+        due = (now - self.start_time) * self.fps // 1000
+        self.due = due
+        taken = 0
+        queued = self.ready.queue  # Only this thread takes from it, so peeking is safe
+        while queued and not self.ended:
+            entry = queued[0]
+            if entry is None:
+                self.ended = due > self.shown_frame  # Give the last frame its time on screen
+                break
+            number, slot = entry
+            if number > due:
+                break  # Not due yet: stays queued
+            self.ready.get_nowait()
+            if self.current is not None:
+                self.free.put(self.current)
+            self.current = slot
+            self.shown_frame = number
+            taken += 1
+        # An empty queue means decoding is behind: the last frame stays up rather than waiting
+        if taken:
+            self.shown += 1
+            self.dropped += taken - 1  # Due frames passed over for a later one
+        return self.current
+
+    def finished(self):
+        return self.ended
+
+    # Draw the frame due at now over the whole surface; returns False once the clip is over
+    def draw(self, surface, now):
+        image = self.frame(now)
+        if image is not None:
+            surface.blit(image, (0, 0))
+        elif not self.ended:
+            surface.fill(BLACK)  # Nothing decoded yet
+        return not self.ended
+
+    # Stop decoding and let go of the ring; safe to call more than once
+    def stop(self):
+        self.stopping = True
+        self.free.put(None)  # Wakes the worker if it is waiting for a slot
+        if self.process.poll() is None:
+            self.process.kill()  # Ends the worker's read too
+        self.thread.join()
+        self.process.stdout.close()
+        self.process.wait()
+        self.current = None
+
+    def stats(self):
+        return {"shown": self.shown, "dropped": self.dropped + self.skipped}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a cutscene the way the game does.")
+    parser.add_argument("video", nargs="?", default=DRAGON_TRANSFORM, help="video file (default: the dragon transformation)")
+    parser.add_argument("--fps", type=int, default=60, help="display frame rate cap (default: 60)")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Cutscene")
+    try:
+        cutscene = Cutscene(args.video, screen)
+    except RuntimeError as message:
+        print(f"Can't play the cutscene: {message}")
+        return 1
+    clock = pygame.time.Clock()
+    cutscene.start(pygame.time.get_ticks())
+    playing = True
+    while playing:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or event.type == pygame.KEYDOWN:
+                playing = False
+        playing = cutscene.draw(screen, pygame.time.get_ticks()) and playing
+        pygame.display.flip()
+        clock.tick(args.fps)
+    cutscene.stop()
+    stats = cutscene.stats()
+    print(f"{stats['shown']} frames shown, {stats['dropped']} dropped")
+    pygame.quit()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
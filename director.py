@@ -0,0 +1,179 @@
+# Spawn director: what spawns, where, and how fast.
+#
+# The spawners run on the world's scheduler as before, but every type now has a
+# population budget (Balance.fruit_budget, enemy_budget, boss_budget), so a long
+# session levels off instead of growing forever. New spawns go where their kind
+# is sparsest among a few random candidates, and enemies don't drop in right on
+# top of the player. Fruit that has lain uncollected for fruit_lifetime far from
+# the player is recycled: taken off the map, or moved somewhere fresh when the
+# fruit budget is full. Under load, set_throttle() stretches the spawn intervals
+# and shrinks the enemy budget; LoadMonitor turns measured frame times into a
+# throttle level, and the game loop records each change so replays stay exact.
+
+import math
+
+from assets import SPRITE_SIZES
+from settings import WIDTH
+
+PLACEMENT_CANDIDATES = 4  # Random positions compared per spawn
+PLACEMENT_TRIES = 16  # Most random positions drawn per spawn while looking for candidates clear of the player
+CROWDING_RADIUS = 128  # Neighbours within this distance count against a candidate
+SAFE_DISTANCE = 200  # Enemies never spawn this close to the player
+RECYCLE_DISTANCE = WIDTH // 2  # Stale fruit closer to the player than this stays put
+MAX_THROTTLE = 3
+
+class SpawnDirector:
+    def __init__(self, world):
+        self.world = world
+        self.throttle = 0  # 0 = full rate; level n spawns n + 1 times slower
+        self.blocked = []  # Spawners waiting for a boss or Malakar to die
+        self.skipped = 0  # Spawns skipped because the type was at its budget
+        self.recycled = 0
+
+    # Schedule the spawners from the world's last spawn times
+    def start(self):
+        world = self.world
+        balance = world.balance
+        self.blocked = []
+        world.scheduler.at(world.fruit_spawn_time + balance.fruit_spawn_interval, self.fruit_spawner)
+        world.scheduler.at(world.enemy_spawn_time + balance.enemy_spawn_interval, self.enemy_spawner)
+        world.scheduler.at(world.bossenemy_spawn_time + balance.boss_spawn_interval, self.bossenemy_spawner)
+        world.scheduler.at(world.malakar_spawn_allowed_time, self.malakar_spawner, strict=True)
+
+    def set_throttle(self, level):
+        self.throttle = max(0, min(level, MAX_THROTTLE))
+
+    def interval(self, base):
+        return base * (1 + self.throttle)
+
+    # Top-left position for a new entity of the given image: the least crowded of a
+    # few random candidates, which with avoid_player all keep SAFE_DISTANCE from the player
+    def place(self, layer, margin, image_key, avoid_player=False):
+        world = self.world
+        rng = world.rng
+        width, height = world.bounds.size
+        sprite_width, sprite_height = SPRITE_SIZES[image_key]
+        player = world.player.rect.center
+        best = None
+        best_crowding = math.inf
+        candidates = 0
+        for _ in range(PLACEMENT_TRIES):
+            position = (rng.randint(0, width - margin), rng.randint(0, height - margin))
+            center = (position[0] + sprite_width // 2, position[1] + sprite_height // 2)
+            if avoid_player and math.dist(center, player) < SAFE_DISTANCE:
+                continue
+            crowding = len(world.space.within_radius(layer, center, CROWDING_RADIUS))
+            if crowding < best_crowding:
+                best, best_crowding = position, crowding
+            candidates += 1
+            if candidates == PLACEMENT_CANDIDATES:
+                break
+        if best is None:
+            # Every draw landed near the player (a small map, or bad luck): take the
+            # corner furthest from them, at least half the map's diagonal away
+            corners = [(x, y) for x in (0, width - margin) for y in (0, height - margin)]
+            best = max(corners, key=lambda corner: math.dist((corner[0] + sprite_width // 2, corner[1] + sprite_height // 2), player))
+        return best
+
+    # Fruit that has been lying around for fruit_lifetime out of the player's way
+    def stale_fruit(self, now):
+        world = self.world
+        lifetime = world.balance.fruit_lifetime
+        player = world.player.rect.center
+        return [fruit for fruit in world.fruits if now - fruit.born >= lifetime and math.dist(fruit.rect.center, player) >= RECYCLE_DISTANCE]
+
+    # Spawners, run by the scheduler when their deadline comes up
+
+    # Spawn new fruit every 2 seconds (by default), up to the fruit budget
+    def fruit_spawner(self, now):
+        world = self.world
+        stale = self.stale_fruit(now)
+        budget = world.balance.fruit_budget
+        if len(world.fruits) - len(stale) >= budget:
+            self.skipped += 1
+        else:
+            position = self.place("fruit", 30, "gleamberry")
+            if len(world.fruits) >= budget:
+                stale.pop(0).kill()  # Make room: the new fruit takes a stale one's place
+                self.recycled += 1
+            world.spawn_fruit(position)
+        # Let the rest go once the map has plenty of fruit
+        if len(world.fruits) >= budget // 2:
+            for fruit in stale:
+                if fruit.alive():
+                    fruit.kill()
+                    self.recycled += 1
+        world.fruit_spawn_time = now
+        world.scheduler.at(now + self.interval(world.balance.fruit_spawn_interval), self.fruit_spawner)
+
+    # Spawn regular enemy every 2 seconds (by default), up to the enemy budget
+    def enemy_spawner(self, now):
+        world = self.world
+        if len(world.enemies) < world.balance.enemy_budget // (1 + self.throttle):
+            world.spawn_enemy(self.place("enemy", 45, "enemy", avoid_player=True))
+        else:
+            self.skipped += 1
+        world.enemy_spawn_time = now
+        world.scheduler.at(now + self.interval(world.balance.enemy_spawn_interval), self.enemy_spawner)
+
+    # Spawn boss enemy every 5 seconds (by default) while under the boss budget
+    def bossenemy_spawner(self, now):
+        world = self.world
+        if len(world.bossenemies) >= world.balance.boss_budget:
+            self.blocked.append(self.bossenemy_spawner)
+            return
+        world.spawn_bossenemy(self.place("enemy", 90, "bossenemy", avoid_player=True))
+        world.bossenemy_spawn_time = now
+        world.scheduler.at(now + self.interval(world.balance.boss_spawn_interval), self.bossenemy_spawner)
+
+    # Spawn Malakar if no boss enemies are present and allowed
+    def malakar_spawner(self, now):
+        world = self.world
+        if now <= world.malakar_spawn_allowed_time:
+            world.scheduler.at(world.malakar_spawn_allowed_time, self.malakar_spawner, strict=True)  # Delayed by a Malakar kill
+            return
+        if len(world.bossenemies) == 0 and len(world.malakar_group) == 0:
+            world.spawn_malakar(self.place("enemy", 90, "malakar", avoid_player=True))
+        self.blocked.append(self.malakar_spawner)
+
+    # A boss or Malakar died, which can unblock a spawner; let it check again on the next run
+    def unblock(self):
+        if self.blocked:
+            now = self.world.clock.now()
+            for spawner in self.blocked:
+                self.world.scheduler.at(now, spawner)
+            self.blocked.clear()
+
+    def stats(self):
+        return {"throttle": self.throttle, "skipped": self.skipped, "recycled": self.recycled}
+
+# Turns measured frame times into a throttle level for SpawnDirector.set_throttle.
+# The level goes up one when the smoothed frame time has been over budget_ms for
+# hold frames, and down one when it has been under 60% of it for as long.
+class LoadMonitor:
+    def __init__(self, budget_ms=12, hold=120, smoothing=0.05):
+        self.budget_ms = budget_ms
+        self.hold = hold
+        self.smoothing = smoothing
+        self.average = None
+        self.level = 0
+        self.streak = 0  # Frames in a row on the same side of the budget; negative when under
+
+    # Feed one frame's working time (without the frame cap's sleep); returns the level
+    def update(self, frame_ms):
+        if self.average is None:
+            self.average = frame_ms
+        self.average += (frame_ms - self.average) * self.smoothing
+        if self.average > self.budget_ms:
+            self.streak = max(self.streak, 0) + 1
+        elif self.average < self.budget_ms * 0.6:
+            self.streak = min(self.streak, 0) - 1
+        else:
+            self.streak = 0
+        if self.streak >= self.hold and self.level < MAX_THROTTLE:
+            self.level += 1
+            self.streak = 0
+        elif self.streak <= -self.hold and self.level > 0:
+            self.level -= 1
+            self.streak = 0
+        return self.level
@@ -0,0 +1,50 @@
+# Frame pacing for the game loop and menus.
+#
+# Screens that only change on input (the menus) block in wait() until an event
+# arrives instead of polling in a tight loop. The game loop ticks at the fps cap
+# while it is being played, and at idle_fps while paused or while the window is
+# unfocused or minimized, so an idle game barely uses any CPU.
+
+import pygame
+
+class FrameGovernor:
+    def __init__(self, clock, fps=60, idle_fps=15):
+        self.clock = clock
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.focused = True
+        self.minimized = False
+
+    # Track focus and minimize events; call with every event the game handles
+    def handle(self, event):
+        if event.type == pygame.WINDOWFOCUSLOST:
+            self.focused = False
+        elif event.type == pygame.WINDOWFOCUSGAINED:
+            self.focused = True
+        elif event.type == pygame.WINDOWMINIMIZED:
+            self.minimized = True
+        elif event.type in (pygame.WINDOWRESTORED, pygame.WINDOWMAXIMIZED):
+            self.minimized = False
+
+    # Events since the last call, without blocking
+    def events(self):
+        events = pygame.event.get()
+        for event in events:
+            self.handle(event)
+        return events
+
+    # Block until at least one event arrives (or timeout ms pass, if given), then return all pending events
+    def wait(self, timeout=0):
+        first = pygame.event.wait(timeout)
+        events = [] if first.type == pygame.NOEVENT else [first]
+        events.extend(pygame.event.get())
+        for event in events:
+            self.handle(event)
+        return events
+
+    def idle(self):
+        return not self.focused or self.minimized
+
+    # End a frame, sleeping to the frame rate cap; returns the frame time in ms
+    def tick(self, paused=False):
+        return self.clock.tick(self.idle_fps if paused or self.idle() else self.fps)
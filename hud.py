@@ -0,0 +1,139 @@
+# Retained-mode HUD.
+#
+# Each widget watches a few World/Player fields and keeps a prebuilt surface that
+# is only re-rendered when those fields change. Widgets live in regions (the stats
+# strip at the top, the inventory panel at the bottom); a region recomposes its
+# surface from the cached widget surfaces only when one of them changed, so a
+# normal frame costs one blit per region.
+
+import pygame
+
+from rendering import text_cache
+from settings import WIDTH, HEIGHT, PLAYABLE_HEIGHT, WHITE, GREEN, BLUE
+from simulation import FRUIT_TYPES
+
+_UNSET = object()
+
+# A watched value and the surface built from it
+class Widget:
+    def __init__(self, watch, build):
+        self.watch = watch  # world -> value; the widget is rebuilt whenever it changes
+        self.build = build  # value -> (surface or None, screen topleft)
+        self.value = _UNSET
+        self.surface = None
+        self.pos = (0, 0)
+        self.rebuilds = 0
+
+    def refresh(self, world):
+        value = self.watch(world)
+        if value == self.value:
+            return False
+        self.value = value
+        self.surface, self.pos = self.build(value)
+        self.rebuilds += 1
+        return True
+
+# Text widget centered on (x, y) like draw_text; fmt returns None to hide it
+def text_widget(watch, fmt, size, x, y, color):
+    def build(value):
+        text = fmt(value)
+        if text is None:
+            return None, (x, y)
+        text_surface = text_cache.render(text, size, color)
+        text_rect = text_surface.get_rect(midtop=(x, y))
+        return text_surface, text_rect.topleft
+    return Widget(watch, build)
+
+# One composited surface covering part of the screen
+class HudRegion:
+    def __init__(self, rect, widgets, fill=None):
+        self.rect = pygame.Rect(rect)
+        self.widgets = widgets
+        self.fill = fill
+        self.surface = pygame.Surface(self.rect.size, 0 if fill else pygame.SRCALPHA)
+        self.recomposes = 0
+        self.dirty = True  # Set on every recompose, for the dirty-rect renderer
+
+    def update(self, world):
+        changed = False
+        for widget in self.widgets:
+            if widget.refresh(world):
+                changed = True
+        if changed:
+            self.recompose()
+
+    def recompose(self):
+        self.surface.fill(self.fill if self.fill else (0, 0, 0, 0))
+        for widget in self.widgets:
+            if widget.surface is not None:
+                self.surface.blit(widget.surface, (widget.pos[0] - self.rect.x, widget.pos[1] - self.rect.y))
+        self.recomposes += 1
+        self.dirty = True
+
+    def draw(self, surface):
+        surface.blit(self.surface, self.rect)
+
+def collected_fruit(world):
+    if world.fruit_name_time is not None and world.clock.now() - world.fruit_name_time < 1000:  # Display fruit name for 1 second
+        return world.fruit_name
+    return None
+
+def build_legend(value):
+    legend_text = ["Arrow Keys: Move", "Spacebar: Attack", "N: Special Attack", "P: Pause"]
+    x = WIDTH - 150
+    y = HEIGHT - 50
+    lines = []
+    for line in legend_text:
+        text_surface = text_cache.render(line, 18, WHITE)
+        lines.append((text_surface, text_surface.get_rect(midtop=(x, y))))
+        y += 20
+    bounds = lines[0][1].unionall([rect for _, rect in lines])
+    legend = pygame.Surface(bounds.size, pygame.SRCALPHA)
+    for text_surface, rect in lines:
+        legend.blit(text_surface, (rect.x - bounds.x, rect.y - bounds.y))
+    return legend, bounds.topleft
+
+class Hud:
+    def __init__(self, images):
+        self.images = images
+        inventory_width = 50 * len(FRUIT_TYPES)
+        self.stats = HudRegion((0, 0, WIDTH, 70), [
+            text_widget(lambda w: w.player.speed, lambda v: f'Speed: {v}', 18, WIDTH - 100, 10, WHITE),
+            text_widget(lambda w: w.player.damage, lambda v: f'Damage: {v}', 18, WIDTH - 100, 30, WHITE),
+            text_widget(lambda w: w.player.damage_reduction, lambda v: f'Damage Reduction: {v}', 18, WIDTH - 100, 50, WHITE),
+            text_widget(lambda w: w.player.level, lambda v: f'Level: {v}', 18, 50, 10, WHITE),
+            text_widget(lambda w: w.player.experience, lambda v: f'Experience: {v}', 18, 150, 10, WHITE),
+            text_widget(lambda w: int(w.player.health), lambda v: f'Health: {v}', 18, 250, 10, WHITE),  # Display health as an integer
+        ])
+        self.panel = HudRegion((0, PLAYABLE_HEIGHT, WIDTH, HEIGHT - PLAYABLE_HEIGHT), [
+            Widget(lambda w: tuple(w.player.inventory.values()), self.build_inventory),
+            text_widget(lambda w: w.player.invulnerable, lambda v: 'Status: Invulnerable' if v else None, 18, 10 + inventory_width + 30, PLAYABLE_HEIGHT + 10, GREEN),
+            Widget(lambda w: None, build_legend),
+            text_widget(collected_fruit, lambda v: None if v is None else f'Collected: {v}', 30, WIDTH // 2, PLAYABLE_HEIGHT + 10, GREEN),
+            text_widget(lambda w: w.player.invulnerable, lambda v: 'Status: Invulnerable' if v else None, 18, WIDTH // 2, PLAYABLE_HEIGHT + 30, GREEN),
+        ], fill=BLUE)
+
+    # Fruit icons with their inventory counts, on the panel color so counts blend over icons as before
+    def build_inventory(self, counts):
+        inventory = pygame.Surface((50 * len(FRUIT_TYPES), 45))
+        inventory.fill(BLUE)
+        x_offset = 0
+        for (fruit, image_key), count in zip(FRUIT_TYPES, counts):
+            inventory.blit(self.images[image_key], (x_offset, 0))
+            count_surface = text_cache.render(str(count), 18, WHITE)
+            inventory.blit(count_surface, count_surface.get_rect(midtop=(x_offset + 30, 0)))
+            x_offset += 50
+        return inventory, (10, PLAYABLE_HEIGHT + 10)
+
+    def update(self, world):
+        self.stats.update(world)
+        self.panel.update(world)
+
+    def draw_panel(self, surface):
+        self.panel.draw(surface)
+
+    def draw_stats(self, surface):
+        self.stats.draw(surface)
+
+    def counters(self):
+        return {"stats_recomposes": self.stats.recomposes, "panel_recomposes": self.panel.recomposes}
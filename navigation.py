@@ -0,0 +1,151 @@
+# Shared flow-field navigation for chasing enemies.
+#
+# Instead of every enemy working out its own way to the player, one breadth-first
+# search from the target's grid cell gives every cell around it the direction of
+# its next step along a shortest path, around any blocked cells. Enemies then read
+# their direction from the cell their center stands in, so moving a thousand
+# enemies costs one search, not a thousand. There is a field towards the player
+# and one towards an active Flamefruit lure. Fields only reach radius cells from
+# the target: enemies further away, and those already in the target's cell, step
+# straight at the target as before. On open ground (no blocked cells) no search
+# is needed at all: the first step of a shortest path is straight at the
+# target's cell.
+#
+# Searches are incremental. When the target crosses into a neighbouring cell,
+# the field starts a new search but keeps the finished one, and Navigation.update
+# advances the new search by a fixed number of cells each step. Cells the new
+# search has reached (nearest the target first) already read from it; the rest
+# keep following the old field, which leads to the old target one cell away, until
+# the search completes a few steps later. So a moving target costs a bounded
+# amount of search per step however large the field, and no step pays for a
+# whole rebuild. Only a field with nothing to fall back on (the first search, or
+# after the target jumped or the blocked cells changed) is finished on the spot.
+
+from collections import deque
+
+CELL_SIZE = 32
+SEARCH_BUDGET = 256  # Cells a pending search settles per step; a full 33x33 field takes five steps
+# Straight steps first, so ties between equally short paths go to the straighter one
+NEIGHBORS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+class FlowField:
+    def __init__(self, world, radius, cell_size=CELL_SIZE, budget=SEARCH_BUDGET):
+        self.world = world
+        self.radius = radius  # In cells
+        self.cell_size = cell_size
+        self.budget = budget
+        self.blocked = set()  # Cells nothing can walk through
+        self.target = None  # Target cell
+        self.flow = None  # cell -> (dx, dy) step towards the target of the last finished search
+        self.search = None  # (flow, frontier, window) of the search towards the current target, while it runs
+        self.builds = 0  # Searches finished
+        self.settled = 0  # Cells searched, over all searches
+
+    def cell(self, point):
+        return int(point[0]) // self.cell_size, int(point[1]) // self.cell_size
+
+    # Point the field at a new target (or None); cheap when the target stays in its cell
+    def retarget(self, point):
+        cell = None if point is None else self.cell(point)
+        if cell == self.target:
+            return
+        previous = self.target
+        self.target = cell
+        self.search = None
+        if cell is None or not self.blocked:
+            return
+        if previous is None or max(abs(cell[0] - previous[0]), abs(cell[1] - previous[1])) > 1:
+            self.flow = None  # The old field leads too far off to stand in for the new one
+        self.start()
+
+    def set_blocked(self, cells):
+        self.blocked = set(cells)
+        self.flow = None
+        self.search = None
+        if self.target is not None and self.blocked:
+            self.start()
+
+    # Step direction for something standing at point, or None where the field has none
+    # (outside its radius, in the target's cell, or cut off from the target)
+    def direction(self, point):
+        target = self.target
+        if target is None:
+            return None
+        size = self.cell_size
+        x, y = int(point[0]) // size, int(point[1]) // size
+        if not self.blocked:
+            tx, ty = target
+            if x == tx and y == ty:
+                return None
+            return (tx > x) - (tx < x), (ty > y) - (ty < y)
+        if self.search is not None:
+            flow = self.search[0]
+            if (x, y) in flow:
+                return flow[(x, y)]
+            if self.flow is None:
+                self.advance(None)  # Nothing to fall back on: finish the search now
+                return self.flow.get((x, y))
+        return self.flow.get((x, y)) if self.flow is not None else None
+
+    def start(self):
+        tx, ty = self.target
+        bounds = self.world.bounds
+        last_col = (bounds.width - 1) // self.cell_size
+        last_row = (bounds.height - 1) // self.cell_size
+        window = (max(0, tx - self.radius), min(last_col, tx + self.radius), max(0, ty - self.radius), min(last_row, ty + self.radius))
+        self.search = ({self.target: None}, deque([self.target]), window)
+
+    # Settle up to budget more cells of the pending search (all of them for None)
+    def advance(self, budget=0):
+        if self.search is None:
+            return
+        if budget == 0:
+            budget = self.budget
+        flow, frontier, (x0, x1, y0, y1) = self.search
+        blocked = self.blocked
+        settled = 0
+        while frontier and (budget is None or settled < budget):
+            x, y = frontier.popleft()
+            settled += 1
+            for dx, dy in NEIGHBORS:
+                nx, ny = x + dx, y + dy
+                if (nx, ny) in flow or not (x0 <= nx <= x1 and y0 <= ny <= y1) or (nx, ny) in blocked:
+                    continue
+                if dx and dy and ((nx, y) in blocked or (x, ny) in blocked):
+                    continue  # Don't cut corners
+                flow[(nx, ny)] = (-dx, -dy)  # Back the way the search came
+                frontier.append((nx, ny))
+        self.settled += settled
+        if not frontier:
+            self.flow = flow
+            self.search = None
+            self.builds += 1
+
+    # Finish the pending search now
+    def build(self):
+        if self.search is None and self.target is not None:
+            self.start()
+        self.advance(None)
+
+# The world's fields: towards the player and towards the Flamefruit lure
+class Navigation:
+    def __init__(self, world, radius=16):
+        self.world = world
+        self.chase = FlowField(world, radius)  # 16 cells reach past Malakar's aggro range
+        self.lure = FlowField(world, radius)
+
+    # Cells enemies have to find their way around, e.g. terrain
+    def set_blocked(self, cells):
+        self.chase.set_blocked(cells)
+        self.lure.set_blocked(cells)
+
+    # Call once a step, before enemies move
+    def update(self):
+        player = self.world.player
+        self.chase.retarget(player.rect.center)
+        self.lure.retarget(player.flamefruit_position if player.flamefruit_active else None)
+        self.chase.advance()
+        self.lure.advance()
+
+    def stats(self):
+        return {"chase_builds": self.chase.builds, "lure_builds": self.lure.builds, "cells_searched": self.chase.settled + self.lure.settled}
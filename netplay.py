@@ -0,0 +1,726 @@
+# Headless server and thin rendering clients on a local socket.
+#
+# The server owns the only World and steps it in real time at the fixed
+# simulation rate; clients draw what it sends them and send back their input.
+# The first client to connect plays (arrow keys, SPACE, N, P and the upgrade
+# keys), the others spectate, and the oldest spectator takes over when the
+# player leaves; it is told so, and starts sending its keys. Clients opened
+# with watch never play:
+#
+#   python netplay.py serve --seed 7              # headless server on port 7777
+#   python netplay.py play                        # a window that plays
+#   python netplay.py watch                       # a window that spectates
+#   python netplay.py loopback --world 6000x6000 --crawlers 2000  # server and a scripted client in one process, checked against each other
+#
+# Every few steps each client gets a snapshot: the player's state in full, and the
+# enemies, fruit and ripples as a delta against the last snapshot that client
+# acknowledged (records added or changed since, ids gone since). Entities are
+# quantized to fixed 11-byte records (16-bit position, health as a fraction of
+# 255, kind and flags), so a snapshot costs bytes for what changed rather than
+# for what exists. A client that falls behind has snapshots skipped instead of
+# queued; the next one it gets is a delta against whatever it acknowledged last.
+
+import argparse
+import itertools
+import random
+import selectors
+import socket
+import struct
+import sys
+import time
+from collections import OrderedDict
+
+import pygame
+
+import replay
+from assets import SPRITE_SIZES, tint_cache
+from camera import parse_size
+from settings import WIDTH, HEIGHT, PLAYABLE_HEIGHT
+from simulation import ARCHETYPES, ENEMY_GROUPS, FRUIT_TYPES, STEP_MS, FixedTimestep, ManualClock, World
+from spatial import SpatialHash
+
+DEFAULT_PORT = 7777
+HISTORY = 32  # Snapshots back a delta can reach; clients further behind get a full one
+RESCAN = 30  # Snapshots it takes to re-check every entity
+MAX_BACKLOG = 256 * 1024  # Unsent bytes after which a client's snapshots are skipped
+MAX_COORDINATE = 32767  # Positions are sent as signed 16-bit numbers
+
+# Messages: type and payload length, then the payload
+MESSAGE = struct.Struct("<BI")
+HELLO = 1  # Server -> client: world size and role
+SNAPSHOT = 2  # Server -> client
+INPUT = 3  # Client -> server: acknowledged snapshot and replay.pack_input byte, once a frame
+EVENT = 4  # Client -> server: replay event kind and value (SPECIAL_ATTACK, PAUSE, UPGRADE)
+ROLE = 5  # Server -> client: the client's role changed
+WATCH = 6  # Client -> server: only ever spectate
+
+HELLO_BODY = struct.Struct("<IIB")  # world width, height, role
+INPUT_BODY = struct.Struct("<IB")  # acknowledged snapshot id, input byte
+EVENT_BODY = struct.Struct("<BB")  # kind, value
+ROLE_BODY = struct.Struct("<B")  # role
+SNAPSHOT_HEADER = struct.Struct("<IIId")  # snapshot id, baseline id (0: none), world frame, world time
+# x, y, health, max health, speed, damage, damage reduction, level, experience,
+# inventory, flags, collected fruit (255: none) and ms since it was collected
+PLAYER_STATE = struct.Struct(f"<hhiIHIHHI{len(FRUIT_TYPES)}HBBI")
+COUNTS = struct.Struct("<II")  # removed ids, changed records
+REMOVED = struct.Struct("<I")
+ENTITY = struct.Struct("<IBBhhB")  # id, kind, flags, x, y, health fraction
+
+PLAYER = 0
+SPECTATOR = 1
+
+# Player flags
+INVULNERABLE = 1
+PAUSED = 2
+# Entity flags
+FROZEN = 1
+
+# Entity kinds: (layer, image key, World group), enemies first in ARCHETYPES order
+KINDS = [("enemy", archetype.image_key, archetype.group) for archetype in ARCHETYPES.values()]
+KINDS += [("fruit", image_key, "fruits") for _, image_key in FRUIT_TYPES]
+KINDS += [("ripple", "ripple", None)]
+ENEMY_KINDS = {name: kind for kind, name in enumerate(ARCHETYPES)}
+FRUIT_KINDS = {name: len(ARCHETYPES) + i for i, (name, _) in enumerate(FRUIT_TYPES)}
+FRUIT_NAMES = [name for name, _ in FRUIT_TYPES]
+RIPPLE_KIND = len(KINDS) - 1
+
+def message(kind, payload=b""):
+    return MESSAGE.pack(kind, len(payload)) + payload
+
+# Complete messages at the front of buffer, which is consumed
+def read_messages(buffer):
+    messages = []
+    offset = 0
+    while len(buffer) - offset >= MESSAGE.size:
+        kind, length = MESSAGE.unpack_from(buffer, offset)
+        end = offset + MESSAGE.size + length
+        if len(buffer) < end:
+            break
+        messages.append((kind, bytes(buffer[offset + MESSAGE.size:end])))
+        offset = end
+    del buffer[:offset]
+    return messages
+
+# Quantized record of one entity: (kind, flags, x, y, health fraction)
+def entity_record(sprite, now):
+    x, y = sprite.rect.topleft
+    if sprite.space_layer == "enemy":
+        fraction = min(max(round(255 * sprite.health / sprite.max_health), 0), 255)
+        return ENEMY_KINDS[sprite.archetype.name], FROZEN if sprite.freeze_end_time > now else 0, x, y, fraction
+    if sprite.space_layer == "fruit":
+        return FRUIT_KINDS[sprite.name], 0, x, y, 255
+    return RIPPLE_KIND, 0, x, y, 255
+
+def player_state(world, paused):
+    player = world.player
+    now = world.clock.now()
+    flags = (INVULNERABLE if player.invulnerable else 0) | (PAUSED if paused else 0)
+    if world.fruit_name_time is None:
+        fruit, age = 255, 0
+    else:
+        fruit, age = FRUIT_NAMES.index(world.fruit_name), min(int(now - world.fruit_name_time), 0xFFFFFFFF)
+    # Float Balance factors can make the stats fractional; the HUD shows them rounded
+    return (*player.rect.topleft, int(player.health), round(player.max_health), round(player.speed), round(player.damage), round(player.damage_reduction),
+            player.level, player.experience, *player.inventory.values(), flags, fruit, age)
+
+# Payload of a snapshot of state (id -> entity record). With a baseline, only the
+# ids in touched (everything changed since the baseline) are sent.
+def encode_snapshot(snapshot_id, baseline_id, world, player, state, touched=None):
+    if touched is None:
+        removed = []
+        changed = list(state.items())
+    else:
+        get = state.get
+        removed = [entity_id for entity_id in touched if entity_id not in state]
+        changed = [(entity_id, get(entity_id)) for entity_id in sorted(touched) if entity_id in state]  # Oldest first, as drawn
+    parts = [SNAPSHOT_HEADER.pack(snapshot_id, baseline_id, world.frame, world.clock.now()), PLAYER_STATE.pack(*player), COUNTS.pack(len(removed), len(changed))]
+    parts.extend(REMOVED.pack(entity_id) for entity_id in removed)
+    pack = ENTITY.pack
+    parts.extend(pack(entity_id, *record) for entity_id, record in changed)
+    return b"".join(parts)
+
+def decode_snapshot(payload):
+    snapshot_id, baseline_id, frame, now = SNAPSHOT_HEADER.unpack_from(payload)
+    offset = SNAPSHOT_HEADER.size
+    player = PLAYER_STATE.unpack_from(payload, offset)
+    offset += PLAYER_STATE.size
+    removed_count, changed_count = COUNTS.unpack_from(payload, offset)
+    offset += COUNTS.size
+    removed = [entity_id for (entity_id,) in REMOVED.iter_unpack(payload[offset:offset + removed_count * REMOVED.size])]
+    offset += removed_count * REMOVED.size
+    changed = [(entity_id, record) for entity_id, *record in ENTITY.iter_unpack(payload[offset:offset + changed_count * ENTITY.size])]
+    return snapshot_id, baseline_id, frame, now, player, removed, [(entity_id, tuple(record)) for entity_id, record in changed]
+
+# A client as the server sees it
+class Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        self.input = replay.pack_input(0, 0, False)
+        self.ack = 0  # Latest snapshot the client has; 0 until it has one
+        self.role = None  # As last told to the client
+        self.watching = False  # Asked never to play
+        self.skipped = 0
+
+    def flush(self):
+        if self.outbox:
+            try:
+                sent = self.sock.send(self.outbox)
+            except BlockingIOError:
+                return
+            except ConnectionError:
+                self.outbox.clear()  # Gone; Server.receive drops it on the next poll
+                return
+            del self.outbox[:sent]
+
+class Server:
+    def __init__(self, world, host="127.0.0.1", port=DEFAULT_PORT, snapshot_every=2, recording=None):
+        if max(world.bounds.size) > MAX_COORDINATE:
+            raise ValueError(f"Worlds larger than {MAX_COORDINATE} pixels across can't be sent")
+        self.world = world
+        self.snapshot_every = snapshot_every  # Steps between snapshots
+        self.recording = recording
+        self.selector = selectors.DefaultSelector()
+        self.listener = socket.create_server((host, port))
+        self.listener.setblocking(False)
+        self.address = self.listener.getsockname()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.connections = []  # The first one plays
+        self.paused = False
+        self.steps = 0
+        self.entries = {}  # sprite -> (entity id, record) as last captured
+        self.next_id = 1
+        self.snapshot_id = 0
+        self.state = {}  # entity id -> record, as last captured
+        self.changes = OrderedDict()  # snapshot id -> ids whose record changed (or that went) since the one before
+        self.bytes_sent = 0
+        self.snapshots_sent = 0
+        self.encode_seconds = 0.0
+
+    # The connection that plays: the oldest one not watching
+    @property
+    def pilot(self):
+        return next((connection for connection in self.connections if not connection.watching), None)
+
+    # Accept clients and handle their messages, waiting up to timeout seconds for any
+    def poll(self, timeout=0):
+        for key, _ in self.selector.select(timeout):
+            if key.fileobj is self.listener:
+                self.accept()
+            else:
+                self.receive(key.data)
+        for connection in self.connections:
+            connection.flush()
+
+    def accept(self):
+        sock, _ = self.listener.accept()
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = Connection(sock)
+        self.connections.append(connection)
+        self.selector.register(sock, selectors.EVENT_READ, connection)
+        connection.role = PLAYER if connection is self.pilot else SPECTATOR
+        connection.outbox += message(HELLO, HELLO_BODY.pack(*self.world.bounds.size, connection.role))
+
+    def drop(self, connection):
+        self.selector.unregister(connection.sock)
+        connection.sock.close()
+        self.connections.remove(connection)
+        self.update_roles()
+
+    # Tell every client whose role changed (after the player left, or asked only to watch)
+    def update_roles(self):
+        pilot = self.pilot
+        for connection in self.connections:
+            role = PLAYER if connection is pilot else SPECTATOR
+            if role != connection.role:
+                connection.role = role
+                connection.input = replay.pack_input(0, 0, False)  # Nothing held until its own input arrives
+                connection.outbox += message(ROLE, ROLE_BODY.pack(role))
+                connection.flush()
+
+    def receive(self, connection):
+        try:
+            data = connection.sock.recv(65536)
+        except ConnectionError:
+            data = b""
+        if not data:
+            self.drop(connection)
+            return
+        connection.inbox += data
+        for kind, payload in read_messages(connection.inbox):
+            if kind == INPUT:
+                ack, connection.input = INPUT_BODY.unpack(payload)
+                connection.ack = max(connection.ack, ack)
+            elif kind == EVENT and connection is self.pilot:
+                self.event(*EVENT_BODY.unpack(payload))
+            elif kind == WATCH and not connection.watching:
+                connection.watching = True
+                self.update_roles()
+
+    # A player's event, checked here rather than trusted to the client: as in the
+    # game, upgrades only from the pause menu and special attacks only while playing
+    def event(self, kind, value):
+        if kind == replay.PAUSE:
+            self.paused = not self.paused
+        elif kind == replay.UPGRADE and self.paused:
+            replay.apply_event(self.world, kind, value)
+        elif kind == replay.SPECIAL_ATTACK and not self.paused:
+            replay.apply_event(self.world, kind, value)
+        else:
+            return  # Not allowed now, or not a client's to send (THROTTLE)
+        if self.recording is not None:
+            self.recording.event(kind, value)
+
+    # Advance the world one step on the player's input, and send snapshots when due
+    def step(self):
+        world = self.world
+        if not self.paused and self.pilot is not None:
+            dx, dy, attack = replay.unpack_input(self.pilot.input)
+            if self.recording is not None:
+                self.recording.step(dx, dy, attack)
+            world.step(STEP_MS, dx, dy, attack)
+        self.steps += 1
+        if self.steps % self.snapshot_every == 0:
+            self.broadcast()
+
+    # Bring self.state up to date; returns the ids that changed or went. Entities
+    # that can change between two snapshots (awake ones, fruit, new ones) are
+    # recorded every time, and everything else a slice at a time, so the odd
+    # change outside those (a sleeping enemy's freeze wearing off) shows up
+    # within RESCAN snapshots.
+    def capture(self):
+        world = self.world
+        now = world.clock.now()
+        entries = self.entries
+        state = self.state
+        sprites = world.all_sprites.spritedict
+        changed = set()
+        for sprite in entries.keys() - sprites.keys():
+            entity_id = entries.pop(sprite)[0]
+            del state[entity_id]
+            changed.add(entity_id)
+        rescan = list(entries)[self.snapshot_id % RESCAN::RESCAN]
+        for sprite in itertools.chain(sprites.keys() - entries.keys(), world.active, world.fruits, rescan):
+            if sprite is world.player:
+                continue
+            record = entity_record(sprite, now)
+            entry = entries.get(sprite)
+            if entry is None:
+                entity_id = self.next_id
+                self.next_id += 1
+            elif entry[1] != record:
+                entity_id = entry[0]
+            else:
+                continue
+            entries[sprite] = (entity_id, record)
+            state[entity_id] = record
+            changed.add(entity_id)
+        return changed
+
+    # Ids changed since the baseline snapshot, or None when it is too old to know
+    def touched_since(self, baseline_id):
+        if baseline_id == 0 or baseline_id + 1 not in self.changes:
+            return None
+        touched = set()
+        for snapshot_id in range(baseline_id + 1, self.snapshot_id + 1):
+            touched |= self.changes[snapshot_id]
+        return touched
+
+    def broadcast(self):
+        if not self.connections:
+            return
+        start = time.perf_counter()
+        self.snapshot_id += 1
+        self.changes[self.snapshot_id] = self.capture()
+        if len(self.changes) > HISTORY:
+            self.changes.popitem(last=False)
+        player = player_state(self.world, self.paused)
+        for connection in self.connections:
+            if len(connection.outbox) > MAX_BACKLOG:
+                connection.skipped += 1  # Not reading: don't pile up more
+                continue
+            touched = self.touched_since(connection.ack)
+            payload = encode_snapshot(self.snapshot_id, connection.ack if touched is not None else 0, self.world, player, self.state, touched)
+            connection.outbox += message(SNAPSHOT, payload)
+            self.bytes_sent += MESSAGE.size + len(payload)
+            self.snapshots_sent += 1
+            connection.flush()
+        self.encode_seconds += time.perf_counter() - start
+
+    # Serve in real time until interrupted (or for max_steps steps)
+    def run(self, max_steps=None):
+        timestep = FixedTimestep()
+        last = time.perf_counter()
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            self.poll(max(0.0, (timestep.step - timestep.accumulator) / 1000))
+            now = time.perf_counter()
+            for _ in range(timestep.advance((now - last) * 1000)):
+                self.step()
+                steps += 1
+            last = now
+
+    def stats(self):
+        return {"clients": len(self.connections), "snapshots": self.snapshots_sent, "bytes": self.bytes_sent,
+                "skipped": sum(connection.skipped for connection in self.connections), "encode_ms": round(self.encode_seconds * 1000, 3)}
+
+    def close(self):
+        for connection in list(self.connections):
+            self.drop(connection)
+        self.selector.close()
+        self.listener.close()
+
+# Client-side stand-ins for World entities: what the renderer and the HUD read
+class RemoteSprite(pygame.sprite.Sprite):
+    space_layer = None
+
+    def __init__(self, kind, images):
+        super().__init__()
+        self.kind = kind
+        self.space_layer, image_key, self.group = KINDS[kind]
+        self.rect = pygame.Rect((0, 0), SPRITE_SIZES[image_key])
+        self.default_image = images[image_key] if images is not None else None
+        self.image = self.default_image
+        self.health = self.max_health = 255  # Fractions of 255, as sent
+
+    def apply(self, record):
+        kind, flags, x, y, self.health = record
+        self.rect.topleft = (x, y)
+        if self.default_image is not None:
+            self.image = tint_cache.get(self.default_image, "frozen") if flags & FROZEN else self.default_image
+
+class RemotePlayer(pygame.sprite.Sprite):
+    space_layer = "player"
+
+    def __init__(self, images):
+        super().__init__()
+        self.images = images
+        self.rect = pygame.Rect((0, 0), SPRITE_SIZES["luminara"])
+        self.image = images["luminara"] if images is not None else None
+        self.inventory = {name: 0 for name in FRUIT_NAMES}
+        self.invulnerable = False
+        self.health = self.max_health = 100
+        self.speed = self.damage = self.damage_reduction = self.experience = 0
+        self.level = 1
+
+    def apply(self, state):
+        x, y, self.health, self.max_health, self.speed, self.damage, self.damage_reduction, self.level, self.experience = state[:9]
+        self.rect.topleft = (x, y)
+        self.inventory = dict(zip(FRUIT_NAMES, state[9:9 + len(FRUIT_NAMES)]))
+        self.invulnerable = bool(state[9 + len(FRUIT_NAMES)] & INVULNERABLE)
+        if self.images is not None:
+            self.image = self.images["luminara_invuln" if self.invulnerable else "luminara"]
+
+# The world as the last snapshot showed it, with the attributes draw_world and Hud read
+class RemoteWorld:
+    def __init__(self, size, images=None):
+        self.images = images
+        self.bounds = pygame.Rect((0, 0), size)
+        self.clock = ManualClock()
+        self.frame = 0
+        self.paused = False
+        self.player = RemotePlayer(images)
+        self.all_sprites = pygame.sprite.Group(self.player)
+        self.fruits = pygame.sprite.Group()
+        for group in ENEMY_GROUPS:
+            setattr(self, group, pygame.sprite.Group())
+        self.space = SpatialHash()
+        self.space.insert(self.player, "player")
+        self.entities = {}  # id -> RemoteSprite
+        self.state = {}  # id -> record shown
+        self.fruit_name = ""
+        self.fruit_name_time = None
+
+    @property
+    def game_over(self):
+        return self.player.health <= 0
+
+    @property
+    def game_won(self):
+        return self.player.level >= 100
+
+    def enemy_groups(self):
+        return [getattr(self, group) for group in ENEMY_GROUPS]
+
+    # Show a decoded snapshot's world time, player and entity records. touched is
+    # every id that may differ from what is shown, or None to compare them all.
+    def apply(self, frame, now, player, state, touched=None):
+        self.frame = frame
+        self.clock.time = now
+        self.player.apply(player)
+        self.space.move(self.player)
+        flags, fruit, age = player[-3:]
+        self.paused = bool(flags & PAUSED)
+        if fruit != 255:
+            self.fruit_name, self.fruit_name_time = FRUIT_NAMES[fruit], now - age
+        if touched is None:
+            touched = self.state.keys() | state.keys()
+        shown = self.state.get
+        for entity_id in sorted(touched):  # Oldest first, as the server draws them
+            record = state.get(entity_id)
+            if record is None:
+                if entity_id in self.entities:
+                    self.remove(entity_id)
+                continue
+            if shown(entity_id) == record:
+                continue
+            sprite = self.entities.get(entity_id)
+            if sprite is not None and sprite.kind != record[0]:
+                self.remove(entity_id)  # A recycled entity came back as something else
+                sprite = None
+            if sprite is None:
+                sprite = self.entities[entity_id] = RemoteSprite(record[0], self.images)
+                sprite.apply(record)
+                self.all_sprites.add(sprite)
+                if sprite.group is not None:
+                    getattr(self, sprite.group).add(sprite)
+                self.space.insert(sprite, sprite.space_layer)
+            else:
+                sprite.apply(record)
+                self.space.move(sprite)
+        self.state = state
+
+    def remove(self, entity_id):
+        sprite = self.entities.pop(entity_id)
+        sprite.kill()
+        self.space.remove(sprite)
+
+# watch=True asks the server never to make this client the player
+class Client:
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, images=None, timeout=5, watch=False):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.images = images
+        self.inbox = bytearray()
+        self.world = None  # RemoteWorld, once the server said hello
+        self.role = None
+        self.states = OrderedDict()  # snapshot id -> (entity records, ids its message carried), for baselines
+        self.snapshot_id = 0
+        self.bytes_received = 0
+        self.snapshots = 0
+        if watch:
+            self.send(message(WATCH))
+        self.sock.setblocking(False)
+
+    # Read whatever has arrived; returns False once the server is gone
+    def receive(self):
+        try:
+            data = self.sock.recv(1 << 20)
+        except BlockingIOError:
+            return True
+        if not data:
+            return False
+        self.bytes_received += len(data)
+        self.inbox += data
+        for kind, payload in read_messages(self.inbox):
+            if kind == HELLO:
+                width, height, self.role = HELLO_BODY.unpack(payload)
+                self.world = RemoteWorld((width, height), self.images)
+            elif kind == ROLE:
+                (self.role,) = ROLE_BODY.unpack(payload)
+            elif kind == SNAPSHOT:
+                self.apply(payload)
+        return True
+
+    def apply(self, payload):
+        snapshot_id, baseline_id, frame, now, player, removed, changed = decode_snapshot(payload)
+        ids = set(removed)
+        ids.update(entity_id for entity_id, _ in changed)
+        if baseline_id:
+            state = dict(self.states[baseline_id][0])
+            # What is shown differs from the baseline only in ids carried since
+            touched = ids.union(*(carried for shown_id, (_, carried) in self.states.items() if shown_id > baseline_id))
+        else:
+            state = {}
+            touched = None
+        for entity_id in removed:
+            state.pop(entity_id, None)
+        state.update(changed)
+        self.states[snapshot_id] = (state, ids)
+        while len(self.states) > HISTORY:
+            self.states.popitem(last=False)
+        self.snapshot_id = snapshot_id
+        self.snapshots += 1
+        self.world.apply(frame, now, player, state, touched)
+
+    # Wait for the server's hello (and with it self.world)
+    def wait_for_world(self, timeout=5):
+        deadline = time.perf_counter() + timeout
+        while self.world is None:
+            if not self.receive() or time.perf_counter() > deadline:
+                raise ConnectionError("No hello from the server")
+            time.sleep(0.01)
+        return self.world
+
+    # Send this frame's input, acknowledging the latest snapshot
+    def send_input(self, dx, dy, attack):
+        self.send(message(INPUT, INPUT_BODY.pack(self.snapshot_id, replay.pack_input(dx, dy, attack))))
+
+    def send_event(self, kind, value=0):
+        self.send(message(EVENT, EVENT_BODY.pack(kind, value)))
+
+    def send(self, data):
+        self.sock.setblocking(True)
+        try:
+            self.sock.sendall(data)
+        finally:
+            self.sock.setblocking(False)
+
+    def close(self):
+        self.sock.close()
+
+UPGRADE_KEYS = {pygame.K_1: 1, pygame.K_2: 2, pygame.K_3: 3, pygame.K_4: 4, pygame.K_5: 5}
+UPGRADE_LINES = ["1: Max Health (Gleam Berry)", "2: Speed (Shimmering Apple)", "3: Level (Ethereal Pear)", "4: Damage Reduction (Flamefruit)", "5: Damage (Moonbeam Melon)", "P: Resume"]
+
+# Window that draws the server's world and, unless spectating, sends keyboard input
+def view(host, port, spectate, fps):
+    from assets import load_images
+    from camera import Camera
+    from hud import Hud
+    from rendering import draw_text, draw_world
+    from settings import WHITE, GREEN, RED, BLUE
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    images = load_images()
+    client = Client(host, port, images, watch=spectate)
+    world = client.wait_for_world()
+    playing = None
+    hud = Hud(images)
+    camera = Camera(images["background"]) if world.bounds.size != (WIDTH, PLAYABLE_HEIGHT) else None
+    clock = pygame.time.Clock()
+
+    running = True
+    while running:
+        if playing != (client.role == PLAYER):  # At the start, and when the server hands over
+            playing = client.role == PLAYER
+            pygame.display.set_caption("Elysian Grove Adventure" + ("" if playing else " (spectating)"))
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and playing:
+                if event.key == pygame.K_p:
+                    client.send_event(replay.PAUSE)
+                elif event.key == pygame.K_n and not world.paused:
+                    client.send_event(replay.SPECIAL_ATTACK)
+                elif event.key in UPGRADE_KEYS and world.paused:
+                    client.send_event(replay.UPGRADE, UPGRADE_KEYS[event.key])
+        if not client.receive():
+            print("The server closed the connection")
+            break
+        dx = dy = 0
+        attack = False
+        if playing:
+            keys = pygame.key.get_pressed()
+            dx = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+            dy = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+            attack = keys[pygame.K_SPACE]
+        client.send_input(dx, dy, attack)  # Spectators send it too: it carries the acknowledgement
+
+        if camera is not None:
+            camera.follow(world)
+        draw_world(screen, world, images, hud, camera)
+        if world.game_over:
+            draw_text(screen, 'GAME OVER', 50, WIDTH // 2, HEIGHT // 2, RED)
+        elif world.game_won:
+            draw_text(screen, 'YOU WIN', 50, WIDTH // 2, HEIGHT // 2, GREEN)
+        elif world.paused:
+            draw_text(screen, 'PAUSED', 50, WIDTH // 2, HEIGHT // 4, BLUE)
+            if playing:
+                for i, line in enumerate(UPGRADE_LINES):
+                    draw_text(screen, line, 30, WIDTH // 2, HEIGHT // 2 - 60 + 30 * i, WHITE)
+        pygame.display.flip()
+        clock.tick(fps)
+    client.close()
+    pygame.quit()
+
+# Server and scripted client in one process: every snapshot the client shows must
+# match what the server captured, quantization included
+def loopback(seed, steps, crawlers, snapshot_every, size=None):
+    from batch import fruit_seeker
+    from benchmark import add_crawlers, make_immortal
+
+    world = World(clock=ManualClock(), seed=seed, size=size)
+    if crawlers:
+        make_immortal(world)
+        add_crawlers(world, crawlers)
+    server = Server(world, port=0, snapshot_every=snapshot_every)
+    client = Client(*server.address)
+    while client.world is None:
+        server.poll(0.01)
+        client.receive()
+    policy = fruit_seeker(world, random.Random(seed))
+    for step in range(steps):
+        dx, dy, attack = policy(step)
+        client.send_input(dx, dy, attack)
+        server.poll()
+        sent = server.snapshot_id
+        server.step()
+        if server.snapshot_id == sent:
+            continue
+        while client.snapshot_id != server.snapshot_id:
+            server.poll()
+            client.receive()
+        if client.world.state != server.state:
+            raise AssertionError(f"Snapshot {client.snapshot_id}: the client's entities differ from the server's")
+        if client.world.player.rect.topleft != world.player.rect.topleft or client.world.player.health != int(world.player.health):
+            raise AssertionError(f"Snapshot {client.snapshot_id}: the client's player differs from the server's")
+        if world.game_over:
+            break
+
+    full = len(encode_snapshot(0, 0, world, player_state(world, False), server.state))
+    stats = server.stats()
+    client.close()
+    server.close()
+    print(f"{client.snapshots} snapshots over {world.frame} steps matched the server, {len(server.state)} entities at the end")
+    print(f"{stats['bytes'] / max(stats['snapshots'], 1):.0f} bytes per snapshot on average (a full one is {full} bytes), "
+          f"{stats['encode_ms'] / max(stats['snapshots'], 1):.3f} ms to capture and encode")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the game on a headless server with rendering clients on a local socket.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the headless server")
+    serve.add_argument("--seed", type=int, help="seed the world's random numbers (default: a random seed)")
+    serve.add_argument("--world", metavar="WxH", type=parse_size, help=f"a scrolling world of this size (default: {WIDTH}x{PLAYABLE_HEIGHT})")
+    serve.add_argument("--record", metavar="FILE", help="record the session's inputs for replay.py")
+    for command in (serve, commands.add_parser("play", help="open a window that plays"), commands.add_parser("watch", help="open a window that spectates")):
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--snapshot-every", type=int, default=2, help="simulation steps between snapshots (default: 2, i.e. 30 per second)")
+    for command in ("play", "watch"):
+        commands.choices[command].add_argument("--fps", type=int, default=60, help="frame rate cap (default: 60)")
+    check = commands.add_parser("loopback", help="check a scripted client against a server in this process")
+    check.add_argument("--seed", type=int, default=1)
+    check.add_argument("--steps", type=int, default=3600)
+    check.add_argument("--crawlers", type=int, default=0, help="extra Night Crawlers, with an immortal player")
+    check.add_argument("--snapshot-every", type=int, default=2)
+    check.add_argument("--world", metavar="WxH", type=parse_size, help="a scrolling world of this size")
+    args = parser.parse_args(argv)
+
+    if args.command == "loopback":
+        return loopback(args.seed, args.steps, args.crawlers, args.snapshot_every, args.world)
+    if args.command in ("play", "watch"):
+        view(args.host, args.port, args.command == "watch", args.fps)
+        return 0
+
+    seed = args.seed if args.seed is not None else random.getrandbits(63)
+    world = World(clock=ManualClock(), seed=seed, size=args.world)
+    recording = replay.Recording(seed, size=world.bounds.size) if args.record else None
+    server = Server(world, args.host, args.port, args.snapshot_every, recording)
+    print(f"Serving seed {seed} on {server.address[0]}:{server.address[1]}")
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Server stats: {server.stats()}")
+        server.close()
+        if recording is not None:
+            recording.write(args.record)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
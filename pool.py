@@ -0,0 +1,38 @@
+# Free lists of killed entities.
+#
+# World spawns go through acquire(), which hands back a killed entity of the
+# same class reinitialized with reset(*args) when one is available and only
+# constructs a new one otherwise; Entity.kill() puts entities back with
+# release(). In steady-state play spawns and kills balance out, so the game
+# stops allocating sprites, rects and group bookkeeping once the pools are warm.
+
+class EntityPool:
+    def __init__(self, limit=256):
+        self.limit = limit  # Most killed entities kept per class; the rest go to the GC
+        self.free = {}  # class -> [killed entity, ...]
+        self.created = {}  # class name -> entities constructed
+        self.reused = {}  # class name -> spawns served from the free list
+
+    # A ready-to-add entity of cls, as if built with cls(world, *args)
+    def acquire(self, cls, world, *args):
+        free = self.free.get(cls)
+        name = cls.__name__
+        if free:
+            entity = free.pop()
+            entity.reset(*args)
+            self.reused[name] = self.reused.get(name, 0) + 1
+        else:
+            entity = cls(world, *args)
+            self.created[name] = self.created.get(name, 0) + 1
+        return entity
+
+    def release(self, entity):
+        free = self.free.setdefault(type(entity), [])
+        if len(free) < self.limit:
+            free.append(entity)
+
+    # Per-class pool size and reuse figures
+    def stats(self):
+        names = sorted(set(self.created) | set(self.reused))
+        free = {cls.__name__: len(entities) for cls, entities in self.free.items()}
+        return {name: {"created": self.created.get(name, 0), "reused": self.reused.get(name, 0), "free": free.get(name, 0)} for name in names}
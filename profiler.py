@@ -0,0 +1,85 @@
+# Per-phase frame instrumentation.
+#
+# The game loop, World.step and draw_world wrap each phase of a frame in
+# "with frame_profiler.phase(name):". While the profiler is disabled that is a
+# shared no-op context; once enabled (by the F3 overlay or a trace file) each
+# phase's time is summed per frame and kept over a rolling window, and World.step
+# also times every entity type's update() separately. A trace file gets one JSON
+# line per frame, or Chrome trace events (chrome://tracing, Perfetto) when its
+# name ends in .json.
+
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_NULL_PHASE = nullcontext()
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.perf_counter())
+
+class FrameProfiler:
+    def __init__(self, window=120):
+        self.window = window  # Frames the rolling averages cover
+        self.overlay = False
+        self.history = {}  # phase -> deque of per-frame ms
+        self.current = {}  # phase -> ms so far this frame
+        self.frames = 0
+        self.origin = time.perf_counter()
+        self.trace = None
+        self.chrome = False
+
+    @property
+    def enabled(self):
+        return self.overlay or self.trace is not None
+
+    def phase(self, name):
+        return _Phase(self, name) if self.enabled else _NULL_PHASE
+
+    # Record a phase that ran from start to end (perf_counter seconds)
+    def add(self, name, start, end):
+        self.current[name] = self.current.get(name, 0.0) + (end - start) * 1000
+        if self.trace is not None and self.chrome:
+            event = {"name": name, "ph": "X", "pid": 1, "tid": 1, "ts": round((start - self.origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1)}
+            self.trace.write(json.dumps(event) + ",\n")
+
+    # Add ms to a phase without a trace event, for totals gathered piecemeal
+    def add_ms(self, name, ms):
+        self.current[name] = self.current.get(name, 0.0) + ms
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        for name in self.current.keys() - self.history.keys():
+            self.history[name] = deque(maxlen=self.window)
+        for name, samples in self.history.items():
+            samples.append(self.current.get(name, 0.0))
+        if self.trace is not None and not self.chrome:
+            self.trace.write(json.dumps({"frame": self.frames, "ms": {name: round(ms, 4) for name, ms in self.current.items()}}) + "\n")
+        self.current = {}
+        self.frames += 1
+
+    # Rolling mean ms per phase
+    def averages(self):
+        return {name: sum(samples) / len(samples) for name, samples in self.history.items() if samples}
+
+    def start_trace(self, path):
+        self.chrome = path.endswith(".json")
+        self.trace = open(path, "w")
+        if self.chrome:
+            self.trace.write("[\n")  # The trace viewers accept an unterminated array
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+frame_profiler = FrameProfiler()
@@ -0,0 +1,326 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pygame
+
+from profiler import frame_profiler
+from settings import WIDTH, HEIGHT, PLAYABLE_HEIGHT, WHITE, GREEN, RED, BLUE
+from simulation import ENEMY_GROUPS, FRUIT_TYPES
+
+def draw_inventory(surface, player, images):
+    pygame.draw.rect(surface, BLUE, (0, PLAYABLE_HEIGHT, WIDTH, HEIGHT - PLAYABLE_HEIGHT))
+
+    x_offset = 10
+    y_offset = PLAYABLE_HEIGHT + 10
+
+    for fruit, image_key in FRUIT_TYPES:
+        surface.blit(images[image_key], (x_offset, y_offset))
+        draw_text(surface, str(player.inventory[fruit]), 18, x_offset + 30, y_offset, WHITE)
+        x_offset += 50
+
+    # Display player status effects
+    if player.invulnerable:
+        draw_text(surface, 'Status: Invulnerable', 18, x_offset + 30, PLAYABLE_HEIGHT + 10, GREEN)
+
+def draw_legend(surface):
+    legend_text = ["Arrow Keys: Move", "Spacebar: Attack", "N: Special Attack", "P: Pause"]
+    x = WIDTH - 150
+    y = HEIGHT - 50
+    for line in legend_text:
+        draw_text(surface, line, 18, x, y, WHITE)
+        y += 20
+
+def draw_health_bar(surface, x, y, health, max_health, width, height, border=2):
+    if health < 0:
+        health = 0
+    fill = (health / max_health) * width
+    outline_rect = pygame.Rect(x, y, width, height)
+    fill_rect = pygame.Rect(x, y, fill, height)
+    pygame.draw.rect(surface, RED if health > max_health * 0.1 else WHITE, fill_rect)
+    pygame.draw.rect(surface, BLUE, outline_rect, border)
+
+# Screen area a health bar covers: its outline, or further right where overheal
+# (health above max_health, e.g. from an Ethereal Pear) runs the fill past it
+def health_bar_rect(x, y, health, max_health, width, height, border=2):
+    return pygame.Rect(x, y, max(width, (health / max_health) * width), height)
+
+# Fonts by size, and a bounded LRU of rendered text surfaces keyed by (text, size, color)
+class TextCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.SysFont(None, size)
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, tuple(color))
+        text_surface = self.surfaces.get(key)
+        if text_surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return text_surface
+        self.misses += 1
+        text_surface = self.font(size).render(text, True, color)
+        self.surfaces[key] = text_surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)  # Drop the least recently used string
+        return text_surface
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.surfaces), "fonts": len(self.fonts)}
+
+    def clear(self):
+        self.fonts.clear()
+        self.surfaces.clear()
+        self.hits = self.misses = 0
+
+text_cache = TextCache()
+
+def draw_text(surface, text, size, x, y, color):
+    text_surface = text_cache.render(text, size, color)
+    text_rect = text_surface.get_rect()
+    text_rect.midtop = (x, y)
+    surface.blit(text_surface, text_rect)
+
+# draw_health_bar arguments for every bar on screen, or only for the given sprites' bars
+def health_bars(world, sprites=None):
+    if sprites is None:
+        enemies = [enemy for group in world.enemy_groups() for enemy in group]
+    else:
+        enemies = [sprite for sprite in sprites if sprite.space_layer == "enemy"]
+
+    # Display enemy health as bars above enemy sprites
+    for enemy in enemies:
+        yield (enemy.rect.x, enemy.rect.y - 10, enemy.health, enemy.max_health, 40, 5)
+
+    # Display player health as a larger, more prominent bar
+    player = world.player
+    yield (player.rect.x - 10, player.rect.y - 15, player.health, player.max_health, 60, 10, 2)
+
+SNAP_DISTANCE = 32  # Sprites that jumped further than this in a step (respawns) are not interpolated
+
+# Every sprite's position, taken before a simulation step for interpolated()
+def positions(world):
+    return {sprite: sprite.rect.topleft for sprite in world.all_sprites}
+
+# Show every sprite alpha of the way from its previous position to its current
+# one for the duration of the with block. Only the rects move, so anything that
+# draws from them (sprites, health bars, the dirty-rect renderer) follows along.
+@contextmanager
+def interpolated(world, previous, alpha):
+    moved = []
+    if previous and alpha < 1:
+        for sprite in world.all_sprites:
+            old = previous.get(sprite)
+            if old is None:
+                continue
+            x, y = sprite.rect.topleft
+            old_x, old_y = old
+            if (old_x != x or old_y != y) and abs(x - old_x) <= SNAP_DISTANCE and abs(y - old_y) <= SNAP_DISTANCE:
+                moved.append((sprite, x, y))
+                sprite.rect.topleft = (round(old_x + (x - old_x) * alpha), round(old_y + (y - old_y) * alpha))
+    try:
+        yield
+    finally:
+        for sprite, x, y in moved:
+            sprite.rect.topleft = (x, y)
+
+# Draw one frame of the world (everything but the end-of-game and pause overlays).
+# With a hud.Hud the HUD is retained and only re-rendered when its inputs change.
+# With a camera.Camera only its view of the world is drawn.
+def draw_world(surface, world, images, hud=None, camera=None):
+    player = world.player
+    current_time = world.clock.now()
+
+    # Draw everything
+    if camera is None:
+        with frame_profiler.phase("draw.background"):
+            surface.blit(images["background"], (0, 0))  # Draw the background
+        with frame_profiler.phase("draw.sprites"):
+            world.all_sprites.draw(surface)
+        bars = health_bars(world)
+    else:
+        with frame_profiler.phase("draw.background"):
+            camera.background.draw(surface, camera.rect)
+        with frame_profiler.phase("draw.sprites"):
+            visible = camera.visible(world)
+            x, y = camera.rect.topleft
+            surface.blits([(sprite.image, sprite.rect.move(-x, -y)) for sprite in visible], False)
+        bars = [(bar_x - x, bar_y - y, *rest) for bar_x, bar_y, *rest in health_bars(world, visible)]
+    with frame_profiler.phase("draw.hud"):
+        if hud is not None:
+            hud.update(world)
+            hud.draw_panel(surface)
+        else:
+            draw_inventory(surface, player, images)
+            draw_legend(surface)
+
+    with frame_profiler.phase("draw.health_bars"):
+        for bar in bars:
+            draw_health_bar(surface, *bar)
+
+    if hud is not None:
+        with frame_profiler.phase("draw.hud"):
+            hud.draw_stats(surface)
+        return
+
+    # Draw player stats
+    with frame_profiler.phase("draw.hud"):
+        draw_text(surface, f'Speed: {player.speed}', 18, WIDTH - 100, 10, WHITE)
+        draw_text(surface, f'Damage: {player.damage}', 18, WIDTH - 100, 30, WHITE)
+        draw_text(surface, f'Damage Reduction: {player.damage_reduction}', 18, WIDTH - 100, 50, WHITE)
+
+        draw_text(surface, f'Level: {player.level}', 18, 50, 10, WHITE)
+        draw_text(surface, f'Experience: {player.experience}', 18, 150, 10, WHITE)
+        draw_text(surface, f'Health: {int(player.health)}', 18, 250, 10, WHITE)  # Display health as an integer
+
+        if world.fruit_name_time is not None and current_time - world.fruit_name_time < 1000:  # Display fruit name for 1 second
+            draw_text(surface, f'Collected: {world.fruit_name}', 30, WIDTH // 2, PLAYABLE_HEIGHT + 10, GREEN)
+
+        if player.invulnerable:
+            draw_text(surface, 'Status: Invulnerable', 18, WIDTH // 2, PLAYABLE_HEIGHT + 30, GREEN)
+
+# Merge overlapping rects so every pixel is restored and redrawn once
+def merge_rects(rects):
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+# Dirty-rectangle renderer, in the spirit of pygame's RenderUpdates/LayeredDirty.
+# It remembers what was drawn last frame (sprites, health bars, HUD regions),
+# restores the background only under what changed, redraws the layers clipped to
+# those areas and returns the rects for pygame.display.update(). When more than
+# max_dirty_fraction of the screen (or more than max_rects areas) changed it
+# redraws everything and returns None, meaning the caller should flip instead.
+class DirtyRenderer:
+    def __init__(self, images, hud, max_dirty_fraction=0.4, max_rects=64):
+        self.images = images
+        self.background = images["background"]
+        self.hud = hud
+        self.max_dirty_fraction = max_dirty_fraction
+        self.max_rects = max_rects
+        self.sprites = {}
+        self.bars = set()
+        self.full_redraw = True
+        self.damaged = []  # Areas drawn over outside the tracked layers
+        self.full_frames = 0
+        self.dirty_frames = 0
+
+    # Force a full redraw next frame, e.g. after a menu or overlay drew over the screen
+    def invalidate(self):
+        self.full_redraw = True
+
+    # Restore rect next frame, e.g. under an overlay that may move or disappear
+    def damage(self, rect):
+        self.damaged.append(pygame.Rect(rect))
+
+    def draw(self, surface, world):
+        self.hud.update(world)
+        dirty = self.damaged
+        self.damaged = []
+
+        sprites = {}
+        for sprite in world.all_sprites.sprites():
+            state = (sprite.image, tuple(sprite.rect))
+            sprites[sprite] = state
+            previous = self.sprites.pop(sprite, None)
+            if previous != state:
+                if previous is not None:
+                    dirty.append(pygame.Rect(previous[1]))
+                dirty.append(sprite.rect.copy())
+        for image, rect in self.sprites.values():  # Sprites gone since last frame
+            dirty.append(pygame.Rect(rect))
+        self.sprites = sprites
+
+        bar_list = list(health_bars(world))
+        bars = set(bar_list)
+        for bar in bars.symmetric_difference(self.bars):
+            dirty.append(health_bar_rect(*bar))
+        self.bars = bars
+
+        for region in (self.hud.panel, self.hud.stats):
+            if region.dirty:
+                dirty.append(region.rect.copy())
+                region.dirty = False
+
+        screen_rect = surface.get_rect()
+        dirty = merge_rects([rect for rect in dirty if rect.width and rect.height])
+        bar_rects = [health_bar_rect(*bar) for bar in bar_list]
+        # pygame.draw.rect outlines the clipped rect rather than the whole one, so grow
+        # the dirty areas until every health bar is either fully inside or fully outside
+        while True:
+            grown = [rect.unionall([bar_rects[i] for i in rect.collidelistall(bar_rects)]) for rect in dirty]
+            if grown == dirty:
+                break
+            dirty = merge_rects(grown)
+        dirty = [rect.clip(screen_rect) for rect in dirty]
+        dirty_area = sum(rect.width * rect.height for rect in dirty)
+        if self.full_redraw or len(dirty) > self.max_rects or dirty_area > self.max_dirty_fraction * screen_rect.width * screen_rect.height:
+            draw_world(surface, world, self.images, self.hud)
+            self.full_redraw = False
+            self.full_frames += 1
+            return None
+
+        sprite_list = list(sprites)
+        sprite_rects = [sprite.rect for sprite in sprite_list]
+        for rect in dirty:
+            surface.set_clip(rect)
+            surface.blit(self.background, rect, rect)
+            for i in rect.collidelistall(sprite_rects):
+                sprite = sprite_list[i]
+                surface.blit(sprite.image, sprite.rect)
+            if rect.colliderect(self.hud.panel.rect):
+                self.hud.draw_panel(surface)
+            for i in rect.collidelistall(bar_rects):
+                draw_health_bar(surface, *bar_list[i])
+            if rect.colliderect(self.hud.stats.rect):
+                self.hud.draw_stats(surface)
+        surface.set_clip(None)
+        self.dirty_frames += 1
+        return dirty
+
+# Rolling phase timings, entity counts and FPS in the top left corner.
+# The text is rebuilt every refresh ms so it stays readable and cheap.
+class ProfilerOverlay:
+    def __init__(self, profiler=frame_profiler, refresh=250):
+        self.profiler = profiler
+        self.refresh = refresh
+        self.surface = None
+        self.built_at = None
+
+    def build(self, world, fps):
+        groups = [("sprites", world.all_sprites), ("active", world.active), ("fruits", world.fruits)]
+        groups += [(name, getattr(world, name)) for name in ENEMY_GROUPS]
+        lines = [f"FPS {fps:.1f}", "  ".join(f"{name} {len(group)}" for name, group in groups)]
+        averages = self.profiler.averages()
+        for name in sorted(averages):
+            lines.append(f"{name:<24}{averages[name]:7.3f} ms")
+        font = text_cache.font(16)  # Rendered directly: these strings change too often to cache
+        rendered = [font.render(line, True, WHITE) for line in lines]
+        width = max(text.get_width() for text in rendered) + 10
+        surface = pygame.Surface((width, 16 * len(rendered) + 10), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 180))
+        for i, text in enumerate(rendered):
+            surface.blit(text, (5, 5 + 16 * i))
+        return surface
+
+    def draw(self, surface, world, fps):
+        now = pygame.time.get_ticks()
+        if self.surface is None or now - self.built_at >= self.refresh:
+            self.surface = self.build(world, fps)
+            self.built_at = now
+        surface.blit(self.surface, (10, 80))
+        return pygame.Rect((10, 80), self.surface.get_size())
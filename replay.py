@@ -0,0 +1,176 @@
+# Input recording and deterministic replay.
+#
+# A recording holds the world's RNG seed and size, an optional save the session started
+# from, one byte of input per simulation step (arrow keys and SPACE) and the
+# discrete inputs in between (special attack, pause, upgrade choices, spawn
+# throttle changes) tagged with the step they came before. Because the World only depends on its seed
+# and these inputs, replaying a recording rebuilds the session step for step,
+# headless or rendered, as fast as the machine allows:
+#
+#   python "Game Code.py" --record session.rec    # play and record
+#   python replay.py session.rec                   # replay headless
+#   python replay.py session.rec --render          # replay on screen
+#   python replay.py session.rec --profile         # replay under cProfile
+#   python replay.py session.rec --trace steps.json  # per-step phase timings
+
+import argparse
+import struct
+import sys
+import time
+import zlib
+
+import savegame
+from profiler import frame_profiler
+from settings import WIDTH, PLAYABLE_HEIGHT
+from simulation import STEP_MS, ManualClock, World, entity_counts
+
+MAGIC = b"EGRP"
+VERSION = 2
+HEADER = struct.Struct("<4sHQII")  # magic, version, seed, save size, event count
+SIZE = struct.Struct("<II")  # world width and height, from version 2 on
+EVENT = struct.Struct("<IBB")  # step, kind, value
+
+# Discrete input kinds
+SPECIAL_ATTACK = 1
+PAUSE = 2
+UPGRADE = 3  # value: Player.apply_upgrade choice
+THROTTLE = 4  # value: SpawnDirector throttle level
+
+# Per-step input byte: bits 0-1 dx + 1, bits 2-3 dy + 1, bit 4 attack
+def pack_input(dx, dy, attack):
+    return (dx + 1) | (dy + 1) << 2 | bool(attack) << 4
+
+def unpack_input(byte):
+    return (byte & 3) - 1, (byte >> 2 & 3) - 1, bool(byte & 16)
+
+class Recording:
+    def __init__(self, seed, save=b"", size=(WIDTH, PLAYABLE_HEIGHT)):
+        self.seed = seed
+        self.save = save  # Encoded savegame the session started from, if any
+        self.size = tuple(size)  # The World's size
+        self.inputs = bytearray()
+        self.events = []  # (step, kind, value)
+
+    # Record a discrete input; it is replayed before the next step
+    def event(self, kind, value=0):
+        self.events.append((len(self.inputs), kind, value))
+
+    def step(self, dx, dy, attack):
+        self.inputs.append(pack_input(dx, dy, attack))
+
+    def write(self, path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, len(self.save), len(self.events)))
+            f.write(SIZE.pack(*self.size))
+            f.write(self.save)
+            for event in self.events:
+                f.write(EVENT.pack(*event))
+            f.write(zlib.compress(bytes(self.inputs), 9))
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, seed, save_size, event_count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a recording")
+        if version not in (1, VERSION):
+            raise ValueError(f"Unsupported recording version {version}")
+        offset = HEADER.size
+        size = (WIDTH, PLAYABLE_HEIGHT)
+        if version >= 2:
+            size = SIZE.unpack_from(data, offset)
+            offset += SIZE.size
+        recording = cls(seed, data[offset:offset + save_size], size)
+        offset += save_size
+        recording.events = [EVENT.unpack_from(data, offset + i * EVENT.size) for i in range(event_count)]
+        offset += event_count * EVENT.size
+        recording.inputs = bytearray(zlib.decompress(data[offset:]))
+        return recording
+
+# Apply one discrete input to the world
+def apply_event(world, kind, value):
+    if kind == SPECIAL_ATTACK:
+        world.special_attack()
+    elif kind == UPGRADE:
+        world.player.apply_upgrade(value)
+    elif kind == THROTTLE:
+        world.director.set_throttle(value)
+    # PAUSE only opens the upgrade menu; the simulation doesn't see it
+
+# Rebuild a recorded session. on_step(world) is called after every step, e.g. to draw.
+def run(recording, images=None, on_step=None):
+    world = World(images, clock=ManualClock(), seed=recording.seed, size=recording.size)
+    if recording.save:
+        savegame.apply(world, savegame.decode(recording.save))
+
+    events = recording.events
+    next_event = 0
+    for step, byte in enumerate(recording.inputs):
+        while next_event < len(events) and events[next_event][0] <= step:
+            apply_event(world, *events[next_event][1:])
+            next_event += 1
+        dx, dy, attack = unpack_input(byte)
+        world.step(STEP_MS, dx, dy, attack)
+        if on_step is not None:
+            on_step(world)
+        frame_profiler.end_frame()
+    for _, kind, value in events[next_event:]:
+        apply_event(world, kind, value)
+    return world
+
+# The images and an on_step callback for run() that draws every step to a window
+def window_renderer(size):
+    import pygame
+    from assets import load_images
+    from camera import Camera
+    from hud import Hud
+    from rendering import draw_world
+    from settings import HEIGHT
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    images = load_images()
+    hud = Hud(images)
+    camera = Camera(images["background"]) if size != (WIDTH, PLAYABLE_HEIGHT) else None
+
+    def on_step(world):
+        pygame.event.pump()
+        if camera is not None:
+            camera.follow(world)
+        draw_world(screen, world, images, hud, camera)
+        pygame.display.flip()
+    return images, on_step
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded game session.")
+    parser.add_argument("recording")
+    parser.add_argument("--render", action="store_true", help="draw every step to a window")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and print the top functions")
+    parser.add_argument("--trace", metavar="FILE", help="write per-step phase timings: JSON lines, or a Chrome trace if FILE ends in .json")
+    args = parser.parse_args(argv)
+    if args.trace:
+        frame_profiler.start_trace(args.trace)
+
+    recording = Recording.read(args.recording)
+    images, on_step = window_renderer(recording.size) if args.render else (None, None)
+
+    start = time.perf_counter()
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        world = profiler.runcall(run, recording, images, on_step)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    else:
+        world = run(recording, images, on_step)
+    elapsed = time.perf_counter() - start
+    frame_profiler.close()
+
+    steps = len(recording.inputs)
+    print(f"Replayed {steps} steps in {elapsed:.2f} s ({steps / elapsed if elapsed else 0:.0f} steps/s), seed {recording.seed}")
+    print(f"Entities: {entity_counts(world)}")
+    print(f"Player: level {world.player.level}, health {world.player.health}, experience {world.player.experience}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,374 @@
+# Saving and loading games.
+#
+# A save holds the player, every live enemy, fruit and ripple, the spawn timers,
+# the world's size and its random state, in a small versioned binary format built with
+# struct. Times are stored relative to the moment of saving, so timers pick up
+# where they left off whatever the clock reads when the save is loaded. It also
+# keeps the order entities update in and which enemies are asleep until the
+# player travels further (see activity.py), since both decide who draws from the
+# random state when: a loaded game plays on exactly like the original would have.
+#
+# Saving is split in two: snapshot() copies the world into plain tuples and is
+# cheap enough for the main thread, and encode() plus the file write can then
+# run anywhere; Autosaver does them on a background thread. load() also reads
+# the pickled player/enemy dicts of the original game's savegame.dat.
+
+import io
+import os
+import pickle
+import queue
+import struct
+import threading
+from collections import deque
+
+from settings import WIDTH, PLAYABLE_HEIGHT
+from simulation import ARCHETYPES, FRUIT_TYPES, Enemy, Fruit, Ripple
+
+MAGIC = b"EGSV"
+VERSION = 4
+
+HEADER = struct.Struct("<4sH")
+WORLD = struct.Struct("<Id4d2I")  # frame, elapsed time, fruit/enemy/boss spawn times, Malakar allowed time, world size
+WORLD_V1 = struct.Struct("<Id4d")  # Version 1 had no world size: the world was always the screen's
+RNG = struct.Struct("<Bd625I")  # has gauss_next, gauss_next, Mersenne Twister state
+COUNT = struct.Struct("<I")
+ENTITY = struct.Struct("<BBiidd")  # kind, fruit index, x, y, health, freeze end time (fruit: spawn time)
+ACTIVITY = struct.Struct("<BdI")  # has sleep state, player's travelled distance, sleeping enemy count
+SLEEPER = struct.Struct("<Id")  # entity index, travelled distance it wakes at
+
+# Player attributes saved, in record order. Times are saved relative to now. Values
+# are doubles: float Balance factors and damage scales make some of them fractional.
+PLAYER_VALUES = ("base_speed", "speed", "base_damage", "damage", "experience", "level", "health", "max_health", "damage_reduction")
+PLAYER_TIMES = ("last_hit", "invuln_end_time", "melon_end_time", "last_regen_time", "special_attack_time", "flamefruit_end_time", "speed_boost_end_time")
+PLAYER_FLAGS = ("invulnerable", "special_attack_ready", "flamefruit_active")
+PLAYER = struct.Struct(f"<ii{len(PLAYER_VALUES)}d{len(PLAYER_TIMES)}d{len(FRUIT_TYPES)}IBii")  # ... flags, lure position
+PLAYER_V2 = struct.Struct(f"<ii{len(PLAYER_VALUES)}q{len(PLAYER_TIMES)}d{len(FRUIT_TYPES)}IBii")  # Versions 1 and 2 had integer values
+
+# Entity kind codes: enemies by their archetype's code, fruit and ripples at the top of the range
+FRUIT_KIND = 254
+RIPPLE_KIND = 255
+ARCHETYPE_CODES = {archetype.code: name for name, archetype in ARCHETYPES.items()}
+if len(ARCHETYPE_CODES) != len(ARCHETYPES) or max(ARCHETYPE_CODES) >= FRUIT_KIND:
+    raise ValueError("Archetype codes must be unique and below 254")
+OLD_KINDS = {3: FRUIT_KIND, 4: RIPPLE_KIND}  # Fruit and ripple codes before version 4
+
+# Copy everything a save needs out of the world (main thread)
+def snapshot(world):
+    now = world.clock.now()
+    player = world.player
+    state = {
+        "frame": world.frame,
+        "time": now,
+        "spawn_times": (world.fruit_spawn_time - now, world.enemy_spawn_time - now, world.bossenemy_spawn_time - now, world.malakar_spawn_allowed_time - now),
+        "size": world.bounds.size,
+        "rng": world.rng.getstate(),
+        "player": {
+            "position": player.rect.topleft,
+            "values": tuple(getattr(player, name) for name in PLAYER_VALUES),
+            "times": tuple(getattr(player, name) - now for name in PLAYER_TIMES),
+            "inventory": tuple(player.inventory[name] for name, _ in FRUIT_TYPES),
+            "flags": tuple(getattr(player, name) for name in PLAYER_FLAGS),
+            "flamefruit_position": player.flamefruit_position,
+            "damage_reduction_end_times": tuple(end_time - now for end_time in player.damage_reduction_end_times),
+        },
+        "entities": [],
+    }
+    fruit_index = {name: i for i, (name, _) in enumerate(FRUIT_TYPES)}
+    entities = state["entities"]
+    saved = {}  # sprite -> its index in entities
+    for sprite in world.all_sprites:
+        if isinstance(sprite, Fruit):
+            entities.append((FRUIT_KIND, fruit_index[sprite.name], sprite.rect.x, sprite.rect.y, 0.0, sprite.born - now))
+        elif isinstance(sprite, Ripple):
+            entities.append((RIPPLE_KIND, 0, sprite.rect.centerx, sprite.rect.centery, 0.0, 0.0))
+        elif isinstance(sprite, Enemy):
+            entities.append((sprite.archetype.code, 0, sprite.rect.x, sprite.rect.y, sprite.health, sprite.freeze_end_time - now))
+        else:
+            continue
+        saved[sprite] = len(entities) - 1
+    state["active"] = [saved[sprite] for sprite in world.active]
+    activity = world.activity
+    if activity is not None:
+        state["sleeping"] = (activity.travel, [(saved[enemy], timer.time) for enemy, timer in activity.sleeping.items()])
+    else:
+        state["sleeping"] = None
+    return state
+
+def encode(state):
+    out = io.BytesIO()
+    out.write(HEADER.pack(MAGIC, VERSION))
+    out.write(WORLD.pack(state["frame"], state["time"], *state["spawn_times"], *state["size"]))
+    _, internal, gauss_next = state["rng"]
+    out.write(RNG.pack(gauss_next is not None, gauss_next or 0.0, *internal))
+
+    player = state["player"]
+    flags = sum(1 << i for i, flag in enumerate(player["flags"]) if flag)
+    lure = player["flamefruit_position"]
+    if lure is not None:
+        flags |= 1 << len(PLAYER_FLAGS)
+    out.write(PLAYER.pack(*player["position"], *player["values"], *player["times"], *player["inventory"], flags, *(lure or (0, 0))))
+    stacks = player["damage_reduction_end_times"]
+    out.write(COUNT.pack(len(stacks)))
+    out.write(struct.pack(f"<{len(stacks)}d", *stacks))
+
+    out.write(COUNT.pack(len(state["entities"])))
+    for entity in state["entities"]:
+        out.write(ENTITY.pack(*entity))
+    active = state["active"]
+    out.write(COUNT.pack(len(active)))
+    out.write(struct.pack(f"<{len(active)}I", *active))
+    travel, sleepers = state["sleeping"] or (0.0, [])
+    out.write(ACTIVITY.pack(state["sleeping"] is not None, travel, len(sleepers)))
+    for sleeper in sleepers:
+        out.write(SLEEPER.pack(*sleeper))
+    return out.getvalue()
+
+def decode(data):
+    view = memoryview(data)
+    magic, version = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Not a save file")
+    if version not in (1, 2, 3, VERSION):
+        raise ValueError(f"Unsupported save version {version}")
+    offset = HEADER.size
+
+    if version == 1:
+        frame, time, *spawn_times = WORLD_V1.unpack_from(view, offset)
+        size = (WIDTH, PLAYABLE_HEIGHT)
+        offset += WORLD_V1.size
+    else:
+        frame, time, *spawn_times, width, height = WORLD.unpack_from(view, offset)
+        size = (width, height)
+        offset += WORLD.size
+    has_gauss, gauss_next, *internal = RNG.unpack_from(view, offset)
+    offset += RNG.size
+
+    player_struct = PLAYER if version == VERSION else PLAYER_V2
+    fields = player_struct.unpack_from(view, offset)
+    offset += player_struct.size
+    values_end = 2 + len(PLAYER_VALUES)
+    times_end = values_end + len(PLAYER_TIMES)
+    inventory_end = times_end + len(FRUIT_TYPES)
+    flags, lure_x, lure_y = fields[inventory_end:]
+    (stack_count,) = COUNT.unpack_from(view, offset)
+    offset += COUNT.size
+    stacks = struct.unpack_from(f"<{stack_count}d", view, offset)
+    offset += 8 * stack_count
+    player = {
+        "position": fields[:2],
+        "values": tuple(int(value) if float(value).is_integer() else value for value in fields[2:values_end]),
+        "times": fields[values_end:times_end],
+        "inventory": fields[times_end:inventory_end],
+        "flags": tuple(bool(flags & (1 << i)) for i in range(len(PLAYER_FLAGS))),
+        "flamefruit_position": (lure_x, lure_y) if flags & (1 << len(PLAYER_FLAGS)) else None,
+        "damage_reduction_end_times": stacks,
+    }
+
+    (entity_count,) = COUNT.unpack_from(view, offset)
+    offset += COUNT.size
+    entities = [ENTITY.unpack_from(view, offset + i * ENTITY.size) for i in range(entity_count)]
+    offset += entity_count * ENTITY.size
+    if version < 4:
+        entities = [(OLD_KINDS.get(kind, kind), *rest) for kind, *rest in entities]
+    for kind, *_ in entities:
+        if kind not in ARCHETYPE_CODES and kind not in (FRUIT_KIND, RIPPLE_KIND):
+            raise ValueError(f"Unknown entity kind {kind}")
+
+    # Versions before 4 didn't keep the update order or who was asleep
+    active = sleeping = None
+    if version == VERSION:
+        (active_count,) = COUNT.unpack_from(view, offset)
+        offset += COUNT.size
+        active = list(struct.unpack_from(f"<{active_count}I", view, offset))
+        offset += 4 * active_count
+        has_sleeping, travel, sleeper_count = ACTIVITY.unpack_from(view, offset)
+        offset += ACTIVITY.size
+        if has_sleeping:
+            sleeping = (travel, [SLEEPER.unpack_from(view, offset + i * SLEEPER.size) for i in range(sleeper_count)])
+        if any(index >= entity_count for index in active + [index for index, _ in (sleeping or (0, []))[1]]):
+            raise ValueError("Entity index out of range")
+
+    return {
+        "frame": frame,
+        "time": time,
+        "spawn_times": tuple(spawn_times),
+        "size": size,
+        "rng": (3, tuple(internal), gauss_next if has_gauss else None),
+        "player": player,
+        "entities": entities,
+        "active": active,
+        "sleeping": sleeping,
+    }
+
+# Replace the world's state with a snapshot
+def apply(world, state):
+    now = world.clock.now()
+    player = world.player
+    for sprite in world.all_sprites.sprites():
+        if sprite is not player:
+            sprite.kill()
+
+    world.bounds.size = state["size"]
+    saved = state["player"]
+    for name, value in zip(PLAYER_VALUES, saved["values"]):
+        setattr(player, name, value)
+    for name, value in zip(PLAYER_TIMES, saved["times"]):
+        setattr(player, name, now + value)
+    for name, value in zip(PLAYER_FLAGS, saved["flags"]):
+        setattr(player, name, value)
+    player.inventory = {name: count for (name, _), count in zip(FRUIT_TYPES, saved["inventory"])}
+    player.flamefruit_position = saved["flamefruit_position"]
+    player.damage_reduction_end_times = deque(now + end_time for end_time in saved["damage_reduction_end_times"])
+    player.image = world.image("luminara_invuln") if player.invulnerable else player.default_image
+    player.rect.topleft = saved["position"]
+    player.moved()
+
+    created = []
+    for kind, fruit_index, x, y, health, freeze_end in state["entities"]:
+        if kind == FRUIT_KIND:
+            fruit = world.add(world.pool.acquire(Fruit, world, x, y, *FRUIT_TYPES[fruit_index]), world.fruits)
+            fruit.born = now + freeze_end
+            created.append(fruit)
+        elif kind == RIPPLE_KIND:
+            created.append(world.add(world.pool.acquire(Ripple, world, x, y), world.active))
+        else:
+            enemy = world.spawn(ARCHETYPE_CODES[kind], (x, y))
+            enemy.health = health
+            enemy.freeze_end_time = now + freeze_end
+            if freeze_end > 0:
+                enemy.set_effect("frozen")
+            created.append(enemy)
+
+    fruit, enemy, bossenemy, malakar = state["spawn_times"]
+    world.fruit_spawn_time = now + fruit
+    world.enemy_spawn_time = now + enemy
+    world.bossenemy_spawn_time = now + bossenemy
+    world.malakar_spawn_allowed_time = now + malakar
+    world.frame = state["frame"]
+    if state["rng"] is not None:
+        world.rng.setstate(state["rng"])
+    world.restart_timers()
+
+    # Entities update in the saved order, and sleepers stay asleep; without a
+    # record of them (or without activity levels here) everyone starts awake
+    sleeping = state.get("sleeping")
+    if sleeping is not None and world.activity is not None:
+        travel, sleepers = sleeping
+        world.activity.restore(travel, [(created[index], wake_travel) for index, wake_travel in sleepers])
+    if state.get("active") is not None:
+        order = [created[index] for index in state["active"] if created[index] in world.active]  # Not crowd enemies or sleepers
+        listed = set(order)
+        order += [sprite for sprite in world.active if sprite not in listed]  # Sleepers saved without activity levels here
+        world.active.empty()
+        world.active.add(order)
+
+def write_file(path, data):
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)  # Never leave a half-written save behind
+
+def save(world, path):
+    write_file(path, encode(snapshot(world)))
+
+# Load a save (or a legacy savegame.dat) into the world
+def load(world, path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(MAGIC):
+        state = decode(data)
+    else:
+        state = from_legacy(_LegacyUnpickler(io.BytesIO(data)).load())
+    apply(world, state)
+
+# The legacy file is a plain pickle of dicts, lists and tuples; refuse anything that
+# would construct other objects
+class _LegacyUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Unexpected object in legacy save: {module}.{name}")
+
+# Convert the original game's pickled save to a snapshot.
+# Its times are raw pygame ticks with no record of when the save was made, so the
+# save time is taken as the latest moment one of them shows had already passed
+# (a hit, a regen tick, or an effect's start).
+def from_legacy(data):
+    saved = data["player"]
+    durations = {"invuln_end_time": 2000, "melon_end_time": 9000, "flamefruit_end_time": 3000, "speed_boost_end_time": 12000, "special_attack_time": 30000}
+    past = [saved.get("last_hit", 0), saved.get("last_regen_time", 0)]
+    past += [saved[name] - duration for name, duration in durations.items() if saved.get(name)]
+    past += [end_time - 5000 for end_time in saved.get("damage_reduction_end_times", [])]
+    saved_at = max(past)
+
+    values = {"base_speed": 5, "base_damage": 20, "damage_reduction": 0}
+    values.update((name, saved[name]) for name in PLAYER_VALUES if name in saved)
+    if "speed" not in saved:
+        values["speed"] = values["base_speed"] * 2 if saved.get("speed_boost_end_time", 0) >= saved_at else values["base_speed"]
+    player = {
+        "position": tuple(saved["position"]),
+        "values": tuple(values[name] for name in PLAYER_VALUES),
+        "times": tuple(saved.get(name, 0) - saved_at for name in PLAYER_TIMES),
+        "inventory": tuple(saved["inventory"].get(name, 0) for name, _ in FRUIT_TYPES),
+        "flags": tuple(saved.get(name, name == "special_attack_ready") for name in PLAYER_FLAGS),
+        "flamefruit_position": tuple(saved["flamefruit_position"]) if saved.get("flamefruit_position") else None,
+        "damage_reduction_end_times": tuple(end_time - saved_at for end_time in saved.get("damage_reduction_end_times", [])),
+    }
+
+    # The original game's enemy classes, as archetype codes
+    kinds = {"NightCrawler": ARCHETYPES["nightcrawler"].code, "BossEnemy": ARCHETYPES["boss"].code, "Malakar": ARCHETYPES["malakar"].code}
+    entities = []
+    for group in ("enemies", "bossenemies", "malakar_group"):
+        for enemy in data.get(group, []):
+            entities.append((kinds[enemy["type"]], 0, *enemy["position"], enemy["health"], 0.0))
+
+    return {
+        "frame": 0,
+        "time": saved_at,
+        "spawn_times": (0.0, 0.0, 0.0, 30000.0),  # Not in the legacy file: as at the start of a game
+        "size": (WIDTH, PLAYABLE_HEIGHT),
+        "rng": None,
+        "player": player,
+        "entities": entities,
+        "active": None,
+        "sleeping": None,
+    }
+
+# Saves the game every interval ms of game time, encoding and writing on a
+# background thread so a save never holds up a frame
+class Autosaver:
+    def __init__(self, path, interval=30000):
+        self.path = path
+        self.interval = interval
+        self.next_save = None
+        self.saves = 0
+        self.error = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._work, name="autosave", daemon=True)
+        self.thread.start()
+
+    # Call once a frame
+    def update(self, world):
+        now = world.clock.now()
+        if self.next_save is None:
+            self.next_save = now + self.interval
+        elif now >= self.next_save:
+            self.save(world)
+            self.next_save = now + self.interval
+
+    def save(self, world):
+        self.queue.put(snapshot(world))
+
+    def _work(self):
+        while True:
+            state = self.queue.get()
+            if state is None:
+                return
+            try:
+                write_file(self.path, encode(state))
+                self.saves += 1
+            except OSError as message:
+                self.error = message
+                print(f"Autosave failed: {message}")
+
+    # Finish any pending save
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
@@ -0,0 +1,60 @@
+# Heap-backed timer scheduler.
+#
+# Timed behavior (buff expiries, cooldowns, regeneration ticks, spawners)
+# registers a deadline here instead of being polled every frame; run(now) pops
+# and fires only the timers that are due, so an idle frame costs one comparison
+# and adding or expiring a timer is O(log n). Cancelled timers stay in the heap
+# and are skipped when they reach the top.
+#
+# A timer fires once now >= its time, or with strict=True once now > its time,
+# matching the "current_time > end_time" checks the effects were written with.
+# Timers due in the same run fire in deadline order, ties in scheduling order.
+
+import heapq
+import itertools
+
+class Timer:
+    def __init__(self, time, callback):
+        self.time = time
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class Scheduler:
+    def __init__(self):
+        self.heap = []  # (time, strict, order, timer)
+        self.order = itertools.count()
+        self.fired = 0
+
+    # Call callback(now) once the clock reaches time
+    def at(self, time, callback, strict=False):
+        timer = Timer(time, callback)
+        heapq.heappush(self.heap, (time, strict, next(self.order), timer))
+        return timer
+
+    # Fire every timer that is due at now; returns how many fired
+    def run(self, now):
+        heap = self.heap
+        fired = 0
+        while heap:
+            time, strict, _, timer = heap[0]
+            if time > now or (strict and time == now):
+                break
+            heapq.heappop(heap)
+            if not timer.cancelled:
+                timer.callback(now)
+                fired += 1
+        self.fired += fired
+        return fired
+
+    # Time of the earliest pending timer, or None
+    def next_time(self):
+        heap = self.heap
+        while heap and heap[0][3].cancelled:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def __len__(self):
+        return sum(1 for entry in self.heap if not entry[3].cancelled)
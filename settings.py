@@ -0,0 +1,12 @@
+# Shared constants for the game, the simulation and the tools built on top of them
+
+# Screen dimensions
+WIDTH, HEIGHT = 800, 600
+PLAYABLE_HEIGHT = HEIGHT - 60  # Leave space for inventory at the bottom
+
+# Colors
+WHITE = (255, 255, 255)
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+BLACK = (0, 0, 0)
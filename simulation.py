@@ -0,0 +1,729 @@
+import random
+import time
+from collections import deque, namedtuple
+
+import pygame
+
+from activity import Activity
+from assets import SPRITE_SIZES, tint_cache
+from crowd import CrowdEngine, crowd_class
+from director import SpawnDirector
+from navigation import Navigation
+from pool import EntityPool
+from profiler import frame_profiler
+from scheduler import Scheduler
+from settings import WIDTH, PLAYABLE_HEIGHT
+from spatial import SpatialHash
+
+# Fruit name -> image key, in inventory order
+FRUIT_TYPES = [("Gleam Berry", "gleamberry"), ("Shimmering Apple", "shimmeringapple"), ("Ethereal Pear", "etherealpear"), ("Flamefruit", "flamefruit"), ("Moonbeam Melon", "moonbeammelon")]
+
+# Clock driven by pygame's millisecond ticks, like the original game loop
+class TicksClock:
+    def now(self):
+        return pygame.time.get_ticks()
+
+    def advance(self, dt):
+        pass  # Real time moves on its own
+
+# Clock that only moves when the world is stepped, for headless and deterministic runs
+class ManualClock:
+    def __init__(self, start=0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def advance(self, dt):
+        self.time += dt
+
+STEP_MS = 1000 / 60  # One simulation step; movement speeds are in pixels per step
+
+# Turns real frame times into a whole number of fixed simulation steps.
+# Leftover time carries over to the next frame, and alpha says how far the
+# renderer is between the last two steps. A frame never runs more than
+# max_steps; time beyond that is dropped, so under heavy load the game slows
+# down instead of spiralling into ever longer catch-up frames.
+class FixedTimestep:
+    def __init__(self, step=STEP_MS, max_steps=5):
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped_ms = 0.0
+
+    # Number of steps to run for a frame that took frame_ms
+    def advance(self, frame_ms):
+        self.accumulator += frame_ms
+        steps = int(self.accumulator // self.step)
+        if steps > self.max_steps:
+            self.dropped_ms += (steps - self.max_steps) * self.step
+            steps = self.max_steps
+            self.accumulator %= self.step
+        else:
+            self.accumulator -= steps * self.step
+        return steps
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.step
+
+# Base class for everything living in a World.
+# Pooled entities do their per-spawn setup in reset(), which World.pool calls
+# again (with the constructor arguments) when it recycles a killed one.
+# Sprite keeps the groups a sprite is in as a set in _Sprite__g; entities are in
+# two or three groups, so they keep a list there instead, at under half the size.
+class Entity(pygame.sprite.Sprite):
+    __slots__ = ("_Sprite__g", "world", "rect", "image")
+    space_layer = None  # Spatial index layer (not "layer", which is pygame's LayeredUpdates draw layer)
+
+    def __init__(self, world, image_key=None):
+        super().__init__()
+        self._Sprite__g = []
+        self.world = world
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        if image_key is not None:
+            self.set_image(image_key)
+
+    # Show the given image, resizing the rect (in place) to match
+    def set_image(self, image_key):
+        self.image = self.world.image(image_key)
+        if self.image is not None:
+            self.rect.size = self.image.get_size()
+        else:
+            self.rect.size = SPRITE_SIZES[image_key]  # Headless: no surfaces at all
+
+    def add_internal(self, group):
+        self._Sprite__g.append(group)
+
+    def remove_internal(self, group):
+        self._Sprite__g.remove(group)
+
+    # Keep the spatial index in step after changing self.rect
+    def moved(self):
+        self.world.space.move(self)
+
+    # Leave the world and go back to its pool; killing a dead entity does nothing
+    def kill(self):
+        if not self.alive():
+            return
+        self.world.space.remove(self)
+        super().kill()
+        self.world.pool.release(self)
+
+# Gameplay numbers that balance sweeps (batch.py) vary. The game plays on the
+# defaults; World(balance=Balance(enemy_spawn_interval=1500)) overrides some.
+class Balance:
+    fruit_spawn_interval = 2000  # ms
+    enemy_spawn_interval = 2000
+    boss_spawn_interval = 5000
+    fruit_budget = 40  # Most of each kind on the map at once
+    enemy_budget = 150
+    boss_budget = 3
+    fruit_lifetime = 60000  # ms before uncollected fruit far from the player may be recycled
+    nightcrawler_health = 100  # Override the archetype table's health (see Balance.health)
+    boss_health = 500
+    malakar_health = 5000
+    damage_scale = 1.0  # Multiplies enemy contact damage before damage reduction
+    damage_cooldown = 1000  # ms the player can't be hit again after a hit
+    gleam_berry_heal = 10
+    speed_boost_duration = 12000
+    flamefruit_duration = 3000
+    melon_damage_factor = 5
+    melon_duration = 9000
+
+    def __init__(self, **overrides):
+        for name, value in overrides.items():
+            if not hasattr(Balance, name):
+                raise ValueError(f"Unknown balance parameter: {name}")
+            setattr(self, name, value)
+
+    # Starting health of an archetype: its <name>_health parameter, if there is one
+    def health(self, archetype):
+        return getattr(self, f"{archetype.name}_health", archetype.health)
+
+    # The parameters and their values, defaults included
+    def values(self):
+        return {name: getattr(self, name) for name in vars(Balance) if not name.startswith("_") and not callable(getattr(Balance, name))}
+
+# Player class
+class Player(Entity):
+    space_layer = "player"
+
+    def __init__(self, world):
+        super().__init__(world, "luminara")
+        self.default_image = self.image
+        self.rect.center = world.bounds.center
+        self.base_speed = 5
+        self.speed = self.base_speed
+        self.base_damage = 20
+        self.damage = self.base_damage
+        self.experience = 0
+        self.level = 1
+        self.health = 100
+        self.max_health = 100
+        self.inventory = {"Gleam Berry": 0, "Shimmering Apple": 0, "Ethereal Pear": 0, "Flamefruit": 0, "Moonbeam Melon": 0}
+        self.invulnerable = False
+        self.last_hit = world.clock.now()  # Track the last time the player was hit
+        self.invuln_end_time = 0  # Track when the invulnerability ends
+        self.melon_end_time = 0  # Track when the melon's effect ends
+        self.last_regen_time = world.clock.now()  # Track the last time health was regenerated
+        self.special_attack_ready = True
+        self.special_attack_time = 0
+        self.flamefruit_end_time = 0
+        self.flamefruit_active = False
+        self.flamefruit_position = None
+        self.speed_boost_end_time = 0
+        self.damage_reduction = 0
+        self.damage_reduction_end_times = deque()  # One per active Flamefruit stack, in expiry order
+        self.timers = {}  # Effect name -> pending expiry Timer
+        self.set_timer("regen", self.last_regen_time + 5000, self.regenerate)
+
+    # (Re)schedule the named effect's expiry; it fires once the clock is past time
+    def set_timer(self, name, time, callback):
+        timer = self.timers.get(name)
+        if timer is not None:
+            timer.cancel()
+        self.timers[name] = self.world.scheduler.at(time, lambda now: self._expire(name, callback, now), strict=True)
+
+    # Register expiry timers for whichever effects are active
+    def restart_timers(self):
+        self.timers = {}
+        now = self.world.clock.now()
+        if self.invulnerable:
+            self.set_timer("invulnerability", self.invuln_end_time, self.end_invulnerability)
+        if now <= self.melon_end_time:
+            self.set_timer("melon", self.melon_end_time, self.end_melon)
+        if now <= self.speed_boost_end_time:
+            self.set_timer("speed_boost", self.speed_boost_end_time, self.end_speed_boost)
+        if not self.special_attack_ready:
+            self.set_timer("special_attack", self.special_attack_time, self.special_attack_recharged)
+        if self.flamefruit_active:
+            self.set_timer("flamefruit", self.flamefruit_end_time, self.end_flamefruit)
+        for end_time in self.damage_reduction_end_times:
+            self.world.scheduler.at(end_time, self.end_damage_reduction, strict=True)
+        if self.speed != self.base_speed and not self.boosted():
+            self.set_timer("stagger", self.last_hit, self.recover_speed)  # Hit in the last step: wears off after the next move
+        self.set_timer("regen", self.last_regen_time + 5000, self.regenerate)
+
+    def _expire(self, name, callback, now):
+        del self.timers[name]
+        callback(now)
+
+    def boosted(self):
+        return "speed_boost" in self.timers
+
+    def melon_active(self):
+        return "melon" in self.timers
+
+    def move(self, dx, dy):
+        self.rect.x += dx * self.speed
+        self.rect.y += dy * self.speed
+        bounds = self.world.bounds
+        self.rect.x = max(0, min(self.rect.x, bounds.width - self.rect.width))
+        self.rect.y = max(0, min(self.rect.y, bounds.height - self.rect.height))
+        self.moved()
+
+    def collect_fruit(self, fruit):
+        current_time = self.world.clock.now()
+        balance = self.world.balance
+        self.inventory[fruit.name] += 1
+        if fruit.name == "Gleam Berry":
+            self.health = min(self.health + balance.gleam_berry_heal, self.max_health)
+            self.world.spawn_ripple(fruit.rect.center)
+        elif fruit.name == "Shimmering Apple":
+            self.speed_boost_end_time = current_time + balance.speed_boost_duration  # 12 seconds by default
+            self.speed = self.base_speed * 2  # Speed boost
+            self.set_timer("speed_boost", self.speed_boost_end_time, self.end_speed_boost)
+        elif fruit.name == "Ethereal Pear":
+            self.experience += 150
+            self.health = min(self.health + 20, self.max_health + 20)
+            self.max_health += 5
+            self.wake_regen()
+        elif fruit.name == "Flamefruit":
+            self.experience += 100
+            self.flamefruit_end_time = current_time + balance.flamefruit_duration  # 3 seconds by default
+            self.flamefruit_active = True
+            self.flamefruit_position = fruit.rect.center
+            self.set_timer("flamefruit", self.flamefruit_end_time, self.end_flamefruit)
+            if self.world.activity is not None:
+                self.world.activity.lure_started()
+            if self.level > 50:
+                self.damage_reduction += 10
+                self.damage_reduction_end_times.append(current_time + 5000)  # 5 seconds duration
+                self.world.scheduler.at(current_time + 5000, self.end_damage_reduction, strict=True)
+        elif fruit.name == "Moonbeam Melon":
+            self.experience += 200
+            self.damage = self.base_damage * balance.melon_damage_factor  # Increase damage by a factor of 5 by default
+            self.melon_end_time = current_time + balance.melon_duration  # 9 seconds by default
+            self.set_timer("melon", self.melon_end_time, self.end_melon)
+            self.invulnerable = True
+            self.image = self.world.image("luminara_invuln")
+            self.invuln_end_time = current_time + 2000  # 2 seconds invulnerability
+            self.set_timer("invulnerability", self.invuln_end_time, self.end_invulnerability)
+
+        self.experience += 100
+        if self.experience >= 1000:
+            self.level += 1
+            self.experience = 0
+
+        return fruit.name
+
+    def attack(self, enemy):
+        damage_dealt = max(self.damage, 0)
+        enemy.health -= damage_dealt
+        if enemy.health <= 0:
+            enemy.kill()
+            self.reward_kill(enemy)
+
+    def reward_kill(self, enemy):
+        archetype = enemy.archetype
+        self.experience += archetype.experience
+        if archetype.respawn_delay:
+            self.world.malakar_spawn_allowed_time = self.world.clock.now() + archetype.respawn_delay
+
+    def take_damage(self, enemydamage):
+        if not self.invulnerable:
+            current_time = self.world.clock.now()
+            balance = self.world.balance
+            if current_time - self.last_hit > balance.damage_cooldown:  # 1 second by default
+                self.health -= max(round(enemydamage * balance.damage_scale) - self.damage_reduction, 0)
+                self.speed = max(self.speed - 1, 1)  # -1 speed penalty, but not less than 1
+                if not self.boosted():
+                    self.set_timer("stagger", current_time, self.recover_speed)  # Unboosted, it wears off after the next move
+                self.last_hit = current_time
+                self.wake_regen()
+
+    def special_attack(self):
+        if self.special_attack_ready:
+            current_time = self.world.clock.now()
+            for sprite in self.world.space.within_radius("enemy", self.rect.center, WIDTH // 5):
+                sprite.health -= 500  # Increased special attack damage
+                sprite.speed = 0  # Prevent movement
+                sprite.freeze_end_time = current_time + 2000  # Freeze for 2 seconds
+                sprite.set_effect("frozen")
+                if sprite.health <= 0:
+                    sprite.kill()
+                    self.reward_kill(sprite)
+            self.special_attack_ready = False
+            self.special_attack_time = current_time + 30000  # 30 seconds cooldown
+            self.set_timer("special_attack", self.special_attack_time, self.special_attack_recharged)
+
+    # Spend inventory from the upgrade menu (choice 1-5, in inventory order)
+    def apply_upgrade(self, choice):
+        if choice == 1 and self.inventory["Gleam Berry"] > 0:
+            self.max_health += 10
+            self.inventory["Gleam Berry"] -= 1
+            self.wake_regen()
+        if choice == 2 and self.inventory["Shimmering Apple"] > 0:
+            self.base_speed += 1
+            self.inventory["Shimmering Apple"] -= 1
+            if not self.boosted():
+                self.speed = self.base_speed
+        if choice == 3 and self.inventory["Ethereal Pear"] > 0:
+            self.level += 1
+            self.inventory["Ethereal Pear"] -= 1
+        if choice == 4 and self.inventory["Flamefruit"] > 0:
+            self.damage_reduction += 5
+            self.inventory["Flamefruit"] -= 1
+        if choice == 5 and self.inventory["Moonbeam Melon"] > 0:
+            self.base_damage += 5
+            self.inventory["Moonbeam Melon"] -= 1
+            if not self.melon_active():
+                self.damage = self.base_damage
+
+    # Timed effects, each fired by the world's scheduler once its end time has passed
+
+    def end_invulnerability(self, now):
+        self.invulnerable = False
+        self.image = self.default_image
+
+    # End melon's damage increase
+    def end_melon(self, now):
+        self.damage = self.base_damage
+
+    # Drop the oldest damage reduction stack (they all last 5 seconds)
+    def end_damage_reduction(self, now):
+        self.damage_reduction_end_times.popleft()
+        self.damage_reduction -= 10
+
+    # Reset speed after speed boost ends
+    def end_speed_boost(self, now):
+        self.speed = self.base_speed
+
+    def recover_speed(self, now):
+        if not self.boosted():
+            self.speed = self.base_speed
+
+    def special_attack_recharged(self, now):
+        self.special_attack_ready = True
+
+    def end_flamefruit(self, now):
+        self.flamefruit_active = False
+
+    # Health regeneration over time: +1 every 5 seconds while below max health
+    def regenerate(self, now):
+        if self.health < self.max_health:
+            self.health += 1
+            self.last_regen_time = now
+            self.set_timer("regen", now + 5000, self.regenerate)
+        # At full health the timer stays off until wake_regen()
+
+    # Restart regeneration after health dropped below max (or max health went up)
+    def wake_regen(self):
+        if "regen" not in self.timers and self.health < self.max_health:
+            self.set_timer("regen", self.last_regen_time + 5000, self.regenerate)
+
+# Fruit class
+class Fruit(Entity):
+    space_layer = "fruit"
+
+    def __init__(self, world, x, y, name, image_key):
+        super().__init__(world)
+        self.reset(x, y, name, image_key)
+
+    def reset(self, x, y, name, image_key):
+        self.set_image(image_key)
+        self.rect.topleft = (x, y)
+        self.name = name
+        self.born = self.world.clock.now()
+
+# Ripple class
+class Ripple(Entity):
+    space_layer = "ripple"
+
+    def __init__(self, world, x, y):
+        super().__init__(world, "ripple")
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        self.rect.center = (x, y)
+        self.speed = 1  # Reduced speed
+
+    def update(self):
+        nearest_enemy, nearest_distance = self.world.space.nearest("enemy", self.rect.center)
+
+        if nearest_enemy:
+            if self.rect.centerx < nearest_enemy.rect.centerx:
+                self.rect.x += self.speed
+            elif self.rect.centerx > nearest_enemy.rect.centerx:
+                self.rect.x -= self.speed
+            if self.rect.centery < nearest_enemy.rect.centery:
+                self.rect.y += self.speed
+            elif self.rect.centery > nearest_enemy.rect.centery:
+                self.rect.y -= self.speed
+            self.moved()
+
+            if pygame.sprite.collide_rect(self, nearest_enemy):
+                nearest_enemy.health -= 10000  # Ripple deals massive damage
+                if nearest_enemy.health <= 0:
+                    nearest_enemy.kill()
+                self.kill()
+
+# What sets one kind of enemy apart from another. Every enemy is an Enemy holding
+# its archetype, so a new kind of enemy is a new ARCHETYPES entry, not a new class.
+Archetype = namedtuple("Archetype", (
+    "name",  # Key in ARCHETYPES; Balance.<name>_health overrides health
+    "code",  # Saves identify it by this number (0-253), so never change or reuse one
+    "image_key",
+    "health",
+    "aggro_radius",
+    "follows_lure",  # Whether an active Flamefruit lure attracts it
+    "damage_formula",  # Contact damage is base + player level // divisor
+    "group",  # World attribute holding the live ones; World makes one per name in use
+    "spawn_margin",  # Random spawns keep this far from the right and bottom edges
+    "experience",  # Awarded to the player for the kill
+    "unblocks_spawners",  # Whether its death lets a blocked spawner try again
+    "respawn_delay",  # ms before Malakar may spawn again after the player kills one
+))
+
+ARCHETYPES = {
+    "nightcrawler": Archetype("nightcrawler", 0, "enemy", 100, WIDTH // 5, True, (1, 4), "enemies", 45, 50, False, 0),
+    "boss": Archetype("boss", 1, "bossenemy", 500, WIDTH // 5, False, (10, 2), "bossenemies", 90, 550, True, 0),
+    "malakar": Archetype("malakar", 2, "malakar", 5000, WIDTH // 2, False, (10, 1), "malakar_group", 90, 1050, True, 15000),
+}
+
+# Names of the World groups enemies live in, in ARCHETYPES order
+ENEMY_GROUPS = tuple(dict.fromkeys(archetype.group for archetype in ARCHETYPES.values()))
+
+class Enemy(Entity):
+    __slots__ = ("archetype", "default_image", "radius", "health", "max_health", "speed", "freeze_end_time")
+    space_layer = "enemy"
+
+    def __init__(self, world, archetype, x, y):
+        super().__init__(world)
+        self.reset(archetype, x, y)
+
+    def reset(self, archetype, x, y):
+        self.archetype = archetype
+        self.set_image(archetype.image_key)
+        self.default_image = self.image
+        # Bounding circle of the rect, which pygame's collide_circle_ratio would otherwise
+        # cache on first use and keep when a pooled enemy comes back as another archetype
+        self.radius = 0.5 * ((self.rect.width ** 2 + self.rect.height ** 2) ** 0.5)
+        self.rect.topleft = (x, y)
+        self.speed = self.world.rng.uniform(0.5, 1.5)  # Reduced by half
+        self.freeze_end_time = 0  # Track freeze time
+        self.health = self.max_health = self.world.balance.health(archetype)
+
+    def contact_damage(self, player):
+        base, divisor = self.archetype.damage_formula
+        return base + player.level // divisor
+
+    def update(self):
+        if not self.alive():
+            return  # Killed earlier in this step's update (Group.update runs over a copy)
+        player = self.world.player
+        current_time = self.world.clock.now()
+        if current_time < self.freeze_end_time:
+            self.speed = 0
+        else:
+            self.speed = self.world.rng.uniform(0.5, 1.5)  # Restore speed
+            if self.image is not self.default_image:
+                self.set_effect(None)
+
+        navigation = self.world.navigation
+        # Only move towards the player if within aggro radius
+        if pygame.sprite.collide_circle_ratio(self.archetype.aggro_radius / self.rect.width)(self, player):
+            self.step_towards(player.rect.x, player.rect.y, navigation and navigation.chase)
+            if pygame.sprite.collide_rect(self, player):
+                player.take_damage(self.contact_damage(player))
+        elif self.archetype.follows_lure and player.flamefruit_active and player.flamefruit_position:
+            # Move towards the location where flamefruit was collected
+            self.step_towards(*player.flamefruit_position, navigation and navigation.lure)
+        elif self.world.activity is not None:
+            self.world.activity.idle(self)  # Nothing to do until the player gets closer
+
+    def kill(self):
+        super().kill()
+        self.world.enemy_killed(self)
+
+    # Show a cached tinted variant of the default image, or the default image for None
+    def set_effect(self, effect):
+        if self.default_image is None:
+            return
+        self.image = tint_cache.get(self.default_image, effect) if effect else self.default_image
+
+    # Step towards (x, y), along the flow field where it has a direction
+    def step_towards(self, x, y, field=None):
+        direction = field.direction(self.rect.center) if field else None
+        if direction is not None:
+            dx, dy = direction
+            self.rect.x += dx * self.speed
+            self.rect.y += dy * self.speed
+            self.moved()
+            return
+        if self.rect.x < x:
+            self.rect.x += self.speed
+        elif self.rect.x > x:
+            self.rect.x -= self.speed
+        if self.rect.y < y:
+            self.rect.y += self.speed
+        elif self.rect.y > y:
+            self.rect.y -= self.speed
+        self.moved()
+
+# The whole game state, advanced one frame at a time with step(dt).
+# Pass images=None to run with no surfaces at all, and a ManualClock plus a seed
+# to make runs deterministic and faster than real time. crowd=True moves enemies
+# with the vectorized crowd engine (needs numpy). activity=False keeps every
+# enemy updating each frame instead of letting idle ones sleep. balance
+# overrides the default Balance numbers. size is the (width, height) of the
+# playfield, by default the screen above the HUD panel; larger worlds are shown
+# through a camera.Camera. navigation=False has enemies step straight at their
+# target instead of following the shared flow fields.
+class World:
+    def __init__(self, images=None, clock=None, seed=None, crowd=False, activity=True, balance=None, size=None, navigation=True):
+        self.images = images
+        self.clock = clock if clock is not None else ManualClock()
+        self.seed = seed
+        self.balance = balance if balance is not None else Balance()
+        self.bounds = pygame.Rect((0, 0), size or (WIDTH, PLAYABLE_HEIGHT))
+        self.rng = random.Random(seed)
+        self.frame = 0
+        self.crowd = CrowdEngine(self) if crowd else None
+
+        # Create player, groups and the spatial index every entity keeps itself in
+        self.scheduler = Scheduler()
+        self.pool = EntityPool()
+        self.space = SpatialHash()
+        self.player = Player(self)
+        self.all_sprites = pygame.sprite.Group()
+        self.fruits = pygame.sprite.Group()
+        for group in ENEMY_GROUPS:  # enemies, bossenemies, malakar_group
+            setattr(self, group, pygame.sprite.Group())
+        self.active = pygame.sprite.Group()  # Entities whose update() runs each step
+        self.activity = Activity(self) if activity and not crowd else None  # Crowd enemies have no update() to skip
+        self.navigation = Navigation(self) if navigation and not crowd else None  # The crowd engine moves its own enemies
+
+        self.add(self.player)
+
+        # Create initial fruits and enemies
+        for _ in range(10):  # Increased number of fruits
+            self.spawn_fruit()
+        for _ in range(10):  # Increased number of enemies
+            self.spawn_enemy()
+
+        # Timers for spawning
+        now = self.clock.now()
+        self.fruit_spawn_time = now
+        self.enemy_spawn_time = now
+        self.bossenemy_spawn_time = now
+        self.malakar_spawn_allowed_time = now + 30000  # Malakar spawns after 30 seconds
+        self.director = SpawnDirector(self)
+        self.director.start()
+
+        # Last collected fruit, for the renderer to display
+        self.fruit_name = ""
+        self.fruit_name_time = None
+
+    # Rebuild every scheduled timer from the spawn times and the player's effect
+    # end times, after they were set directly (e.g. when loading a save)
+    def restart_timers(self):
+        self.scheduler = Scheduler()
+        self.director.start()
+        self.player.restart_timers()
+        if self.activity is not None:
+            self.activity = Activity(self)  # Everyone starts awake
+
+    def image(self, key):
+        if self.images is None:
+            return None
+        return self.images[key]
+
+    @property
+    def game_over(self):
+        return self.player.health <= 0
+
+    @property
+    def game_won(self):
+        return self.player.level >= 100
+
+    # Add an entity to all_sprites, the given groups and the spatial index
+    def add(self, entity, *groups):
+        self.all_sprites.add(entity)
+        for group in groups:
+            group.add(entity)
+        self.space.insert(entity, entity.space_layer)
+        return entity
+
+    # The group of every archetype group name, for code that handles all enemies alike
+    def enemy_groups(self):
+        return [getattr(self, group) for group in ENEMY_GROUPS]
+
+    def enemy_count(self):
+        return sum(len(group) for group in self.enemy_groups())
+
+    # Enemy class to instantiate, crowd-backed when the crowd engine is on
+    def enemy_class(self):
+        return crowd_class(Enemy) if self.crowd is not None else Enemy
+
+    # Spawners take a top-left position, or pick a random one
+    def spawn_fruit(self, position=None):
+        name, image_key = self.rng.choice(FRUIT_TYPES)
+        x, y = position or self.random_position(30)
+        fruit = self.pool.acquire(Fruit, self, x, y, name, image_key)
+        return self.add(fruit, self.fruits)
+
+    # Spawn an enemy of the named archetype. Crowd enemies stay out of active:
+    # CrowdEngine.step moves them, so they have no update() to run.
+    def spawn(self, name, position=None):
+        archetype = ARCHETYPES[name]
+        enemy = self.pool.acquire(self.enemy_class(), self, archetype, *(position or self.random_position(archetype.spawn_margin)))
+        if self.crowd is not None:
+            return self.add(enemy, getattr(self, archetype.group))
+        return self.add(enemy, getattr(self, archetype.group), self.active)
+
+    def spawn_enemy(self, position=None):
+        return self.spawn("nightcrawler", position)
+
+    def spawn_bossenemy(self, position=None):
+        return self.spawn("boss", position)
+
+    def spawn_malakar(self, position=None):
+        return self.spawn("malakar", position)
+
+    # Random top-left position at least margin from the right and bottom edges
+    def random_position(self, margin):
+        width, height = self.bounds.size
+        return self.rng.randint(0, width - margin), self.rng.randint(0, height - margin)
+
+    def spawn_ripple(self, position):
+        ripple = self.pool.acquire(Ripple, self, *position)
+        return self.add(ripple, self.active)
+
+    def special_attack(self):
+        self.player.special_attack()
+
+    # Called by Enemy.kill()
+    def enemy_killed(self, enemy):
+        if self.activity is not None:
+            self.activity.forget(enemy)
+        if enemy.archetype.unblocks_spawners:
+            self.director.unblock()
+
+    # Advance the game by one frame of dt milliseconds.
+    # dx/dy is the arrow-key direction and attack is whether SPACE is held.
+    def step(self, dt, dx=0, dy=0, attack=False):
+        self.clock.advance(dt)
+        if self.game_won or self.game_over:
+            return
+        current_time = self.clock.now()
+        player = self.player
+        profiler = frame_profiler
+
+        # Handle player movement
+        with profiler.phase("sim.move"):
+            player.move(dx, dy)
+            if self.activity is not None:
+                self.activity.player_moved()
+
+        with profiler.phase("sim.collisions"):
+            # Check for collisions with fruits
+            for fruit in self.space.overlapping("fruit", player.rect):
+                fruit.kill()
+                self.fruit_name = player.collect_fruit(fruit)
+                self.fruit_name_time = current_time
+
+            # Check for collisions with enemies (NightCrawlers, bosses and Malakar alike)
+            if attack:
+                for enemy in self.space.overlapping("enemy", player.rect):
+                    player.attack(enemy)
+
+        # Spawners and timed player effects that are due
+        with profiler.phase("sim.spawning"):
+            self.scheduler.run(current_time)
+
+        # Point the flow fields at where the player and the lure are now
+        if self.navigation is not None:
+            self.navigation.update()
+
+        # Update sprites (the player and fruit have nothing to update)
+        with profiler.phase("sim.update"):
+            if profiler.enabled:
+                self.profiled_update()
+            else:
+                self.active.update()
+        if self.crowd is not None:
+            with profiler.phase("sim.crowd"):
+                self.crowd.step()
+        self.frame += 1
+
+    # active.update(), timing each entity type's update() for the profiler
+    def profiled_update(self):
+        totals = {}
+        clock = time.perf_counter
+        for sprite in self.active.sprites():
+            start = clock()
+            sprite.update()
+            name = sprite.archetype.name if isinstance(sprite, Enemy) else type(sprite).__name__
+            totals[name] = totals.get(name, 0.0) + clock() - start
+        for name, seconds in totals.items():
+            frame_profiler.add_ms(f"sim.update.{name}", seconds * 1000)
+
+# Live entities by group, for run summaries
+def entity_counts(world):
+    return {
+        "all_sprites": len(world.all_sprites),
+        "fruits": len(world.fruits),
+        **{group: len(getattr(world, group)) for group in ENEMY_GROUPS},
+    }
@@ -0,0 +1,179 @@
+# Uniform-grid spatial hash for broadphase queries.
+#
+# Objects are stored per layer ("enemy", "fruit", ...) in every grid cell their rect
+# touches, and keep their cell range so a move that stays inside the same cells is a
+# single comparison. Cells are insertion-ordered dicts rather than sets, so query
+# results (and therefore seeded simulations) come out in a deterministic order.
+
+import math
+
+CELL_SIZE = 128
+BRUTE_FORCE_LIMIT = 32  # Below this many objects in a layer, nearest() just scans them all
+
+class SpatialHash:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (layer, cx, cy) -> {obj: None}
+        self.entries = {}  # obj -> (layer, cell range)
+        self.members = {}  # layer -> {obj: None}, in insertion order
+        self.bounds = None  # (cx0, cy0, cx1, cy1) of every cell ever used, to bound nearest()
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, obj, layer):
+        cells = self.cell_range(obj.rect)
+        self.entries[obj] = (layer, cells)
+        self.members.setdefault(layer, {})[obj] = None
+        self._add(obj, layer, cells)
+
+    def remove(self, obj):
+        entry = self.entries.pop(obj, None)
+        if entry is None:
+            return
+        layer, cells = entry
+        del self.members[layer][obj]
+        self._discard(obj, layer, cells)
+
+    # Call after obj.rect changed
+    def move(self, obj):
+        entry = self.entries.get(obj)
+        if entry is None:
+            return
+        layer, old_cells = entry
+        rect = obj.rect
+        size = self.cell_size
+        cells = (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size)
+        if cells == old_cells:
+            return
+        self._discard(obj, layer, old_cells)
+        self._add(obj, layer, cells)
+        self.entries[obj] = (layer, cells)
+
+    def __contains__(self, obj):
+        return obj in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def count(self, layer):
+        return len(self.members.get(layer, ()))
+
+    def _add(self, obj, layer, cells):
+        cx0, cy0, cx1, cy1 = cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = self.cells.get((layer, cx, cy))
+                if bucket is None:
+                    bucket = self.cells[(layer, cx, cy)] = {}
+                bucket[obj] = None
+        if self.bounds is None:
+            self.bounds = cells
+        else:
+            bx0, by0, bx1, by1 = self.bounds
+            self.bounds = (min(bx0, cx0), min(by0, cy0), max(bx1, cx1), max(by1, cy1))
+
+    def _discard(self, obj, layer, cells):
+        cx0, cy0, cx1, cy1 = cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                key = (layer, cx, cy)
+                bucket = self.cells[key]
+                del bucket[obj]
+                if not bucket:
+                    del self.cells[key]
+
+    # Every object in the given cell range, once each
+    def _candidates(self, layer, cx0, cy0, cx1, cy1):
+        found = {}
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((layer, cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    # Objects whose rect overlaps rect (same test as pygame.sprite.collide_rect)
+    def overlapping(self, layer, rect):
+        if not self.members.get(layer):
+            return []
+        candidates = self._candidates(layer, *self.cell_range(rect))
+        return [obj for obj in candidates if rect.colliderect(obj.rect)]
+
+    # Objects whose rect center is within radius of point
+    def within_radius(self, layer, point, radius):
+        if not self.members.get(layer):
+            return []
+        x, y = point
+        size = self.cell_size
+        candidates = self._candidates(layer, int(x - radius) // size, int(y - radius) // size, int(x + radius) // size, int(y + radius) // size)
+        radius_squared = radius * radius
+        result = []
+        for obj in candidates:
+            cx, cy = obj.rect.center
+            if (cx - x) ** 2 + (cy - y) ** 2 <= radius_squared:
+                result.append(obj)
+        return result
+
+    # The object whose rect center is closest to point, searching outwards ring by ring.
+    # Returns (obj, distance), or (None, inf) when the layer is empty.
+    def nearest(self, layer, point):
+        members = self.members.get(layer)
+        if not members:
+            return None, math.inf
+        x, y = point
+        if len(members) <= BRUTE_FORCE_LIMIT:
+            return _nearest_of(members, x, y)
+        size = self.cell_size
+        px, py = int(x) // size, int(y) // size
+        bx0, by0, bx1, by1 = self.bounds
+        max_ring = max(px - bx0, bx1 - px, py - by0, by1 - py)
+        cells = self.cells
+        best = None
+        best_distance_squared = math.inf
+        seen = set()
+        ring = 0
+        while ring <= max_ring:
+            for cx, cy in _ring_cells(px, py, ring):
+                bucket = cells.get((layer, cx, cy))
+                if not bucket:
+                    continue
+                for obj in bucket:
+                    if obj in seen:
+                        continue
+                    seen.add(obj)
+                    ox, oy = obj.rect.center
+                    distance_squared = (ox - x) ** 2 + (oy - y) ** 2
+                    if distance_squared < best_distance_squared:
+                        best = obj
+                        best_distance_squared = distance_squared
+            # Anything whose center lies in a further ring is more than ring * size away
+            if best is not None and best_distance_squared <= (ring * size) ** 2:
+                break
+            ring += 1
+        return best, math.sqrt(best_distance_squared)
+
+def _nearest_of(objects, x, y):
+    best = None
+    best_distance_squared = math.inf
+    for obj in objects:
+        ox, oy = obj.rect.center
+        distance_squared = (ox - x) ** 2 + (oy - y) ** 2
+        if distance_squared < best_distance_squared:
+            best = obj
+            best_distance_squared = distance_squared
+    return best, math.sqrt(best_distance_squared)
+
+# Cells at Chebyshev distance ring from (px, py)
+def _ring_cells(px, py, ring):
+    if ring == 0:
+        yield px, py
+        return
+    for cx in range(px - ring, px + ring + 1):
+        yield cx, py - ring
+        yield cx, py + ring
+    for cy in range(py - ring + 1, py + ring):
+        yield px - ring, cy
+        yield px + ring, cy
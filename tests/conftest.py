@@ -0,0 +1,32 @@
+# Shared setup for the tests: import the game modules from the repository root
+# and keep pygame off any real display.
+
+import os
+import random
+import sys
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulation import STEP_MS, ManualClock, World
+
+# Headless, seeded world
+@pytest.fixture
+def make_world():
+    def make(seed=1, **kwargs):
+        return World(clock=ManualClock(), seed=seed, **kwargs)
+    return make
+
+# Step a world with random arrow keys, changing direction every half second; returns the inputs used
+def play(world, steps, seed=0):
+    rng = random.Random(seed)
+    inputs = []
+    dx = dy = 0
+    for step in range(steps):
+        if step % 30 == 0:
+            dx, dy = rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1))
+        inputs.append((dx, dy, True))
+        world.step(STEP_MS, dx, dy, True)
+    return inputs
@@ -0,0 +1,39 @@
+import math
+
+from conftest import play
+from simulation import Balance
+
+def far_enemy(world):
+    player = world.player.rect.center
+    return max(world.enemies, key=lambda enemy: math.dist(enemy.rect.center, player))
+
+def test_enemies_killed_mid_update_stay_dead(make_world):
+    world = make_world(seed=7, balance=Balance(enemy_budget=0, boss_budget=0))
+    enemy = far_enemy(world)
+    for other in list(world.enemies):
+        if other is not enemy:
+            other.kill()
+    # What happens when a ripple kills an enemy that Group.update has yet to reach
+    enemy.kill()
+    enemy.update()
+    assert enemy not in world.activity.sleeping
+    assert enemy not in world.active
+    health = world.player.health
+    play(world, 600)
+    assert not world.enemies
+    assert not [sprite for sprite in world.active if not sprite.alive()]
+    assert world.player.health >= health
+
+def test_idle_ignores_dead_enemies(make_world):
+    world = make_world(seed=2)
+    enemy = far_enemy(world)
+    enemy.kill()
+    world.activity.idle(enemy)
+    assert world.activity.sleeping == {}
+
+def test_no_dead_enemies_left_sleeping(make_world):
+    for seed in range(10):
+        world = make_world(seed=seed)
+        play(world, 1200, seed=seed)
+        assert all(enemy.alive() for enemy in world.activity.sleeping)
+        assert all(sprite.alive() for sprite in world.active)
@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+
+import pygame
+import pytest
+
+import assetcache
+import assets
+from assets import IMAGES, load_source_images
+from settings import WIDTH, HEIGHT
+
+@pytest.fixture(scope="module", autouse=True)
+def display():
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+
+# Copies of the source images, so tests can touch them
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    for name, _ in IMAGES.values():
+        shutil.copy2(os.path.join(assets.ASSET_DIR, name), source_dir)
+    monkeypatch.setattr(assets, "ASSET_DIR", str(source_dir))
+    monkeypatch.setattr(assetcache, "ASSET_DIR", str(source_dir))
+    return source_dir
+
+def pixels(images):
+    return {key: pygame.image.tobytes(image, "RGBA") for key, image in images.items()}
+
+def test_cached_images_match_the_source_images(sources, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    assert sorted(assetcache.build_cache(cache_dir=cache_dir)) == sorted(IMAGES)
+    assert assetcache.build_cache(cache_dir=cache_dir) == []  # Up to date
+    assert pixels(assetcache.load_cached_images(cache_dir)) == pixels(load_source_images())
+
+def test_only_stale_entries_are_rebuilt(sources, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    assetcache.build_cache(cache_dir=cache_dir)
+    stat = os.stat(sources / "enemy.png")
+    os.utime(sources / "enemy.png", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    os.remove(os.path.join(cache_dir, "background.rgb"))
+    assert sorted(assetcache.build_cache(cache_dir=cache_dir)) == ["background", "enemy"]
+    assert assetcache.build_cache(cache_dir=cache_dir) == []
+    assert sorted(assetcache.build_cache(force=True, cache_dir=cache_dir)) == sorted(IMAGES)
+
+def test_a_manifest_from_another_version_rebuilds_everything(sources, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    assetcache.build_cache(cache_dir=cache_dir)
+    path = os.path.join(cache_dir, assetcache.MANIFEST_FILE)
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest["version"] = assetcache.CACHE_VERSION + 1
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError):
+        assetcache.load_cached_images(cache_dir)
+    assert sorted(assetcache.build_cache(cache_dir=cache_dir)) == sorted(IMAGES)
+    assert pixels(assetcache.load_cached_images(cache_dir)) == pixels(load_source_images())
@@ -0,0 +1,83 @@
+import os
+import shutil
+import time
+
+import pygame
+import pytest
+
+import assetcache
+import assets
+from assets import IMAGES, AssetManager, decode_source_image
+from settings import WIDTH, HEIGHT
+
+@pytest.fixture(scope="module", autouse=True)
+def display():
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+
+# Copies of the source images and an empty cache directory
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    for name, _ in IMAGES.values():
+        shutil.copy2(os.path.join(assets.ASSET_DIR, name), source_dir)
+    monkeypatch.setattr(assets, "ASSET_DIR", str(source_dir))
+    monkeypatch.setattr(assetcache, "ASSET_DIR", str(source_dir))
+    return source_dir
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+def wait_ready(manager, keys, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not manager.ready(keys):
+        assert time.monotonic() < deadline, "images never loaded"
+        time.sleep(0.01)
+
+def same_pixels(image, key):
+    return pygame.image.tobytes(image, "RGBA") == pygame.image.tobytes(decode_source_image(key).convert_alpha(), "RGBA")
+
+def test_requested_images_load_through_a_fresh_cache(sources, cache_dir):
+    loaded = []
+    manager = AssetManager(cache_dir)
+    manager.on_load = lambda key, image: loaded.append(key)
+    manager.start(["enemy", "ripple"])
+    try:
+        wait_ready(manager, ["enemy", "ripple"])
+        assert manager.manifest is not None  # The worker built the cache first
+        assert sorted(loaded) == ["enemy", "ripple"]
+        assert same_pixels(manager["enemy"], "enemy")
+    finally:
+        manager.close()
+
+def test_an_unusable_cache_falls_back_to_the_source_images(sources, cache_dir, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError("read-only file system")
+    monkeypatch.setattr(assetcache, "build_cache", broken)
+    manager = AssetManager(cache_dir).start(["enemy"])
+    try:
+        wait_ready(manager, ["enemy"])
+        assert manager.manifest is None
+        assert same_pixels(manager["enemy"], "enemy")
+    finally:
+        manager.close()
+
+def test_an_entry_missing_from_the_manifest_is_decoded_from_its_source(sources, cache_dir):
+    assetcache.build_cache(cache_dir=cache_dir)
+    manager = AssetManager(cache_dir)  # Not started: lookups decode on this thread
+    manager.manifest = assetcache.read_manifest(cache_dir)
+    del manager.manifest["atlas"]["rects"]["enemy"]
+    manager.cache_ready.set()
+    assert same_pixels(manager["enemy"], "enemy")
+    assert same_pixels(manager["ripple"], "ripple")  # Still read from the cache
+
+def test_a_late_worker_result_does_not_replace_an_image_already_in_use(sources, cache_dir):
+    manager = AssetManager(cache_dir)
+    image = manager["enemy"]  # Needed before the worker got to it
+    manager.request("enemy")
+    assert manager.requests.empty()  # Already loaded: not queued again
+    manager.results.put(("enemy", decode_source_image("enemy")))
+    assert manager.poll() == 0
+    assert manager["enemy"] is image
@@ -0,0 +1,64 @@
+import pygame
+import pytest
+
+from camera import Camera, ChunkedBackground
+from settings import WIDTH, PLAYABLE_HEIGHT
+
+# Small source image with a different color at every pixel
+def gradient(width=100, height=60):
+    source = pygame.Surface((width, height))
+    for y in range(height):
+        for x in range(width):
+            source.set_at((x, y), (x * 2, y * 4, 100))
+    return source
+
+@pytest.mark.parametrize("center, topleft", [
+    ((10, 10), (0, 0)),  # Top left corner
+    ((3990, 2990), (4000 - WIDTH, 3000 - PLAYABLE_HEIGHT)),  # Bottom right corner
+    ((2000, 1500), (2000 - WIDTH // 2, 1500 - PLAYABLE_HEIGHT // 2)),  # Centered
+])
+def test_the_view_follows_the_player_without_leaving_the_world(make_world, center, topleft):
+    world = make_world(seed=1, size=(4000, 3000))
+    world.player.rect.center = center
+    camera = Camera(gradient())
+    camera.follow(world)
+    assert camera.rect.topleft == topleft
+    assert world.bounds.contains(camera.rect)
+
+def test_only_sprites_near_the_view_are_drawn(make_world):
+    world = make_world(seed=1, size=(4000, 3000))
+    near = world.spawn("nightcrawler", (WIDTH + 40, 100))  # Just past the right edge of the view, inside the margin
+    far = world.spawn("nightcrawler", (2000, 2000))
+    camera = Camera(gradient())
+    camera.rect.topleft = (0, 0)
+    visible = camera.visible(world)
+    assert near in visible and far not in visible
+
+def test_background_chunks_mirror_tile_the_source():
+    source = gradient()
+    background = ChunkedBackground(source, chunk_size=64)
+    view = pygame.Rect(150, 70, 300, 200)
+    surface = pygame.Surface(view.size)
+    background.draw(surface, view)
+    width, height = source.get_size()
+    for y in range(0, view.height, 7):
+        for x in range(0, view.width, 7):
+            world_x, world_y = view.x + x, view.y + y
+            source_x, source_y = world_x % width, world_y % height
+            if world_x // width % 2:
+                source_x = width - 1 - source_x
+            if world_y // height % 2:
+                source_y = height - 1 - source_y
+            assert surface.get_at((x, y)) == source.get_at((source_x, source_y)), (world_x, world_y)
+
+def test_background_chunks_evict_the_least_recently_used():
+    background = ChunkedBackground(gradient(), chunk_size=64, max_chunks=2)
+    first = background.chunk(0, 0)
+    background.chunk(1, 0)
+    assert background.chunk(0, 0) is first  # Now the most recently used
+    background.chunk(2, 0)  # Evicts (1, 0)
+    assert list(background.chunks) == [(0, 0), (2, 0)]
+    assert background.stats() == {"chunks": 2, "builds": 3, "evictions": 1}
+    background.chunk(1, 0)  # Built again, evicting (0, 0)
+    assert list(background.chunks) == [(2, 0), (1, 0)]
+    assert background.stats() == {"chunks": 2, "builds": 4, "evictions": 2}
@@ -0,0 +1,60 @@
+import random
+
+import numpy as np
+import pytest
+
+import savegame
+from conftest import play
+from simulation import STEP_MS, Balance, Enemy
+
+SPEEDS = (0.5, 1.25, 1.5, 0.75)  # Speed every enemy rolls, by frame, so both engines roll alike
+
+# Stands in for the crowd engine's NumPy generator
+class FixedSpeeds:
+    def __init__(self, world):
+        self.world = world
+
+    def uniform(self, low, high, n):
+        return np.full(n, SPEEDS[self.world.frame % len(SPEEDS)])
+
+def state(world):
+    enemies = sorted((enemy.archetype.code, enemy.rect.x, enemy.rect.y, enemy.health) for group in world.enemy_groups() for enemy in group)
+    player = world.player
+    return enemies, tuple(player.rect), player.health, player.experience, world.rng.getstate()
+
+# Ripples chase whichever enemy is nearest when they update, which the crowd
+# engine moves after them rather than among them, so the game runs without fruit
+@pytest.mark.parametrize("seed", [0, 3, 7])
+def test_the_crowd_engine_moves_enemies_like_their_own_updates(make_world, monkeypatch, seed):
+    balance = Balance(fruit_spawn_interval=10 ** 9)
+    single = make_world(seed=seed, activity=False, navigation=False, balance=balance)
+    for fruit in single.fruits.sprites():
+        fruit.kill()
+    crowd = make_world(seed=seed, crowd=True, balance=balance)
+    crowd.clock.time = single.clock.time
+    savegame.apply(crowd, savegame.snapshot(single))
+    for world in (single, crowd):
+        monkeypatch.setattr(world.rng, "uniform", lambda low, high, world=world: SPEEDS[world.frame % len(SPEEDS)])
+    crowd.crowd.rng = FixedSpeeds(crowd)
+
+    rng = random.Random(seed)
+    dx = dy = 0
+    for step in range(1800):
+        if step % 30 == 0:
+            dx, dy = rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1))
+        single.step(STEP_MS, dx, dy, True)
+        crowd.step(STEP_MS, dx, dy, True)
+        assert state(crowd) == state(single), f"step {step}"
+    assert single.player.experience and single.player.health < 100  # Enemies were killed and hit back
+
+def test_crowd_enemies_are_not_updated_one_by_one(make_world):
+    world = make_world(seed=1, crowd=True)
+    play(world, 60)
+    world.spawn("boss", (400, 300))
+    world.spawn_ripple((100, 100))
+    assert world.enemy_count()
+    assert all(not isinstance(sprite, Enemy) for sprite in world.active)
+    restored = make_world(seed=2, crowd=True)
+    restored.clock.time = world.clock.time
+    savegame.apply(restored, savegame.decode(savegame.encode(savegame.snapshot(make_world(seed=3)))))
+    assert restored.enemy_count() and not any(isinstance(sprite, Enemy) for sprite in restored.active)
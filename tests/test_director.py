@@ -0,0 +1,43 @@
+import math
+
+from assets import SPRITE_SIZES
+from conftest import play
+from director import SAFE_DISTANCE
+
+class NearPlayer:
+    def __init__(self, position):
+        self.position = position
+        self.calls = 0
+
+    # Every random position lands on the player
+    def randint(self, low, high):
+        self.calls += 1
+        return self.position[(self.calls - 1) % 2]
+
+def spawn_distance(world, enemy):
+    return math.dist(enemy.rect.center, world.player.rect.center)
+
+def test_enemies_keep_their_distance_when_every_draw_is_near_the_player(make_world):
+    world = make_world(seed=1)
+    rng = world.rng
+    player = world.player.rect.center
+    for name, image_key in (("nightcrawler", "enemy"), ("boss", "bossenemy"), ("malakar", "malakar")):
+        width, height = SPRITE_SIZES[image_key]
+        world.rng = NearPlayer((player[0] - width // 2, player[1] - height // 2))
+        position = world.director.place("enemy", 90, image_key, avoid_player=True)
+        world.rng = rng
+        enemy = world.spawn(name, position)
+        assert spawn_distance(world, enemy) >= SAFE_DISTANCE
+
+def test_spawned_enemies_never_land_near_the_player(make_world):
+    for seed in range(10):
+        world = make_world(seed=seed)
+        spawned = []
+        original = world.spawn
+        def spawn(name, position=None):
+            enemy = original(name, position)
+            spawned.append(spawn_distance(world, enemy))
+            return enemy
+        world.spawn = spawn
+        play(world, 3600, seed=seed)
+        assert spawned and min(spawned) >= SAFE_DISTANCE
@@ -0,0 +1,96 @@
+import pygame
+
+from navigation import FlowField
+
+class FakeWorld:
+    def __init__(self, width=640, height=640):
+        self.bounds = pygame.Rect(0, 0, width, height)
+
+def center(cell, size=32):
+    return cell[0] * size + size // 2, cell[1] * size + size // 2
+
+# Follow the field from start until it has no direction; returns the cells visited
+def walk(field, start, limit=200):
+    cell = start
+    path = [cell]
+    for _ in range(limit):
+        step = field.direction(center(cell))
+        if step is None:
+            break
+        cell = (cell[0] + step[0], cell[1] + step[1])
+        path.append(cell)
+    return path
+
+def wall(x, rows):
+    return {(x, y) for y in rows}
+
+def test_open_ground_steps_straight_at_the_target():
+    field = FlowField(FakeWorld(), radius=16)
+    field.retarget(center((10, 10)))
+    assert field.direction(center((4, 12))) == (1, -1)
+    assert field.direction(center((10, 10))) is None
+    assert field.builds == 0
+
+def test_routes_around_a_wall():
+    field = FlowField(FakeWorld(), radius=16)
+    field.set_blocked(wall(8, range(2, 20)))  # Gap at rows 0-1
+    field.retarget(center((12, 10)))
+    path = walk(field, (4, 10))
+    assert path[-1] == (12, 10)
+    assert not set(path) & field.blocked
+    assert min(y for x, y in path) <= 1  # Went through the gap
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        assert max(abs(x1 - x0), abs(y1 - y0)) == 1
+        if x1 != x0 and y1 != y0:
+            assert (x1, y0) not in field.blocked and (x0, y1) not in field.blocked  # No corner cutting
+
+def test_walled_off_cells_have_no_direction():
+    field = FlowField(FakeWorld(), radius=16)
+    field.set_blocked(wall(8, range(0, 20)))
+    field.retarget(center((12, 10)))
+    assert field.direction(center((4, 10))) is None
+
+def test_moving_target_updates_incrementally():
+    field = FlowField(FakeWorld(), radius=16, budget=20)
+    field.set_blocked(wall(8, range(2, 20)))
+    field.retarget(center((12, 10)))
+    field.direction(center((4, 10)))  # First field: finished on the spot
+    assert field.builds == 1 and field.search is None
+
+    field.retarget(center((13, 10)))  # Into a neighbouring cell
+    field.advance()
+    assert field.search is not None  # Not done after one slice
+    assert field.direction(center((12, 11))) == (1, -1)  # Near the new target: from the new search
+    assert field.direction(center((4, 10))) is not None  # Far away: still the old field
+    steps = 0
+    while field.search is not None:
+        field.advance()
+        steps += 1
+    assert field.builds == 2 and steps > 1
+    assert walk(field, (4, 10))[-1] == (13, 10)
+
+    full = FlowField(FakeWorld(), radius=16)
+    full.set_blocked(field.blocked)
+    full.retarget(center((13, 10)))
+    full.build()
+    assert field.flow == full.flow
+
+def test_a_jumping_target_gets_a_fresh_field():
+    field = FlowField(FakeWorld(), radius=16, budget=20)
+    field.set_blocked(wall(8, range(2, 20)))
+    field.retarget(center((12, 10)))
+    field.build()
+    field.retarget(center((2, 10)))
+    assert field.flow is None  # Too far from the old target to fall back on
+    assert walk(field, (12, 10))[-1] == (2, 10)
+
+def test_big_enemies_steer_from_their_center(make_world):
+    world = make_world(seed=1)
+    malakar = world.spawn_malakar((200, 100))
+    player = world.player
+    player.rect.center = (malakar.rect.centerx - 64, malakar.rect.centery)  # Left of its center, right of its left edge
+    player.moved()
+    world.navigation.update()
+    x = malakar.rect.x
+    malakar.step_towards(player.rect.x, player.rect.y, world.navigation.chase)
+    assert malakar.rect.x < x
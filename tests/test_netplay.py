@@ -0,0 +1,111 @@
+import netplay
+import replay
+from simulation import Balance, ManualClock, World
+
+def test_snapshots_decode_to_what_was_encoded():
+    world = World(clock=ManualClock(), seed=2)
+    server = netplay.Server(world, port=0)
+    try:
+        server.capture()
+    finally:
+        server.close()
+    state = server.state
+    player = netplay.player_state(world, False)
+    snapshot_id, baseline_id, frame, now, decoded_player, removed, changed = netplay.decode_snapshot(netplay.encode_snapshot(1, 0, world, player, state))
+    assert (snapshot_id, baseline_id, frame) == (1, 0, world.frame)
+    assert decoded_player == player
+    assert removed == []
+    assert dict(changed) == state
+
+    # A delta carries the touched ids that still exist, and the rest as removed
+    kept = min(state)
+    payload = netplay.encode_snapshot(2, 1, world, player, state, {kept, 10 ** 6})
+    *_, removed, changed = netplay.decode_snapshot(payload)
+    assert removed == [10 ** 6]
+    assert changed == [(kept, state[kept])]
+
+def test_clients_rebuild_the_servers_state_from_deltas():
+    # Raises on the first snapshot where the client's entities or player differ
+    assert netplay.loopback(seed=3, steps=900, crawlers=0, snapshot_every=2) == 0
+
+def test_deltas_with_many_entities_on_a_large_world():
+    assert netplay.loopback(seed=1, steps=300, crawlers=300, snapshot_every=3, size=(3000, 3000)) == 0
+
+def test_upgrades_only_while_paused_and_special_attacks_only_while_playing():
+    world = World(clock=ManualClock(), seed=2)
+    player = world.player
+    player.inventory["Ethereal Pear"] = 2
+    server = netplay.Server(world, port=0)
+    try:
+        server.event(replay.UPGRADE, 3)
+        assert player.level == 1  # Mid-fight: refused
+        server.event(replay.PAUSE, 0)
+        server.event(replay.SPECIAL_ATTACK, 0)
+        assert player.special_attack_ready  # Paused: refused
+        server.event(replay.UPGRADE, 3)
+        assert player.level == 2
+        server.event(replay.THROTTLE, 3)
+        assert world.director.throttle == 0  # Not a client's to send
+        server.event(replay.PAUSE, 0)
+        server.event(replay.SPECIAL_ATTACK, 0)
+        assert not player.special_attack_ready
+    finally:
+        server.close()
+
+def test_fractional_player_stats_still_encode():
+    world = World(clock=ManualClock(), seed=2, balance=Balance(melon_damage_factor=2.5))
+    world.player.damage = world.player.base_damage * 2.5
+    world.player.speed = 5.5
+    netplay.encode_snapshot(1, 0, world, netplay.player_state(world, False), {})
+
+# Poll the server and the clients until condition() holds
+def exchange(server, clients, condition, rounds=200):
+    for _ in range(rounds):
+        server.poll(0.005)
+        for client in clients:
+            client.receive()
+        if condition():
+            return
+    raise AssertionError("timed out")
+
+def test_the_oldest_spectator_takes_over_when_the_player_leaves():
+    world = World(clock=ManualClock(), seed=2)
+    server = netplay.Server(world, port=0)
+    pilot = netplay.Client(*server.address)
+    watcher = netplay.Client(*server.address, watch=True)
+    spectator = netplay.Client(*server.address)
+    clients = [watcher, spectator]
+    try:
+        exchange(server, [pilot] + clients, lambda: len(server.connections) == 3 and all(client.world is not None for client in [pilot] + clients))
+        exchange(server, [pilot] + clients, lambda: server.connections[1].watching)
+        assert (pilot.role, watcher.role, spectator.role) == (netplay.PLAYER, netplay.SPECTATOR, netplay.SPECTATOR)
+
+        pilot.close()
+        exchange(server, clients, lambda: spectator.role == netplay.PLAYER)
+        assert watcher.role == netplay.SPECTATOR
+
+        x = world.player.rect.x
+        spectator.send_input(1, 0, False)
+        exchange(server, clients, lambda: server.pilot.input == replay.pack_input(1, 0, False))
+        for _ in range(10):
+            server.step()
+        assert world.player.rect.x > x
+    finally:
+        for client in clients:
+            client.close()
+        server.close()
+
+def test_a_watcher_never_plays():
+    world = World(clock=ManualClock(), seed=2)
+    server = netplay.Server(world, port=0)
+    watcher = netplay.Client(*server.address, watch=True)
+    try:
+        exchange(server, [watcher], lambda: watcher.world is not None and server.connections and server.connections[0].watching)
+        exchange(server, [watcher], lambda: watcher.role == netplay.SPECTATOR)
+        assert server.pilot is None
+        player = netplay.Client(*server.address)
+        exchange(server, [watcher, player], lambda: player.role == netplay.PLAYER)
+        player.close()
+    finally:
+        watcher.close()
+        server.close()
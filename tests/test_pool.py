@@ -0,0 +1,60 @@
+import pygame
+import pytest
+
+from assets import SPRITE_SIZES, load_source_images
+from pool import EntityPool
+from settings import WIDTH, HEIGHT
+from simulation import ARCHETYPES, Enemy, Ripple
+
+@pytest.fixture(scope="module")
+def images():
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+    return load_source_images()
+
+def test_a_killed_enemy_comes_back_as_a_fresh_one(make_world, images):
+    world = make_world(seed=1, images=images)
+    boss = world.spawn("boss", (300, 200))
+    boss.health = 12
+    boss.freeze_end_time = world.clock.now() + 2000
+    boss.set_effect("frozen")
+    boss.kill()
+    reused = world.pool.stats()["Enemy"]["reused"]
+
+    enemy = world.spawn("nightcrawler", (40, 50))
+    assert enemy is boss
+    assert world.pool.stats()["Enemy"]["reused"] == reused + 1
+    assert enemy.archetype is ARCHETYPES["nightcrawler"]
+    assert (enemy.health, enemy.max_health, enemy.freeze_end_time) == (100, 100, 0)
+    assert enemy.image is enemy.default_image is images["enemy"]  # Neither the boss's image nor the frozen tint
+    assert enemy.rect == pygame.Rect((40, 50), SPRITE_SIZES["enemy"])
+    assert enemy.radius == 0.5 * (enemy.rect.width ** 2 + enemy.rect.height ** 2) ** 0.5
+    assert enemy in world.enemies and enemy not in world.bossenemies
+    assert enemy not in world.space.overlapping("enemy", pygame.Rect(300, 200, 134, 134))  # Gone from where the boss was
+    assert enemy in world.space.overlapping("enemy", enemy.rect)
+
+def test_a_recycled_ripple_starts_at_its_new_position(make_world):
+    world = make_world(seed=1)
+    ripple = world.spawn_ripple((100, 100))
+    ripple.rect.move_ip(30, 30)
+    ripple.kill()
+    assert world.spawn_ripple((500, 300)) is ripple
+    assert ripple.rect.center == (500, 300) and ripple in world.active
+
+def test_killing_twice_releases_once(make_world):
+    world = make_world(seed=1)
+    enemy = world.spawn("nightcrawler", (40, 50))
+    free = len(world.pool.free.get(Enemy, []))
+    enemy.kill()
+    enemy.kill()
+    assert len(world.pool.free[Enemy]) == free + 1
+
+def test_the_pool_keeps_at_most_limit_per_class(make_world):
+    world = make_world(seed=1)
+    pool = EntityPool(limit=2)
+    ripples = [pool.acquire(Ripple, world, 10, 10) for _ in range(3)]
+    for ripple in ripples:
+        pool.release(ripple)
+    assert pool.free[Ripple] == ripples[:2]
+    assert pool.acquire(Ripple, world, 60, 60) is ripples[1]  # Last in, first out
+    assert pool.stats() == {"Ripple": {"created": 3, "reused": 1, "free": 1}}
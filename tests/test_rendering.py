@@ -0,0 +1,59 @@
+import pygame
+import pytest
+
+from assets import load_source_images
+from conftest import play
+from hud import Hud, collected_fruit
+from rendering import DirtyRenderer, TextCache, draw_world
+from settings import WIDTH, HEIGHT
+
+@pytest.fixture(scope="module")
+def images():
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+    return load_source_images()
+
+def test_dirty_rects_match_a_full_redraw_with_overheal(make_world, images):
+    world = make_world(seed=4, images=images)
+    renderer = DirtyRenderer(images, Hud(images))
+    hud = Hud(images)
+    dirty_screen = pygame.Surface((WIDTH, HEIGHT))
+    full_screen = pygame.Surface((WIDTH, HEIGHT))
+    overhealed = 0
+    for frame in range(400):
+        if frame % 50 == 0:
+            world.player.health = world.player.max_health + 20  # As an Ethereal Pear allows
+        play(world, 1, seed=frame // 30)
+        overhealed += world.player.health > world.player.max_health
+        renderer.draw(dirty_screen, world)
+        draw_world(full_screen, world, images, hud)
+        assert pygame.image.tobytes(dirty_screen, "RGB") == pygame.image.tobytes(full_screen, "RGB"), f"frame {frame}"
+    assert overhealed and renderer.dirty_frames
+
+def test_text_cache_evicts_the_least_recently_used_string(images):
+    cache = TextCache(max_entries=2)
+    first = cache.render("Level: 1", 18, (255, 255, 255))
+    cache.render("Level: 2", 18, (255, 255, 255))
+    assert cache.render("Level: 1", 18, (255, 255, 255)) is first  # Now the most recently used
+    cache.render("Level: 3", 18, (255, 255, 255))  # Evicts "Level: 2"
+    assert cache.stats() == {"hits": 1, "misses": 3, "entries": 2, "fonts": 1}
+    assert cache.render("Level: 1", 18, [255, 255, 255]) is first  # Colors as lists share the entry
+    cache.render("Level: 2", 18, (255, 255, 255))
+    assert (cache.hits, cache.misses) == (2, 4)
+    cache.render("Level: 1", 30, (255, 255, 255))  # Another size is another entry and font
+    assert cache.stats() == {"hits": 2, "misses": 5, "entries": 2, "fonts": 2}
+
+def test_the_retained_hud_draws_what_immediate_mode_draws(make_world, images):
+    world = make_world(seed=3, images=images)
+    hud = Hud(images)
+    retained = pygame.Surface((WIDTH, HEIGHT))
+    immediate = pygame.Surface((WIDTH, HEIGHT))
+    seen = set()
+    for frame in range(900):
+        play(world, 1, seed=frame // 30)
+        draw_world(retained, world, images, hud)
+        draw_world(immediate, world, images)
+        assert pygame.image.tobytes(retained, "RGB") == pygame.image.tobytes(immediate, "RGB"), f"frame {frame}"
+        seen.add((world.player.invulnerable, collected_fruit(world) is not None))
+    assert (True, True) in seen and (False, False) in seen  # With and without the status and fruit name
+    assert hud.counters()["stats_recomposes"] < 900
@@ -0,0 +1,55 @@
+import random
+
+import replay
+import savegame
+from conftest import play
+from simulation import STEP_MS
+
+# Play a session with random inputs and events, recording it as the game loop does
+def record(world, recording, steps, seed):
+    rng = random.Random(seed)
+    dx = dy = 0
+    for step in range(steps):
+        if step % 30 == 0:
+            dx, dy = rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1))
+        roll = rng.random()
+        if roll < 0.01:
+            world.special_attack()
+            recording.event(replay.SPECIAL_ATTACK)
+        elif roll < 0.02:
+            choice = rng.randint(1, 5)
+            world.player.apply_upgrade(choice)
+            recording.event(replay.UPGRADE, choice)
+        elif roll < 0.025:
+            level = rng.randint(0, 3)
+            world.director.set_throttle(level)
+            recording.event(replay.THROTTLE, level)
+        attack = rng.random() < 0.7
+        recording.step(dx, dy, attack)
+        world.step(STEP_MS, dx, dy, attack)
+
+def test_inputs_pack_into_a_byte():
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for attack in (False, True):
+                assert replay.unpack_input(replay.pack_input(dx, dy, attack)) == (dx, dy, attack)
+
+def test_replay_rebuilds_the_session(make_world, tmp_path):
+    world = make_world(seed=11)
+    recording = replay.Recording(11)
+    record(world, recording, 3000, seed=2)
+    path = str(tmp_path / "session.rec")
+    recording.write(path)
+    replayed = replay.run(replay.Recording.read(path))
+    assert savegame.encode(savegame.snapshot(replayed)) == savegame.encode(savegame.snapshot(world))
+
+def test_replay_from_a_save(make_world):
+    world = make_world(seed=4)
+    play(world, 600)
+    save = savegame.encode(savegame.snapshot(world))
+    world = make_world(seed=4)
+    savegame.apply(world, savegame.decode(save))
+    recording = replay.Recording(4, save)
+    record(world, recording, 2000, seed=3)
+    replayed = replay.run(recording)
+    assert savegame.encode(savegame.snapshot(replayed)) == savegame.encode(savegame.snapshot(world))
@@ -0,0 +1,78 @@
+import pytest
+
+import savegame
+from conftest import play
+from simulation import ARCHETYPES, Balance
+
+def test_encode_decode_round_trip(make_world):
+    world = make_world(seed=3)
+    play(world, 900)
+    state = savegame.snapshot(world)
+    decoded = savegame.decode(savegame.encode(state))
+    assert decoded["frame"] == state["frame"]
+    assert decoded["rng"] == state["rng"]
+    assert list(decoded["player"]["values"]) == list(state["player"]["values"])
+    assert [tuple(entity) for entity in decoded["entities"]] == [tuple(entity) for entity in state["entities"]]
+    assert savegame.encode(decoded) == savegame.encode(state)
+
+# Seed 9 saves a step after the player was hit, while the stagger slowdown is on
+@pytest.mark.parametrize("seed", [5, 9])
+def test_a_loaded_game_plays_on_exactly_like_the_original(make_world, seed):
+    original = make_world(seed=seed)
+    play(original, 600)
+    saved = savegame.snapshot(original)
+    assert saved["sleeping"][1]  # Some enemies asleep, so their wake-ups have to survive the save
+    restored = make_world(seed=99)
+    restored.clock.time = original.clock.time
+    savegame.apply(restored, savegame.decode(savegame.encode(saved)))
+    play(original, 900, seed=1)  # The original just carries on
+    play(restored, 900, seed=1)
+    assert savegame.encode(savegame.snapshot(restored)) == savegame.encode(savegame.snapshot(original))
+
+def test_sleepers_wake_up_in_a_world_without_activity_levels(make_world):
+    world = make_world(seed=5)
+    play(world, 600)
+    state = savegame.decode(savegame.encode(savegame.snapshot(world)))
+    restored = make_world(seed=5, activity=False)
+    restored.clock.time = world.clock.time
+    savegame.apply(restored, state)
+    assert set(restored.active) == set(restored.all_sprites) - set(restored.fruits) - {restored.player}
+
+def test_fractional_player_values_survive_a_save(make_world):
+    world = make_world(seed=6, balance=Balance(melon_damage_factor=2.5, damage_scale=0.5))
+    play(world, 600)
+    player = world.player
+    player.damage = player.base_damage * world.balance.melon_damage_factor
+    player.speed = 2.5
+    player.health -= 0.5
+    state = savegame.snapshot(world)
+    decoded = savegame.decode(savegame.encode(state))
+    assert decoded["player"]["values"] == state["player"]["values"]
+    restored = make_world(seed=6)
+    restored.clock.time = world.clock.time
+    savegame.apply(restored, decoded)
+    assert (restored.player.damage, restored.player.speed, restored.player.health) == (player.damage, player.speed, player.health)
+    assert isinstance(restored.player.level, int)
+
+def test_every_archetype_round_trips(make_world):
+    world = make_world(seed=8)
+    for name in ARCHETYPES:
+        world.spawn(name, (100, 100))
+    state = savegame.snapshot(world)
+    codes = {kind for kind, *_ in state["entities"]}
+    assert {archetype.code for archetype in ARCHETYPES.values()} <= codes
+    assert not {archetype.code for archetype in ARCHETYPES.values()} & {savegame.FRUIT_KIND, savegame.RIPPLE_KIND}
+    restored = make_world(seed=8)
+    restored.clock.time = world.clock.time
+    savegame.apply(restored, savegame.decode(savegame.encode(state)))
+    assert [len(group) for group in restored.enemy_groups()] == [len(group) for group in world.enemy_groups()]
+
+def test_version_3_fruit_and_ripple_codes_still_load(make_world):
+    world = make_world(seed=9)
+    world.spawn_ripple((50, 50))
+    state = savegame.snapshot(world)
+    old_codes = {savegame.FRUIT_KIND: 3, savegame.RIPPLE_KIND: 4}
+    old = dict(state, entities=[(old_codes.get(kind, kind), *rest) for kind, *rest in state["entities"]])
+    data = bytearray(savegame.encode(old))
+    data[4:6] = (3).to_bytes(2, "little")
+    assert savegame.decode(bytes(data))["entities"] == savegame.decode(savegame.encode(state))["entities"]
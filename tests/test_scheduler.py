@@ -0,0 +1,43 @@
+from scheduler import Scheduler
+
+def test_fires_in_deadline_order_then_scheduling_order():
+    scheduler = Scheduler()
+    fired = []
+    scheduler.at(30, lambda now: fired.append("c"))
+    scheduler.at(10, lambda now: fired.append("a"))
+    scheduler.at(10, lambda now: fired.append("b"))
+    assert scheduler.run(20) == 2
+    assert fired == ["a", "b"]
+    scheduler.run(30)
+    assert fired == ["a", "b", "c"]
+    assert len(scheduler) == 0
+
+def test_strict_timers_wait_until_after_their_time():
+    scheduler = Scheduler()
+    fired = []
+    scheduler.at(10, fired.append, strict=True)
+    scheduler.run(10)
+    assert fired == []
+    scheduler.run(11)
+    assert fired == [11]
+
+def test_cancelled_timers_never_fire():
+    scheduler = Scheduler()
+    fired = []
+    timer = scheduler.at(5, fired.append)
+    scheduler.at(8, fired.append)
+    timer.cancel()
+    assert len(scheduler) == 1
+    assert scheduler.next_time() == 8
+    scheduler.run(10)
+    assert fired == [10]
+    assert scheduler.next_time() is None
+
+def test_timers_scheduled_while_running_wait_for_their_time():
+    scheduler = Scheduler()
+    fired = []
+    scheduler.at(5, lambda now: scheduler.at(now + 5, fired.append))
+    scheduler.run(5)
+    assert fired == []
+    scheduler.run(10)
+    assert fired == [10]
@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from simulation import STEP_MS, FixedTimestep
+
+def test_leftover_time_carries_over_to_the_next_frame():
+    timestep = FixedTimestep()
+    assert timestep.advance(10) == 0
+    assert timestep.alpha == pytest.approx(10 / STEP_MS)
+    assert timestep.advance(10) == 1  # 20 ms: one step, 3.3 ms left over
+    assert timestep.alpha == pytest.approx((20 - STEP_MS) / STEP_MS)
+    assert timestep.advance(2 * STEP_MS) == 2
+
+def test_a_long_frame_runs_at_most_max_steps():
+    timestep = FixedTimestep(max_steps=5)
+    assert timestep.advance(1000 + 5) == 5  # A one second hitch: 60 steps due
+    assert timestep.dropped_ms == pytest.approx(55 * STEP_MS)
+    assert timestep.alpha == pytest.approx(5 / STEP_MS)
+    assert timestep.advance(STEP_MS) == 1  # Back to normal right away, no catching up
+
+def test_alpha_stays_in_range_and_no_time_goes_missing():
+    rng = random.Random(1)
+    timestep = FixedTimestep(max_steps=3)
+    elapsed = stepped = 0
+    for _ in range(5000):
+        frame_ms = rng.choice((rng.uniform(0, 40), rng.uniform(40, 250)))
+        elapsed += frame_ms
+        steps = timestep.advance(frame_ms)
+        assert 0 <= steps <= 3
+        assert 0 <= timestep.alpha < 1
+        stepped += steps
+    assert stepped * STEP_MS + timestep.dropped_ms + timestep.accumulator == pytest.approx(elapsed)
+    assert timestep.dropped_ms > 0
@@ -0,0 +1,57 @@
+import math
+import random
+
+import pygame
+
+from spatial import SpatialHash
+
+class Box:
+    def __init__(self, x, y, size=20):
+        self.rect = pygame.Rect(x, y, size, size)
+
+def scattered(count, seed=1):
+    rng = random.Random(seed)
+    return [Box(rng.randint(0, 2000), rng.randint(0, 2000), rng.randint(5, 300)) for _ in range(count)]
+
+def test_queries_match_brute_force():
+    space = SpatialHash()
+    boxes = scattered(200)
+    for box in boxes:
+        space.insert(box, "enemy")
+    area = pygame.Rect(400, 300, 500, 350)
+    assert set(space.overlapping("enemy", area)) == {box for box in boxes if area.colliderect(box.rect)}
+    point = (1000, 900)
+    assert set(space.within_radius("enemy", point, 250)) == {box for box in boxes if math.dist(box.rect.center, point) <= 250}
+    nearest, distance = space.nearest("enemy", point)
+    assert distance == min(math.dist(box.rect.center, point) for box in boxes)
+    assert math.dist(nearest.rect.center, point) == distance
+
+def test_move_and_remove_keep_the_index_current():
+    space = SpatialHash()
+    box = Box(0, 0)
+    space.insert(box, "fruit")
+    box.rect.topleft = (1000, 1000)
+    space.move(box)
+    assert space.overlapping("fruit", pygame.Rect(0, 0, 50, 50)) == []
+    assert space.overlapping("fruit", pygame.Rect(990, 990, 50, 50)) == [box]
+    space.remove(box)
+    assert box not in space
+    assert space.count("fruit") == 0
+    assert space.nearest("fruit", (0, 0)) == (None, math.inf)
+
+def test_layers_are_separate():
+    space = SpatialHash()
+    enemy, fruit = Box(10, 10), Box(10, 10)
+    space.insert(enemy, "enemy")
+    space.insert(fruit, "fruit")
+    assert space.overlapping("enemy", pygame.Rect(0, 0, 100, 100)) == [enemy]
+    assert space.within_radius("fruit", (20, 20), 5) == [fruit]
+
+def test_entities_leave_pygames_draw_layer_alone(make_world):
+    world = make_world(seed=1)
+    enemy = next(iter(world.enemies))
+    layered = pygame.sprite.LayeredUpdates()
+    layered.add(enemy)  # Takes the sprite's own layer
+    layered.add(world.player, layer=3)
+    assert layered.layers() == [0, 3]
+    assert world.space.overlapping(enemy.space_layer, enemy.rect)